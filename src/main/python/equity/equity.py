@@ -0,0 +1,166 @@
+'''
+Works out how often each of a set of hold'em hands wins against the
+others, given the board so far and any cards known to be out of the
+deck. A split pot counts as the share each hand gets.
+
+When the cards still to come can be dealt in few enough ways every way
+is tried and the equities are exact. Otherwise boards are dealt at
+random in batches and the equities estimated, stopping once the
+standard error of every estimate is below a target or a trial limit is
+reached. Batch i is dealt from RandomState( [ seed, i ] ) and batches
+are added up in order, so the same seed gives the same answer whether
+the batches run in this process or on a pool of worker processes.
+
+    result = equity( [ [ 'Ah', 'Ad' ], [ 'Kc', 'Qc' ] ], board=[ '2c', '7c', 'Js' ] )
+    print result.equities, result.errors, result.trials
+
+handEquities works out the equity of the players whose hole cards are
+known at every street of a parsed hand.
+'''
+import itertools
+
+import numpy
+
+from evaluator import CODE_KEYS, CODE_BITS, codes, evaluateKeys, boardOf
+
+# Deal every remaining board if there are no more ways than this
+EXACT_LIMIT = 100000
+# Random boards dealt in each batch
+BATCH = 20000
+# Stop once the standard error of every equity is below this
+TARGET_ERROR = 0.001
+MAX_TRIALS = 2000000
+
+class EquityResult(object):
+    '''Equity of each hand, with the standard error of each estimate
+    (zero if exact) and the number of boards dealt'''
+    __slots__ = ( 'equities', 'errors', 'trials', 'exact' )
+
+    def __init__(self, equities, errors, trials, exact):
+        self.equities = equities
+        self.errors = errors
+        self.trials = trials
+        self.exact = exact
+
+    def __repr__(self):
+        return "EquityResult( equities = %s, errors = %s, trials = %d, exact = %s )"%(
+            self.equities, self.errors, self.trials, self.exact )
+
+def _shares( holes, board, deals ):
+    '''The pot share of each hand for each of an ( n, k ) array of the k
+    board cards still to come, as a ( hands, n ) array'''
+    boardKey = sum( CODE_KEYS[c] for c in board )
+    boardBits = 0
+    for c in board:
+        boardBits |= int( CODE_BITS[c] )
+    keys = numpy.zeros( len( deals ), dtype=numpy.int64 ) + boardKey
+    for i in range( deals.shape[1] ):
+        keys += CODE_KEYS[ deals[:,i] ]
+    ranks = numpy.empty( ( len( holes ), len( deals ) ), dtype=numpy.uint16 )
+    for ( h, hole ) in enumerate( holes ):
+        holeBits = boardBits | int( CODE_BITS[ hole[0] ] | CODE_BITS[ hole[1] ] )
+        ranks[h] = evaluateKeys( keys + ( CODE_KEYS[ hole[0] ] + CODE_KEYS[ hole[1] ] ), 7,
+                                 cards=deals, sharedBits=holeBits )
+    winners = ranks == ranks.max( axis=0 )
+    return winners / winners.sum( axis=0, dtype=numpy.float64 )
+
+def _exactTask( task ):
+    '''Sums of the shares over a slice of the remaining boards'''
+    ( holes, board, deals ) = task
+    return _shares( holes, board, deals ).sum( axis=1 )
+
+def _randomTask( task ):
+    '''Sums and sums of squares of the shares over a batch of random boards'''
+    ( holes, board, deck, size, seed, index ) = task
+    rnd = numpy.random.RandomState( [ seed, index ] )
+    deck = numpy.array( deck, dtype=numpy.int8 )
+    missing = 5 - len( board )
+    deals = numpy.empty( ( 0, missing ), dtype=numpy.int8 )
+    while len( deals ) < size:
+        # drawing with replacement and dropping the boards with a card
+        # twice is much quicker than shuffling the deck for every board
+        drawn = numpy.sort( rnd.randint( 0, len( deck ), ( size * 5 // 4, missing ) ), axis=1 )
+        drawn = drawn[ ( drawn[:,1:] != drawn[:,:-1] ).all( axis=1 ) ]
+        deals = numpy.vstack( [ deals, deck[drawn] ] )
+    shares = _shares( holes, board, deals[:size] )
+    return ( shares.sum( axis=1 ), ( shares * shares ).sum( axis=1 ) )
+
+def _map( pool, f, tasks ):
+    if pool is None:
+        return map( f, tasks )
+    return pool.map( f, tasks )
+
+def equity( holes, board=(), dead=(), seed=0, target=TARGET_ERROR, maxTrials=MAX_TRIALS,
+            exact=None, pool=None, batch=BATCH ):
+    '''Equities of the hole card pairs in holes against each other.
+
+    Cards can be codes, Card objects or names. dead are cards out of the
+    deck that aren't in any hand, like folded cards that were shown.
+    exact forces or forbids dealing every remaining board, by default
+    they are dealt if there are at most EXACT_LIMIT of them. pool is a
+    multiprocessing.Pool to spread the work over.'''
+    holes = [ codes( hole ) for hole in holes ]
+    board = codes( board )
+    if len( holes ) < 2:
+        raise ValueError( 'Need at least two hands' )
+    if any( len( hole ) != 2 for hole in holes ) or len( board ) > 5:
+        raise ValueError( 'Need two hole cards each and at most five board cards' )
+    used = set( board + codes( dead ) + [ c for hole in holes for c in hole ] )
+    if len( used ) != len( board ) + len( codes( dead ) ) + 2 * len( holes ):
+        raise ValueError( 'A card is dealt twice' )
+    deck = [ c for c in range(52) if c not in used ]
+    missing = 5 - len( board )
+    ways = reduce( lambda n, k: n * ( len( deck ) - k ) // ( k + 1 ), range( missing ), 1 )
+    if exact is None:
+        exact = ways <= EXACT_LIMIT
+    if exact:
+        deals = numpy.array( list( itertools.combinations( deck, missing ) ), dtype=numpy.int8 ).reshape( ways, missing )
+        chunks = max( 1, len( deals ) // batch )
+        sums = sum( _map( pool, _exactTask, [ ( holes, board, part ) for part in numpy.array_split( deals, chunks ) ] ) )
+        return EquityResult( ( sums / ways ).tolist(), [ 0.0 ] * len( holes ), ways, True )
+    # random boards a round of batches at a time, one for each worker
+    workers = getattr( pool, '_processes', 1 ) if pool is not None else 1
+    sums = numpy.zeros( len( holes ) )
+    squares = numpy.zeros( len( holes ) )
+    trials = 0
+    index = 0
+    while True:
+        tasks = [ ( holes, board, deck, batch, seed, index + i ) for i in range( workers ) ]
+        index += workers
+        for ( s, q ) in _map( pool, _randomTask, tasks ):
+            sums += s
+            squares += q
+            trials += batch
+            means = sums / trials
+            errors = numpy.sqrt( numpy.maximum( squares / trials - means * means, 0 ) / trials )
+            if errors.max() <= target or trials >= maxTrials:
+                return EquityResult( means.tolist(), errors.tolist(), trials, False )
+
+def handEquities( hand, **options ):
+    '''Equity of the players of a parsed hand whose hole cards are known
+    and who are still in at the start of each street, as a list of
+    ( board, { name : equity } ) from preflop to the river. Hands of
+    players whose cards aren't known are left out. Options are passed to
+    equity.'''
+    known = dict( ( name, player.startingHand ) for ( name, player ) in hand.players.items()
+                  if player.startingHand is not None and len( player.startingHand ) == 2 )
+    board = boardOf( hand )
+    rounds = []
+    for r in hand.rounds:
+        if r not in rounds:
+            rounds.append( r )
+    streets = []
+    live = hand.allBits
+    for ( street, cards ) in enumerate( [ 0, 3, 4, 5 ] ):
+        if street > 0:
+            if street >= len( rounds ) or len( board ) < cards:
+                break
+            # the players who didn't fold on the street before
+            if rounds[ street - 1 ].liveMask is not None:
+                live = rounds[ street - 1 ].liveMask
+        names = sorted( [ name for name in known if live & hand.bits[name] ] )
+        if len( names ) < 2:
+            break
+        result = equity( [ known[name] for name in names ], board[:cards], **options )
+        streets.append( ( board[:cards], dict( zip( names, result.equities ) ) ) )
+    return streets
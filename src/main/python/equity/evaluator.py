@@ -0,0 +1,235 @@
+'''
+Ranks 5, 6 and 7 card hold'em hands with lookup tables.
+
+Cards are the integer Card.code, value index times four plus suit index.
+A hand's rank is an integer from 1 to 7462, one for each distinct five
+card hand, and a higher rank is a better hand; the best five of six or
+seven cards decide.
+
+Without a flush only the card values matter. Every value has a key
+chosen so the keys of any seven values (each used at most four times)
+add up to a different sum, and the rank of every multiset of values is
+stored at the index of its sum. Keys are zero for deuces so the sums of
+hands of different sizes overlap; there is a table for each size, built
+the first time a size is used (about a second for seven cards). The
+suits are counted in the same sum to spot a flush, and a flush is
+ranked in a second table indexed by the bits of the values in the flush
+suit. With seven cards a flush can't come with a full house or four of
+a kind, so when there is one it is the answer.
+
+    evaluate( cards )          rank of a list of codes or Card objects
+    evaluateBatch( codes )     ranks of an ( n, 5 to 7 ) array of codes
+    evaluateKeys( keys, ... )  ranks from sums of CODE_KEYS
+    category( rank )           HIGH_CARD to STRAIGHT_FLUSH of a rank
+'''
+import itertools
+
+import numpy
+
+from pokergame import Card
+
+HIGH_CARD, PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = range(9)
+CATEGORY_NAMES = [ 'high card', 'a pair', 'two pair', 'three of a kind', 'a straight', 'a flush',
+                   'a full house', 'four of a kind', 'a straight flush' ]
+
+# Keys of the thirteen values, every sum of seven is unique
+RANK_KEYS = [ 0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181 ]
+# A card's key is its value's key plus one in the four bit count of its
+# suit above KEY_BITS, so adding up keys also counts the suits. Adding
+# three to every count carries into the top bit of a count of five or
+# more, which is how a flush is spotted.
+KEY_BITS = 23
+KEY_MASK = ( 1 << KEY_BITS ) - 1
+SUIT_BITS = 4
+FLUSH_CARRY = 0x3333
+FLUSH_BITS = 0x8888
+# A card's bit is its value's bit in the thirteen bits of its suit, so
+# the or of the bits of some cards has the values of each suit in turn
+SUIT_VALUES = 13
+VALUE_MASK = ( 1 << SUIT_VALUES ) - 1
+
+def _straight( values ):
+    '''The top value of the best straight in a set of values, or None'''
+    for top in range( 12, 3, -1 ):
+        if all( v in values for v in range( top - 4, top + 1 ) ):
+            return top
+    if all( v in values for v in [ 12, 0, 1, 2, 3 ] ): # the wheel
+        return 3
+    return None
+
+def _best( values, suited ):
+    '''The best five card hand of a list of values as a tuple that
+    compares the way the hands do, suited if they are all one suit'''
+    distinct = sorted( set( values ), reverse=True )
+    if suited:
+        top = _straight( distinct )
+        if top is not None:
+            return ( STRAIGHT_FLUSH, top )
+        return tuple( [ FLUSH ] + distinct[:5] )
+    counts = dict( ( v, values.count(v) ) for v in distinct )
+    # values by how many there are, then by value
+    byCount = sorted( distinct, key=lambda v: ( counts[v], v ), reverse=True )
+    first = byCount[0]
+    if counts[first] == 4:
+        return ( QUADS, first, max( v for v in distinct if v != first ) )
+    if counts[first] == 3:
+        pairs = [ v for v in byCount[1:] if counts[v] >= 2 ]
+        if pairs:
+            return ( FULL_HOUSE, first, max( pairs ) )
+    top = _straight( distinct )
+    if top is not None:
+        return ( STRAIGHT, top )
+    if counts[first] == 3:
+        return tuple( [ TRIPS, first ] + byCount[1:3] )
+    if counts[first] == 2:
+        if counts[ byCount[1] ] == 2:
+            second = byCount[1]
+            kicker = max( v for v in distinct if v != first and v != second )
+            return ( TWO_PAIR, first, second, kicker )
+        return tuple( [ PAIR, first ] + byCount[1:4] )
+    return tuple( [ HIGH_CARD ] + distinct[:5] )
+
+def _multisets( size ):
+    '''Every multiset of size values with no value more than four times'''
+    for values in itertools.combinations_with_replacement( range(13), size ):
+        if all( values.count(v) <= 4 for v in set( values ) ):
+            yield values
+
+def _ranks():
+    '''The rank of every five card hand as a tuple from _best'''
+    hands = set( _best( list(values), False ) for values in _multisets(5) )
+    hands.update( _best( list(values), True ) for values in itertools.combinations( range(13), 5 ) )
+    return dict( ( hand, rank + 1 ) for ( rank, hand ) in enumerate( sorted( hands ) ) )
+
+RANKS = _ranks()
+NUM_RANKS = len( RANKS )
+
+# The lowest rank of each category
+CATEGORY_STARTS = numpy.array( sorted( [ min( rank for ( hand, rank ) in RANKS.items() if hand[0] == c )
+                                         for c in range(9) ] ) )
+
+def _flushTable():
+    table = numpy.zeros( 1 << 13, dtype=numpy.uint16 )
+    for bits in range( 1 << 13 ):
+        values = [ v for v in range(13) if bits & ( 1 << v ) ]
+        if len( values ) >= 5:
+            table[bits] = RANKS[ _best( values, True ) ]
+    return table
+
+FLUSH_TABLE = _flushTable()
+
+_tables = {}
+
+def rankTable( size ):
+    '''Ranks of the hands of size cards without a flush by key sum'''
+    table = _tables.get( size )
+    if table is None:
+        if size < 5 or size > 7:
+            raise ValueError( 'Can only rank 5 to 7 cards, not %d'%size )
+        table = numpy.zeros( RANK_KEYS[-1] * 4 + RANK_KEYS[-2] * ( size - 4 ) + 1, dtype=numpy.uint16 )
+        keys = RANK_KEYS
+        for values in _multisets( size ):
+            table[ sum( keys[v] for v in values ) ] = RANKS[ _best( list(values), False ) ]
+        _tables[size] = table
+    return table
+
+# Lookups by card code
+CODE_KEYS = numpy.array( [ RANK_KEYS[ c >> 2 ] + ( 1 << ( KEY_BITS + SUIT_BITS * ( c & 3 ) ) )
+                           for c in range(52) ], dtype=numpy.int64 )
+CODE_BITS = numpy.array( [ 1 << ( SUIT_VALUES * ( c & 3 ) + ( c >> 2 ) ) for c in range(52) ], dtype=numpy.int64 )
+# the same as lists, much quicker to index one at a time
+_codeKeys = CODE_KEYS.tolist()
+_codeBits = CODE_BITS.tolist()
+
+def codes( cards ):
+    '''Card codes of a list of Card objects or names like 'Ah' '''
+    return [ int(c) if isinstance( c, ( int, long, numpy.integer ) ) else ( c if isinstance( c, Card ) else Card(c) ).code for c in cards ]
+
+def _flushRank( bits ):
+    for s in range(4):
+        values = ( bits >> ( SUIT_VALUES * s ) ) & VALUE_MASK
+        if FLUSH_TABLE[values]:
+            return int( FLUSH_TABLE[values] )
+
+def evaluate( cards ):
+    '''Rank of five to seven cards, as codes, Card objects or names'''
+    cards = codes( cards )
+    key = 0
+    for c in cards:
+        key += _codeKeys[c]
+    if ( ( key >> KEY_BITS ) + FLUSH_CARRY ) & FLUSH_BITS:
+        bits = 0
+        for c in cards:
+            bits |= _codeBits[c]
+        return _flushRank( bits )
+    return int( rankTable( len(cards) )[ key & KEY_MASK ] )
+
+def evaluateKeys( keys, size, bits=None, cards=None, sharedBits=0 ):
+    '''Ranks of hands of size cards from the sums of their CODE_KEYS and
+    either the ors of their CODE_BITS or the cards themselves, which are
+    only looked at for the hands with a flush. Callers ranking many hands
+    that share cards, like hole cards against one board, can add up the
+    keys of the shared cards once and pass their bits as sharedBits with
+    the cards that differ.'''
+    ranks = rankTable( size )[ keys & KEY_MASK ]
+    rows = numpy.flatnonzero( ( ( keys >> KEY_BITS ) + FLUSH_CARRY ) & FLUSH_BITS )
+    if len( rows ) > 0:
+        if bits is not None:
+            flushBits = bits[rows] | sharedBits
+        else:
+            flushed = cards[rows]
+            flushBits = numpy.zeros( len( rows ), dtype=numpy.int64 ) | sharedBits
+            for i in range( flushed.shape[1] ):
+                flushBits |= CODE_BITS[ flushed[:,i] ]
+        # only one suit can have five of seven cards
+        best = numpy.zeros( len( rows ), dtype=numpy.uint16 )
+        for s in range(4):
+            numpy.maximum( best, FLUSH_TABLE[ ( flushBits >> ( SUIT_VALUES * s ) ) & VALUE_MASK ], best )
+        ranks[rows] = best
+    return ranks
+
+def evaluateBatch( cards ):
+    '''Ranks of an ( n, k ) array of card codes with k from 5 to 7'''
+    cards = numpy.asarray( cards )
+    if cards.ndim != 2:
+        raise ValueError( 'Expected an ( n, k ) array of card codes' )
+    # a column at a time, numpy is slow at short rows
+    keys = CODE_KEYS[ cards[:,0] ]
+    for i in range( 1, cards.shape[1] ):
+        keys += CODE_KEYS[ cards[:,i] ]
+    return evaluateKeys( keys, cards.shape[1], cards=cards )
+
+def category( rank ):
+    '''HIGH_CARD to STRAIGHT_FLUSH for a rank, or an array of them'''
+    found = numpy.searchsorted( CATEGORY_STARTS, rank, side='right' ) - 1
+    if numpy.ndim( found ) == 0:
+        return int( found )
+    return found
+
+def describe( rank ):
+    return CATEGORY_NAMES[ category( rank ) ]
+
+def boardOf( hand ):
+    '''The board of a parsed hand, from the cards of its rounds if the
+    parser didn't fill in Hand.board'''
+    if hand.board:
+        return hand.board
+    board = []
+    seen = set()
+    for r in hand.rounds:
+        if r.cards and id(r) not in seen:
+            board.extend( r.cards )
+        seen.add( id(r) )
+    return board
+
+def showdown( hand ):
+    '''Ranks of the players of a parsed hand whose hole cards are known,
+    by name, once the board is complete'''
+    ranks = {}
+    board = [ c.code for c in boardOf( hand ) ]
+    if len( board ) < 5:
+        return ranks
+    for ( name, player ) in hand.players.items():
+        if player.startingHand is not None and len( player.startingHand ) == 2:
+            ranks[name] = evaluate( board + [ c.code for c in player.startingHand ] )
+    return ranks
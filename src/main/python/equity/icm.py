@@ -0,0 +1,152 @@
+'''
+Tournament equity of chip stacks by the independent chip model.
+
+The Malmuth-Harville model says a player finishes first with chance
+their share of the chips, and each later place goes the same way among
+the players who haven't finished yet. Summing that over every order the
+players can finish in is factorial in the number of players; instead
+the chance of each set of players having taken the top places is built
+up one place at a time, each set from the sets one smaller, which is
+2^n sets with n ways into each. Only the sets up to the number of paid
+places are needed.
+
+Equities only depend on the stacks' shares of the chips, so an ICM
+remembers the answers for stacks reduced to their lowest terms and
+sorted, and the same stacks in another order or scaled up cost a
+lookup. Hand histories don't record prize pools, so the payouts are
+given, either as a list or worked out for each hand.
+
+    ICM( [ 50, 30, 20 ] ).equities( [ 1500, 3000, 500, 1000 ] )
+    icmHands( hands, [ 50, 30, 20 ] )   # { name : equity } for each hand
+'''
+import fractions
+
+import numpy
+
+from pots import computePots
+
+# Answers remembered by an ICM before it starts again
+CACHE_SIZE = 100000
+
+_layers = {}
+
+def _masksBySize( n ):
+    '''The subsets of n players as bit masks, grouped by size'''
+    layers = _layers.get( n )
+    if layers is None:
+        masks = numpy.arange( 1 << n )
+        sizes = numpy.zeros( 1 << n, dtype=numpy.int64 )
+        for i in range( n ):
+            sizes += ( masks >> i ) & 1
+        layers = _layers[n] = [ masks[ sizes == k ] for k in range( n + 1 ) ]
+    return layers
+
+def icm( stacks, payouts ):
+    '''Equity of each of a list of stacks, all above zero, given the
+    payouts for first place down'''
+    n = len( stacks )
+    stacks = numpy.asarray( stacks, dtype=numpy.float64 )
+    equities = numpy.zeros( n )
+    if n == 0:
+        return equities
+    layers = _masksBySize( n )
+    # chips of the players not in each set
+    remaining = numpy.zeros( 1 << n ) + stacks.sum()
+    masks = numpy.arange( 1 << n )
+    for i in range( n ):
+        remaining -= ( ( masks >> i ) & 1 ) * stacks[i]
+    chance = numpy.zeros( 1 << n ) # of each set taking the top places
+    chance[0] = 1
+    for place in range( min( len( payouts ), n ) ):
+        sets = layers[place]
+        left = remaining[sets]
+        reached = chance[sets]
+        for i in range( n ):
+            out = ( ( sets >> i ) & 1 ) == 0
+            share = stacks[i] / left
+            p = reached * share * out
+            equities[i] += p.sum() * payouts[place]
+            # each set plus player i comes from just one set, no clashes
+            chance[ sets[out] | ( 1 << i ) ] += p[out]
+    return equities
+
+class ICM(object):
+    '''ICM equities for one payout structure, remembering the answers'''
+    def __init__(self, payouts, cacheSize=CACHE_SIZE):
+        self.payouts = list( payouts )
+        self.cache = {}
+        self.cacheSize = cacheSize
+        self.hits = 0
+        self.misses = 0
+
+    def equities(self, stacks):
+        '''Equity of each of a list of stacks, in the same order'''
+        stacks = [ int(s) for s in stacks ]
+        divisor = reduce( fractions.gcd, stacks, 0 ) or 1
+        order = sorted( range( len( stacks ) ), key=lambda i: stacks[i] )
+        key = tuple( [ stacks[i] // divisor for i in order ] )
+        found = self.cache.get( key )
+        if found is None:
+            self.misses += 1
+            if len( self.cache ) >= self.cacheSize:
+                self.cache.clear()
+            found = self.cache[key] = self._equities( key )
+        else:
+            self.hits += 1
+        result = [ 0.0 ] * len( stacks )
+        for ( i, equity ) in zip( order, found ):
+            result[i] = equity
+        return result
+
+    def _equities(self, stacks):
+        # players without chips have finished below the rest, sharing
+        # the places they finished in
+        live = [ s for s in stacks if s > 0 ]
+        out = len( stacks ) - len( live )
+        equities = icm( live, self.payouts ).tolist()
+        if out:
+            places = ( self.payouts + [ 0 ] * len( stacks ) )[ len( live ):len( stacks ) ]
+            equities = [ float( sum( places ) ) / out ] * out + equities
+        return equities
+
+def startingStacks( hand ):
+    '''Chips of each player at the start of a hand, by name'''
+    return dict( ( name, p.initialStack ) for ( name, p ) in hand.players.items() if p.initialStack is not None )
+
+def finalStacks( hand ):
+    '''Chips of each player at the end of a hand, by name, working out the
+    hand's pots if that hasn't been done'''
+    if hand.pots is None:
+        computePots( hand )
+    stacks = startingStacks( hand )
+    for r in hand.rounds:
+        for a in r.actions:
+            if a.stack is not None:
+                stacks[ a.player.name ] = a.stack.cents
+    return stacks
+
+def handICM( hand, model, after=False ):
+    '''ICM equity of the players of a hand, by name, with the stacks at its
+    start or, if after, at its end'''
+    stacks = finalStacks( hand ) if after else startingStacks( hand )
+    names = sorted( stacks )
+    return dict( zip( names, model.equities( [ stacks[name] for name in names ] ) ) )
+
+def icmHands( hands, payouts, after=False ):
+    '''ICM equity of the players of every hand, as a list of { name :
+    equity }. payouts is a list for every hand or a function giving the
+    payouts of a hand, e.g. from a table of prize pools by tournament;
+    hands it gives None for are skipped with None in their place.'''
+    models = {}
+    results = []
+    for hand in hands:
+        p = payouts( hand ) if callable( payouts ) else payouts
+        if p is None:
+            results.append( None )
+            continue
+        key = tuple( p )
+        model = models.get( key )
+        if model is None:
+            model = models[key] = ICM( p )
+        results.append( handICM( hand, model, after ) )
+    return results
@@ -0,0 +1,259 @@
+'''
+Preflop equity of ranges of starting hands against each other.
+
+There are 1326 two card combos, which fall into 169 classes: 13 pairs,
+78 suited and 78 offsuit hands like 'AKs' and 'AKo'. A range is an
+array of 1326 weights, one per combo, usually built from a description
+like 'TT+,AQs+,AKo' by parseRange.
+
+RangeEquity holds the equity of every combo against every other. It is
+worked out once by dealing the same random boards to all the combos,
+ranking every combo on each board and comparing every pair of them, and
+saved to a .npy file that later runs map into memory instead of working
+it out again. With it a query is a couple of matrix products:
+
+    E[i,j]   equity of combo i against combo j, zero if they share a card
+    V[i,j]   one if they don't share a card
+    equity of range h against range v = h.(E v) / h.(V v)
+
+A hand against a range is the same with h picking out a single combo.
+classMatrix gives the 169 by 169 class equities the same way.
+
+The entries are estimates. Each pair of combos sees the boards that
+don't share a card with it, about two thirds of those dealt, so with the
+default of 10000 boards a single entry has a standard error of about
+half a percentage point; errors holds the error of each entry. Ranges
+average over many entries and come out closer. The number of boards is
+saved with the table, and open builds it again if asked for a different
+number.
+'''
+import itertools
+import os
+
+import numpy
+
+from pokergame import Card
+from parser.atomic import replaceFile
+from evaluator import CODE_KEYS, CODE_BITS, codes, evaluateKeys
+
+VALUES = Card.VALUES
+SUITS = Card.SUITS
+
+# Random boards dealt when building the table, each combo pair sees about
+# two thirds of them, the rest share a card with the pair. Building takes
+# about 20ms a board.
+BOARDS = 10000
+
+COMBOS = numpy.array( list( itertools.combinations( range(52), 2 ) ), dtype=numpy.int8 )
+NUM_COMBOS = len( COMBOS )
+_comboIndex = dict( ( ( int(a), int(b) ), i ) for ( i, ( a, b ) ) in enumerate( COMBOS.tolist() ) )
+_comboCards = ( numpy.int64(1) << COMBOS[:,0].astype( numpy.int64 ) ) | ( numpy.int64(1) << COMBOS[:,1].astype( numpy.int64 ) )
+# combos that share no card
+DISJOINT = ( _comboCards[:,None] & _comboCards[None,:] ) == 0
+
+def className( hi, lo, suited ):
+    if hi == lo:
+        return VALUES[hi] * 2
+    return VALUES[hi] + VALUES[lo] + ( 's' if suited else 'o' )
+
+def _classes():
+    names = []
+    for hi in range( 12, -1, -1 ):
+        for lo in range( hi, -1, -1 ):
+            if hi == lo:
+                names.append( className( hi, lo, False ) )
+            else:
+                names.extend( [ className( hi, lo, True ), className( hi, lo, False ) ] )
+    return names
+
+# The 169 classes, best pairs first
+CLASSES = _classes()
+CLASS_INDEX = dict( ( name, i ) for ( i, name ) in enumerate( CLASSES ) )
+
+def _comboClass( a, b ):
+    ( hi, lo ) = sorted( [ a >> 2, b >> 2 ], reverse=True )
+    return CLASS_INDEX[ className( hi, lo, ( a & 3 ) == ( b & 3 ) ) ]
+
+# The class of each combo, and the combos of each class as a 0/1 matrix
+COMBO_CLASSES = numpy.array( [ _comboClass( a, b ) for ( a, b ) in COMBOS.tolist() ] )
+CLASS_COMBOS = numpy.zeros( ( NUM_COMBOS, len( CLASSES ) ), dtype=numpy.float32 )
+CLASS_COMBOS[ numpy.arange( NUM_COMBOS ), COMBO_CLASSES ] = 1
+
+def comboIndex( cards ):
+    '''Index of the combo of two cards, as codes, Card objects or names'''
+    ( a, b ) = sorted( codes( cards ) )
+    return _comboIndex[ ( a, b ) ]
+
+def handClass( cards ):
+    '''Class name of two hole cards, like 'AKs' '''
+    return CLASSES[ COMBO_CLASSES[ comboIndex( cards ) ] ]
+
+def emptyRange():
+    return numpy.zeros( NUM_COMBOS, dtype=numpy.float32 )
+
+def _expand( token ):
+    '''Class names of a token like 'TT+' or 'ATs+' '''
+    plus = token.endswith( '+' )
+    name = token.rstrip( '+' )
+    if len( name ) < 2 or name[0] not in VALUES or name[1] not in VALUES:
+        raise ValueError( 'Not a hand class: %r'%token )
+    hi = VALUES.index( name[0] )
+    lo = VALUES.index( name[1] )
+    suffixes = [ name[2:] ] if len( name ) > 2 else [ 's', 'o' ]
+    if hi == lo:
+        return [ className( v, v, False ) for v in range( hi, 13 if plus else hi + 1 ) ]
+    if hi < lo:
+        ( hi, lo ) = ( lo, hi )
+    if any( s not in ( 's', 'o' ) for s in suffixes ):
+        raise ValueError( 'Not a hand class: %r'%token )
+    # the kicker goes up to one below the top card
+    kickers = range( lo, hi ) if plus else [ lo ]
+    return [ className( hi, k, s == 's' ) for k in kickers for s in suffixes ]
+
+def parseRange( text ):
+    '''A range from a description like 'TT+, AQs+, AKo, 7h6h:0.5'. Items
+    are classes, classes and everything better with the same top card
+    (or every bigger pair) for a '+', or single combos; each can be
+    given a weight after a colon.'''
+    weights = emptyRange()
+    for item in text.split( ',' ):
+        item = item.strip()
+        if not item:
+            continue
+        weight = 1.0
+        if ':' in item:
+            ( item, w ) = item.split( ':' )
+            weight = float( w )
+        if len( item ) == 4 and item[1] in SUITS and item[3] in SUITS:
+            weights[ comboIndex( [ item[:2], item[2:] ] ) ] = weight
+            continue
+        for name in _expand( item ):
+            weights[ COMBO_CLASSES == CLASS_INDEX[name] ] = weight
+    return weights
+
+def classRange( weights ):
+    '''A range from a weight for each class, by name'''
+    r = emptyRange()
+    for ( name, weight ) in weights.items():
+        r[ COMBO_CLASSES == CLASS_INDEX[name] ] = weight
+    return r
+
+def observedRange( hands, name ):
+    '''The starting hands a player was seen with in parsed hands, each
+    combo weighted by the number of times it was seen'''
+    r = emptyRange()
+    for hand in hands:
+        player = hand.players.get( name )
+        if player is not None and player.startingHand is not None and len( player.startingHand ) == 2:
+            r[ comboIndex( player.startingHand ) ] += 1
+    return r
+
+def _build( boards, seed ):
+    '''Equity of every combo against every other over random boards, and
+    the standard error of each'''
+    rnd = numpy.random.RandomState( seed )
+    keys = CODE_KEYS[ COMBOS ].sum( axis=1 )
+    scores = numpy.zeros( ( NUM_COMBOS, NUM_COMBOS ), dtype=numpy.int32 ) # wins less losses
+    counts = numpy.zeros( ( NUM_COMBOS, NUM_COMBOS ), dtype=numpy.int32 ) # boards seen
+    decided = numpy.zeros( ( NUM_COMBOS, NUM_COMBOS ), dtype=numpy.int32 ) # boards not split
+    for b in range( boards ):
+        board = rnd.permutation( 52 )[:5]
+        boardBits = numpy.bitwise_or.reduce( CODE_BITS[board] )
+        ranks = evaluateKeys( keys + CODE_KEYS[board].sum(), 7, cards=COMBOS, sharedBits=boardBits ).astype( numpy.int16 )
+        live = ( _comboCards & numpy.bitwise_or.reduce( numpy.int64(1) << board.astype( numpy.int64 ) ) ) == 0
+        wins = numpy.sign( ranks[:,None] - ranks[None,:] ).astype( numpy.int8 )
+        wins[~live] = 0
+        wins[:,~live] = 0
+        scores += wins
+        decided += wins != 0
+        counts += live[:,None] & live[None,:]
+    seen = numpy.maximum( counts, 1 ).astype( numpy.float64 )
+    equities = ( scores / seen + 1 ) / 2
+    # a board is worth 1, 0 or a half, so the mean square is the wins
+    # plus a quarter of the splits
+    squares = ( ( decided + scores ) / 2 + ( counts - decided ) / 4.0 ) / seen
+    errors = numpy.sqrt( numpy.maximum( squares - equities * equities, 0 ) / seen )
+    equities[ ~DISJOINT ] = 0
+    errors[ ~DISJOINT ] = 0
+    return ( equities.astype( numpy.float32 ), errors.astype( numpy.float32 ) )
+
+class RangeEquity(object):
+    '''Equities of every combo against every other, with the standard
+    error of each and the number of boards they were worked out from'''
+    def __init__(self, equities, errors=None, boards=None):
+        self.equities = equities # ( 1326, 1326 ) float32, maybe memory mapped
+        self.errors = errors     # the same, None for tables saved without them
+        self.boards = boards
+        self.disjoint = DISJOINT.astype( numpy.float32 )
+
+    @staticmethod
+    def build( boards=BOARDS, seed=0 ):
+        ( equities, errors ) = _build( boards, seed )
+        return RangeEquity( equities, errors, boards )
+
+    def save(self, file_name):
+        '''Saves the equities and errors as one ( 2, 1326, 1326 ) array. A
+        combo against itself has no error, that diagonal holds the number
+        of boards instead.'''
+        errors = self.errors
+        if errors is None:
+            errors = numpy.zeros( ( NUM_COMBOS, NUM_COMBOS ), dtype=numpy.float32 )
+        saved = numpy.array( [ self.equities, errors ], dtype=numpy.float32 )
+        numpy.fill_diagonal( saved[1], self.boards or 0 )
+        tmp = '%s.%d.tmp.npy'%( file_name, os.getpid() )
+        numpy.save( tmp, saved )
+        replaceFile( tmp, file_name )
+
+    @staticmethod
+    def load( file_name ):
+        '''Maps a saved table into memory, only the pages a query touches
+        are read'''
+        saved = numpy.load( file_name, mmap_mode='r' )
+        if saved.ndim == 2: # saved before the errors were
+            return RangeEquity( saved )
+        boards = int( saved[1,0,0] ) or None
+        return RangeEquity( saved[0], saved[1], boards )
+
+    @staticmethod
+    def open( file_name, boards=None, seed=0 ):
+        '''Loads the table from file_name. It is built from boards boards
+        (BOARDS by default) and saved first if it isn't there, or if boards
+        is given and the saved table was built from a different number.'''
+        if os.path.exists( file_name ):
+            table = RangeEquity.load( file_name )
+            if boards is None or table.boards == boards:
+                return table
+            del table # let go of the mapping before replacing the file
+        RangeEquity.build( boards or BOARDS, seed ).save( file_name )
+        return RangeEquity.load( file_name )
+
+    def rangeVsRange(self, hero, villain):
+        '''Equity of range hero against range villain'''
+        hero = numpy.asarray( hero, dtype=numpy.float32 )
+        villain = numpy.asarray( villain, dtype=numpy.float32 )
+        weight = hero.dot( self.disjoint.dot( villain ) )
+        if weight == 0:
+            raise ValueError( 'The ranges have no combos without a card in common' )
+        return float( hero.dot( numpy.dot( self.equities, villain ) ) / weight )
+
+    def handVsRange(self, cards, villain):
+        '''Equity of two hole cards against a range'''
+        i = comboIndex( cards )
+        villain = numpy.asarray( villain, dtype=numpy.float32 )
+        weight = self.disjoint[i].dot( villain )
+        if weight == 0:
+            raise ValueError( 'Every combo of the range shares a card with the hand' )
+        return float( numpy.asarray( self.equities[i] ).dot( villain ) / weight )
+
+    def handsVsRange(self, villain):
+        '''Equity of every combo against a range, nan for combos that
+        share a card with all of it'''
+        villain = numpy.asarray( villain, dtype=numpy.float32 )
+        weights = self.disjoint.dot( villain )
+        with numpy.errstate( invalid='ignore', divide='ignore' ):
+            return numpy.dot( self.equities, villain ) / weights
+
+    def classMatrix(self):
+        '''Equity of every class against every other, by CLASSES index'''
+        weights = CLASS_COMBOS.T.dot( self.disjoint ).dot( CLASS_COMBOS )
+        return CLASS_COMBOS.T.dot( numpy.dot( self.equities, CLASS_COMBOS ) ) / weights
@@ -1,15 +1,147 @@
 #!/usr/bin/python
-import parser
+'''
+Parses hand history files, folders and globs on a pool of worker
+processes and reports throughput. A file that fails to parse is
+recorded and reported at the end instead of stopping the run.
+'''
+import argparse
+import glob
+import multiprocessing
 import os
 import os.path
+import sys
+import time
 
-HAND_HISTORY_PATH = "/home/msharman/HandHistory/antler88"
+from parser.cache import HandCache
+from parser.ingest import ingestFile
 
-for f in os.listdir( HAND_HISTORY_PATH ):
-    path = os.path.join( HAND_HISTORY_PATH, f )
+MB = 1024.0 * 1024.0
+
+def expandPaths( paths ):
+    '''Expands globs and walks folders, yielding each file once'''
+    seen = set()
+    for pattern in paths:
+        for path in sorted( glob.glob( pattern ) ) or [ pattern ]:
+            if os.path.isdir( path ):
+                for root, dirs, files in os.walk( path ):
+                    dirs.sort()
+                    for f in sorted( files ):
+                        candidate = os.path.join( root, f )
+                        if candidate not in seen:
+                            seen.add( candidate )
+                            yield candidate
+            elif os.path.isfile( path ) and path not in seen:
+                seen.add( path )
+                yield path
+
+class Progress(object):
+    '''Accumulates results and prints throughput as they arrive'''
+    def __init__(self, total, out, interval=1.0):
+        self.total = total
+        self.out = out
+        self.interval = interval
+        self.start = time.time()
+        self.last = 0
+        self.files = 0
+        self.hands = 0
+        self.bytes = 0
+        self.cached = 0
+        self.duplicates = 0
+        self.skipped = []
+        self.failures = []
+        self.badHands = []
+        self.potProblems = []
+
+    def add(self, result, duplicates=0):
+        self.files += 1
+        self.hands += result.hands - duplicates
+        self.duplicates += duplicates
+        self.bytes += result.size
+        if result.cached:
+            self.cached += 1
+        self.badHands.extend( [ ( result.file_name, ) + bad for bad in result.badHands ] )
+        self.potProblems.extend( [ ( result.file_name, ) + bad for bad in result.potProblems ] )
+        if result.error is not None:
+            self.failures.append( result )
+        elif not result.recognised:
+            self.skipped.append( result )
+        now = time.time()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report( '\r' )
+
+    def report(self, end):
+        elapsed = max( time.time() - self.start, 1e-6 )
+        self.out.write( "[%d/%d files, %d cached] %d hands, %d duplicates, %d bad hands, %d failed | %.1f files/s, %.0f hands/s, %.2f MB/s%s"%(
+            self.files, self.total, self.cached, self.hands, self.duplicates, len(self.badHands), len(self.failures),
+            self.files / elapsed, self.hands / elapsed, self.bytes / MB / elapsed, end ) )
+        self.out.flush()
+
+def main( argv ):
+    args = argparse.ArgumentParser( description = 'Parse poker hand history files.' )
+    args.add_argument( 'paths', nargs = '+', help = 'files, folders or glob patterns' )
+    args.add_argument( '-j', '--workers', type = int, default = multiprocessing.cpu_count(),
+                       help = 'number of worker processes (default: one per CPU)' )
+    args.add_argument( '--engine', choices = [ 'scanner', 'regex' ], default = None,
+                       help = 'parsing engine to use' )
+    args.add_argument( '--check-pots', action = 'store_true',
+                       help = 'work out the pots of every hand and check them against its summary' )
+    args.add_argument( '--cache', metavar = 'FOLDER', default = None,
+                       help = 'keep parsed hands in FOLDER and only parse new or changed files' )
+    args.add_argument( '--cache-size', metavar = 'MB', type = int, default = 512,
+                       help = 'evict the least recently used entries beyond this size (default: 512)' )
+    args.add_argument( '--dedup', metavar = 'FILE', default = None,
+                       help = 'remember the hands seen in FILE and drop hands seen before, in this run or earlier ones' )
+    opts = args.parse_args( argv )
+
+    files = list( expandPaths( opts.paths ) )
+    progress = Progress( len(files), sys.stdout )
+    if opts.cache is not None:
+        # create the folder before the workers race to
+        store = HandCache( opts.cache, opts.cache_size * 1024 * 1024 )
+    seen = None
+    if opts.dedup is not None:
+        # dedup needs NumPy, plain ingestion doesn't
+        from parser.dedup import SeenHands
+        seen = SeenHands( opts.dedup )
+    pool = multiprocessing.Pool( opts.workers )
     try:
-	print "Parsing %s:"%f
-        parser.parseFile( path  )
-    except Exception as e:
-        print "Exception parsing %s: %s"%(f,e)
-        exit()
+        tasks = [ ( f, opts.engine, opts.cache, opts.check_pots ) for f in files ]
+        for result in pool.imap_unordered( ingestFile, tasks, chunksize = 8 ):
+            duplicates = 0
+            if seen is not None and result.handIds:
+                duplicates = len( result.handIds ) - int( seen.addMany( result.handIds ).sum() )
+            progress.add( result, duplicates )
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    progress.report( '\n' )
+    if opts.cache is not None:
+        store.evict()
+    if seen is not None:
+        seen.save()
+
+    if progress.skipped:
+        print "Skipped %d unrecognised files"%len(progress.skipped)
+    if progress.duplicates:
+        print "Dropped %d hands seen before"%progress.duplicates
+    if progress.badHands:
+        print "Skipped %d hands that failed to parse:"%len(progress.badHands)
+        for ( file_name, hand_id, offset, message ) in sorted( progress.badHands ):
+            print "  %s at offset %s: %s"%( file_name, offset, message )
+    if progress.potProblems:
+        print "%d hands don't add up to their summary:"%len(progress.potProblems)
+        for ( file_name, position, problems ) in sorted( progress.potProblems ):
+            print "  %s hand %d: %s"%( file_name, position + 1, '; '.join( problems ) )
+    if progress.failures:
+        print "Failed to parse %d files:"%len(progress.failures)
+        for result in sorted( progress.failures, key = lambda r: r.file_name ):
+            print "  %s: %s"%( result.file_name, result.error )
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main( sys.argv[1:] ) )
@@ -1,6 +1,6 @@
-from handparser import parseFile
+from handparser import parseFile, iterHands, iterFolderHands
 
+import handparser
 
-# In future plan is to have all plugins loaded dynamically
-import pokerstars
-
+# Plugins are only imported once a file matches their signature
+handparser.declareParserPlugin( '.pokerstars', 'PokerStarsHandParser', r'\s*PokerStars (?:Hand|Game) #' )
@@ -0,0 +1,24 @@
+'''
+Replaces files that are saved again and again, like checkpoints, cache
+entries and indexes, without leaving half written files behind.
+
+The new contents are written to a temporary file next to the old one,
+which is then renamed over it. On POSIX systems the rename is atomic: a
+crash leaves either the old file or the new one. Python 2 on Windows
+can't rename over an existing file, so there the old file is removed
+first, and a crash between the remove and the rename loses the file
+(the new contents are still in the temporary file). Everything saved
+this way can be worked out again, so that is a lost checkpoint or cache
+entry, not lost data.
+
+    tmp = file_name + '.tmp'
+    ... write tmp ...
+    replaceFile( tmp, file_name )
+'''
+import os
+
+def replaceFile( tmp, dest ):
+    '''Moves the file tmp to dest, replacing dest if it exists'''
+    if os.name == 'nt' and os.path.exists( dest ):
+        os.remove( dest )
+    os.rename( tmp, dest )
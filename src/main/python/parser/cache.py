@@ -0,0 +1,175 @@
+'''
+Keeps the parsed hands of history files on disk between runs.
+
+Closed tournament files never change, so once a file has been parsed its
+hands are pickled, compressed and stored in a cache folder under a name
+derived from the file's path. An entry is only used while the file's
+size and modification time (and, if asked for, a hash of its contents)
+still match the fingerprint stored with it; anything else is parsed
+again and the entry replaced. Entries are written to a temporary file
+and renamed so several processes can share a cache folder.
+
+The cache is bounded: evict() removes the least recently used entries
+until the folder fits in max_bytes, and put calls it once the entries
+it knows of go over. Loading an entry touches it, so the modification
+times of the entries double as their last use.
+'''
+import cPickle
+import hashlib
+import os
+import zlib
+
+import handparser
+from atomic import replaceFile
+
+# Default bound on the size of the cache folder
+MAX_BYTES = 512 * 1024 * 1024
+
+# Bumped whenever the model classes change in ways old pickles can't follow
+VERSION = 6
+
+ENTRY_SUFFIX = '.hands'
+
+def contentHash( file_name ):
+    h = hashlib.sha1()
+    f = open( file_name, 'rb' )
+    try:
+        while True:
+            block = f.read( 1 << 20 )
+            if not block:
+                break
+            h.update( block )
+    finally:
+        f.close()
+    return h.hexdigest()
+
+class HandCache(object):
+    '''Parsed hands of history files, stored in a folder'''
+    def __init__(self, folder, max_bytes=MAX_BYTES, verify=False):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.verify = verify # also compare a hash of the file contents
+        self.hits = 0
+        self.misses = 0
+        self.total = None # bytes of entries at the last scan of the folder and put since
+        if not os.path.isdir( folder ):
+            os.makedirs( folder )
+
+    def entryName(self, file_name):
+        path = os.path.abspath( file_name )
+        # byte string paths are hashed as they are, they may not be ASCII
+        if isinstance( path, unicode ):
+            path = path.encode( 'utf_8' )
+        key = hashlib.sha1( path ).hexdigest()
+        return os.path.join( self.folder, key + ENTRY_SUFFIX )
+
+    def fingerprint(self, file_name):
+        st = os.stat( file_name )
+        if self.verify:
+            return ( VERSION, st.st_size, st.st_mtime, contentHash( file_name ) )
+        return ( VERSION, st.st_size, st.st_mtime )
+
+    def get(self, file_name):
+        '''Returns the cached ( hands, errors ) of a file, or None if the
+        file isn't cached or has changed since'''
+        entry = self.entryName( file_name )
+        try:
+            f = open( entry, 'rb' )
+        except IOError:
+            return None
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        try:
+            ( fingerprint, hands, errors ) = cPickle.loads( zlib.decompress( data ) )
+        except Exception:
+            # a damaged or outdated entry is just a miss
+            return None
+        if fingerprint != self.fingerprint( file_name ):
+            return None
+        try:
+            os.utime( entry, None )
+        except OSError:
+            pass
+        return ( hands, errors )
+
+    def put(self, file_name, fingerprint, hands, errors):
+        entry = self.entryName( file_name )
+        data = zlib.compress( cPickle.dumps( ( fingerprint, hands, errors ), 2 ), 6 )
+        try:
+            replaced = os.path.getsize( entry )
+        except OSError:
+            replaced = 0
+        tmp = '%s.%d.tmp'%( entry, os.getpid() )
+        f = open( tmp, 'wb' )
+        try:
+            f.write( data )
+        finally:
+            f.close()
+        replaceFile( tmp, entry )
+        if self.total is None:
+            self.total = self.size()
+        else:
+            self.total += len( data ) - replaced
+        if self.total > self.max_bytes:
+            self.evict()
+
+    def parseFile(self, file_name, engine=None, errors=None):
+        '''Like handparser.parseFile but loads unchanged files from the cache'''
+        cached = self.get( file_name )
+        if cached is not None:
+            self.hits += 1
+            ( hands, failed ) = cached
+        else:
+            self.misses += 1
+            # take the fingerprint first so a file written to while it is
+            # parsed is parsed again next time
+            fingerprint = self.fingerprint( file_name )
+            failed = []
+            hands = handparser.parseFile( file_name, engine, failed )
+            self.put( file_name, fingerprint, hands, failed )
+        if failed:
+            if errors is None:
+                raise failed[0]
+            errors.extend( failed )
+        return hands
+
+    def size(self):
+        '''Total size of the entries in bytes'''
+        return sum( size for ( used, size, entry ) in self.entries() )
+
+    def entries(self):
+        found = []
+        for name in os.listdir( self.folder ):
+            if name.endswith( ENTRY_SUFFIX ):
+                entry = os.path.join( self.folder, name )
+                try:
+                    st = os.stat( entry )
+                except OSError:
+                    continue
+                found.append( ( st.st_mtime, st.st_size, entry ) )
+        return found
+
+    def evict(self, max_bytes=None):
+        '''Removes the least recently used entries until the cache fits in
+        max_bytes, returning the number of entries removed'''
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = sorted( self.entries() )
+        total = sum( size for ( used, size, entry ) in entries )
+        removed = 0
+        for ( used, size, entry ) in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove( entry )
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self.total = total
+        return removed
+
+    def clear(self):
+        return self.evict( 0 )
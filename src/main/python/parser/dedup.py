@@ -0,0 +1,181 @@
+'''
+Remembers which hands have been imported so hands that turn up again,
+in overlapping exports or files downloaded twice, can be dropped.
+
+Hands are known by the site's hand number. The numbers seen are kept as
+a sorted NumPy array with a Bloom filter in front of it: a hand the
+filter has never seen is new without looking any further, which is
+nearly every new hand, and only hands the filter might have seen are
+looked up in the array. Numbers added since the array was last merged
+wait in a small set, so memory stays at about eight bytes per hand plus
+the filter's ten bits rather than a Python object per hand. Everything
+is saved to a single .npz file.
+
+    seen = SeenHands( 'imported.npz' )
+    for hand in seen.filter( parser.iterHands( file_name ) ):
+        ...
+    seen.save()
+'''
+import math
+import os
+
+import numpy
+
+from atomic import replaceFile
+
+# Hands the filter is sized for at first, it doubles when full
+CAPACITY = 1 << 20
+# Chance of the filter sending a new hand to the exact check
+FALSE_POSITIVES = 0.01
+# New numbers kept in a set before they are merged into the array
+PENDING = 1 << 16
+
+_WORD = ( 1 << 64 ) - 1
+
+def _mix( x ):
+    '''The splitmix64 finaliser on an array of uint64, spreads the bits of
+    hand numbers, which are close together, over the whole word'''
+    x = ( x ^ ( x >> numpy.uint64(30) ) ) * numpy.uint64( 0xbf58476d1ce4e5b9 )
+    x = ( x ^ ( x >> numpy.uint64(27) ) ) * numpy.uint64( 0x94d049bb133111eb )
+    return x ^ ( x >> numpy.uint64(31) )
+
+def _mixOne( x ):
+    '''_mix of a single number, without the cost of making an array'''
+    x &= _WORD
+    x = ( ( x ^ ( x >> 30 ) ) * 0xbf58476d1ce4e5b9 ) & _WORD
+    x = ( ( x ^ ( x >> 27 ) ) * 0x94d049bb133111eb ) & _WORD
+    return x ^ ( x >> 31 )
+
+class SeenHands(object):
+    '''A persistent set of hand numbers'''
+    def __init__(self, file_name=None, capacity=CAPACITY, falsePositives=FALSE_POSITIVES):
+        self.file_name = file_name
+        self.falsePositives = falsePositives
+        self.ids = numpy.zeros( 0, dtype=numpy.int64 ) # sorted
+        self.pending = set()
+        if file_name is not None and os.path.exists( file_name ):
+            saved = numpy.load( file_name )
+            try:
+                self.ids = saved['ids']
+                self.bloom = saved['bloom']
+                ( self.bits, self.hashes, self.capacity ) = [ int(n) for n in saved['sizes'] ]
+            finally:
+                saved.close()
+        else:
+            self.size( capacity )
+
+    def size(self, capacity):
+        '''Makes a filter for capacity hands and fills it with those seen'''
+        self.capacity = capacity
+        self.bits = int( math.ceil( -capacity * math.log( self.falsePositives ) / math.log(2) ** 2 ) )
+        self.hashes = max( 1, int( round( float( self.bits ) / capacity * math.log(2) ) ) )
+        self.bloom = numpy.zeros( ( self.bits + 7 ) // 8, dtype=numpy.uint8 )
+        self._set( self.ids )
+        self._set( numpy.fromiter( self.pending, dtype=numpy.int64, count=len( self.pending ) ) )
+
+    def _positions(self, ids):
+        '''Filter bits of each number, an ( n, hashes ) array'''
+        with numpy.errstate( over='ignore' ):
+            h = _mix( ids.astype( numpy.uint64 ) )
+            h1 = h >> numpy.uint64(32)
+            h2 = ( h & numpy.uint64( 0xffffffff ) ) | numpy.uint64(1)
+            steps = numpy.arange( self.hashes, dtype=numpy.uint64 )
+            return ( ( h1[:,None] + steps[None,:] * h2[:,None] ) % numpy.uint64( self.bits ) ).astype( numpy.int64 )
+
+    def _set(self, ids):
+        if len( ids ) == 0:
+            return
+        p = self._positions( ids ).ravel()
+        numpy.bitwise_or.at( self.bloom, p >> 3, ( 1 << ( p & 7 ) ).astype( numpy.uint8 ) )
+
+    def _maybe(self, ids):
+        '''False for the numbers the filter has certainly not seen'''
+        p = self._positions( ids )
+        return ( ( self.bloom[ p >> 3 ] >> ( p & 7 ).astype( numpy.uint8 ) ) & 1 ).all( axis=1 )
+
+    def __len__(self):
+        return len( self.ids ) + len( self.pending )
+
+    def __contains__(self, handId):
+        handId = int( handId )
+        bloom = self.bloom
+        return all( bloom[ p >> 3 ] & ( 1 << ( p & 7 ) ) for p in self._positionsOf( handId ) ) \
+               and self._exact( handId )
+
+    def _seen(self, ids):
+        seen = self._maybe( ids )
+        # the exact check for the few the filter lets through
+        for i in numpy.flatnonzero( seen ):
+            seen[i] = self._exact( int( ids[i] ) )
+        return seen
+
+    def _exact(self, handId):
+        at = numpy.searchsorted( self.ids, handId )
+        return ( at < len( self.ids ) and self.ids[at] == handId ) or handId in self.pending
+
+    def _positionsOf(self, handId):
+        h = _mixOne( handId )
+        ( h1, h2 ) = ( h >> 32, ( h & 0xffffffff ) | 1 )
+        return [ ( ( h1 + i * h2 ) & _WORD ) % self.bits for i in range( self.hashes ) ]
+
+    def add(self, handId):
+        '''Adds a hand number, returning False if it was already seen'''
+        handId = int( handId )
+        bloom = self.bloom
+        positions = self._positionsOf( handId )
+        if all( bloom[ p >> 3 ] & ( 1 << ( p & 7 ) ) for p in positions ) and self._exact( handId ):
+            return False
+        if len( self ) >= self.capacity:
+            self.addMany( [ handId ] )
+            return True
+        for p in positions:
+            bloom[ p >> 3 ] |= 1 << ( p & 7 )
+        self.pending.add( handId )
+        if len( self.pending ) >= PENDING:
+            self.merge()
+        return True
+
+    def addMany(self, handIds):
+        '''Adds hand numbers, returning a boolean array of which were new.
+        A number that appears twice is only new the first time.'''
+        ids = numpy.asarray( handIds, dtype=numpy.int64 )
+        new = ~self._seen( ids )
+        ( unique, first ) = numpy.unique( ids, return_index=True )
+        once = numpy.zeros( len( ids ), dtype=bool )
+        once[first] = True
+        new &= once
+        added = ids[new]
+        if len( self ) + len( added ) > self.capacity:
+            self.merge()
+            capacity = self.capacity
+            while len( self ) + len( added ) > capacity:
+                capacity *= 2
+            self.size( capacity )
+        self._set( added )
+        self.pending.update( added.tolist() )
+        if len( self.pending ) >= PENDING:
+            self.merge()
+        return new
+
+    def filter(self, hands):
+        '''Yields the hands not seen before, adding them as it goes. Hands
+        without a number are always yielded.'''
+        for hand in hands:
+            if hand.handId is None or self.add( hand.handId ):
+                yield hand
+
+    def merge(self):
+        '''Moves the pending numbers into the sorted array'''
+        if self.pending:
+            pending = numpy.fromiter( self.pending, dtype=numpy.int64, count=len( self.pending ) )
+            self.ids = numpy.concatenate( [ self.ids, pending ] )
+            self.ids.sort()
+            self.pending = set()
+
+    def save(self, file_name=None):
+        file_name = file_name or self.file_name
+        self.merge()
+        # numpy.savez adds .npz to names without it
+        tmp = '%s.%d.tmp.npz'%( file_name, os.getpid() )
+        numpy.savez( tmp, ids=self.ids, bloom=self.bloom, sizes=numpy.array( [ self.bits, self.hashes, self.capacity ] ) )
+        replaceFile( tmp, file_name )
@@ -0,0 +1,163 @@
+'''
+Indexes the hands of a history file so single hands can be parsed
+without reading the file from the top.
+
+Building an index only looks at the hand header lines: a regular
+expression over a memory map of the file picks out the hand number,
+tournament number, level and time of each hand together with its byte
+range. The index is saved as JSON next to the file (file name + .idx)
+along with the size and modification time of the file it describes.
+A saved index is reused while the file is unchanged; if the file has
+only grown, as a tournament in progress does, just the new part is
+scanned.
+'''
+import json
+import mmap
+import os
+
+import handparser
+from atomic import replaceFile
+
+INDEX_SUFFIX = '.idx'
+
+# Bumped whenever the layout of the saved index changes
+VERSION = 1
+
+class HandIndex(object):
+    '''Byte ranges and header fields of the hands in a file'''
+    def __init__(self, file_name, plugin=None):
+        self.file_name = file_name
+        self.plugin = plugin
+        self.size = 0
+        self.mtime = None
+        # ( hand id, tournament id, level, time, start, end ) in file order
+        self.hands = []
+        self.positions = {} # hand id -> position in hands
+
+    def __len__(self):
+        return len( self.hands )
+
+    def indexFileName(self):
+        return self.file_name + INDEX_SUFFIX
+
+    def findPlugin(self):
+        if self.plugin is None:
+            self.plugin = handparser.findPluginForFile( self.file_name )
+            if self.plugin is None:
+                raise handparser.HandParsingException( None, 1, 1, 'No parser recognises %s'%self.file_name )
+        return self.plugin
+
+    def update(self):
+        '''Brings the index up to date with the file, returning True if
+        anything had to be scanned'''
+        st = os.stat( self.file_name )
+        if st.st_size == self.size and st.st_mtime == self.mtime:
+            return False
+        if st.st_size > self.size and len( self.hands ) > 0:
+            # the file has grown; the last hand may have been incomplete
+            # so scan again from its start
+            start = self.hands[-1][4]
+            del self.hands[-1]
+        else:
+            start = 0
+            self.hands = []
+        self.scan( start, st.st_size )
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.positions = dict( ( h[0], i ) for ( i, h ) in enumerate( self.hands ) )
+        return True
+
+    def scan(self, start, size):
+        if size == 0:
+            return
+        header = self.findPlugin().INDEX_HEADER
+        f = open( self.file_name, 'rb' )
+        try:
+            data = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
+            try:
+                found = []
+                # from the new line before start, which the header includes
+                for m in header.finditer( data, max( start - 1, 0 ) ):
+                    found.append( ( int( m.group('hand') ),
+                                    m.group('tournament') and int( m.group('tournament') ),
+                                    m.group('level'), m.group('time'), m.start('hand_start') ) )
+            finally:
+                data.close()
+        finally:
+            f.close()
+        for i in range( len(found) ):
+            if i + 1 < len(found):
+                end = found[i+1][4]
+            else:
+                end = size
+            self.hands.append( found[i] + ( end, ) )
+
+    def load(self):
+        '''Reads the saved index, returning False if there is none usable'''
+        try:
+            f = open( self.indexFileName(), 'rb' )
+        except IOError:
+            return False
+        try:
+            try:
+                saved = json.load( f )
+            except ValueError:
+                return False
+        finally:
+            f.close()
+        if saved.get( 'version' ) != VERSION:
+            return False
+        self.size = saved['size']
+        self.mtime = saved['mtime']
+        self.hands = [ tuple(h) for h in saved['hands'] ]
+        self.positions = dict( ( h[0], i ) for ( i, h ) in enumerate( self.hands ) )
+        return True
+
+    def save(self):
+        saved = { 'version': VERSION, 'size': self.size, 'mtime': self.mtime, 'hands': self.hands }
+        tmp = self.indexFileName() + '.tmp'
+        f = open( tmp, 'wb' )
+        try:
+            json.dump( saved, f, separators=( ',', ':' ) )
+        finally:
+            f.close()
+        replaceFile( tmp, self.indexFileName() )
+
+    def position(self, hand_id):
+        '''Position of a hand in the file, or None if it isn't there'''
+        return self.positions.get( hand_id )
+
+    def readHand(self, position):
+        '''The undecoded bytes of the hand at a position'''
+        ( start, end ) = self.hands[position][4:6]
+        f = open( self.file_name, 'rb' )
+        try:
+            f.seek( start )
+            return f.read( end - start )
+        finally:
+            f.close()
+
+    def parseHand(self, position, engine=None):
+        '''Parses just the hand at a position (counting from 0)'''
+        parser = self.findPlugin()( None )
+        parser.parseBytes( self.readHand( position ) )
+        try:
+            return parser.parseHand( engine )
+        finally:
+            parser.close()
+
+    def parseHandById(self, hand_id, engine=None):
+        '''Parses just the hand with a hand number'''
+        position = self.position( hand_id )
+        if position is None:
+            raise KeyError( hand_id )
+        return self.parseHand( position, engine )
+
+def openIndex( file_name, save=True ):
+    '''Returns the index of a file, loading the saved index and scanning
+    only what changed since it was saved'''
+    index = HandIndex( file_name )
+    index.load()
+    if index.update() and save:
+        index.save()
+    return index
@@ -1,28 +1,130 @@
+import calendar
+import codecs
+import importlib
+import os
+import re
+
+# Plugins that are imported up front and asked canParseFile in turn
 _parserPlugins = []
 
+# Plugins declared by signature, imported the first time a file matches.
+# Each entry is [ module, class name, signature, class once loaded ]
+_declaredPlugins = []
+
+# Bytes read from the start of a file to recognise its format
+SNIFF_SIZE = 512
+
+def wallClockSeconds( year, month, day, hour, minute, second ):
+    '''A date and time on a wall clock as seconds since 1970 on the same
+    clock, which sorts and subtracts like the times it stands for'''
+    return calendar.timegm( ( year, month, day, hour, minute, second ) )
+
 def registerParserPlugin( p ):
     _parserPlugins.append( p )
-    
+
+def declareParserPlugin( module, class_name, signature ):
+    '''Declares a plugin without importing it. The module name is
+    relative to this package and signature is a regular expression
+    matched against the raw bytes at the start of a file, after any
+    byte order mark.'''
+    _declaredPlugins.append( [ module, class_name, re.compile( signature ), None ] )
+
+def sniff( head ):
+    '''Returns the declared plugin class whose signature matches the
+    first bytes of a file, importing it if needed, or None'''
+    if head.startswith( codecs.BOM_UTF8 ):
+        head = head[len(codecs.BOM_UTF8):]
+    for decl in _declaredPlugins:
+        if decl[2].match( head ):
+            if decl[3] is None:
+                module = importlib.import_module( decl[0], __name__.rpartition('.')[0] )
+                decl[3] = getattr( module, decl[1] )
+            return decl[3]
+
+def findPluginForFile( file_name ):
+    f = open( file_name, 'rb' )
+    try:
+        p = sniff( f.read( SNIFF_SIZE ) )
+    finally:
+        f.close()
+    if p is not None:
+        return p
+    for p in _parserPlugins:
+        if p.canParseFile( file_name):
+            return p
+
 def findParserForFile( file_name):
+    '''Returns a parser for the file or None if no plugin recognises it.
+    The file is opened once and the parser reads from the same handle
+    that was used to recognise it.'''
+    f = open( file_name, 'rb' )
+    try:
+        p = sniff( f.read( SNIFF_SIZE ) )
+        if p is not None:
+            f.seek(0)
+            return p(f)
+    except:
+        # the parser didn't take the handle over
+        f.close()
+        raise
+    f.close()
     for p in _parserPlugins:
         if p.canParseFile( file_name):
             return p(file_name)
-        
-def parseFile( file_name):
+
+def parseFile( file_name, engine=None, errors=None ):
+    return list( iterHands( file_name, engine, errors ) )
+
+def iterHands( file_name, engine=None, errors=None ):
+    '''Yields the hands of a file one at a time as they are parsed, so
+    memory use doesn't grow with the size of the file.
+
+    By default the first hand that fails to parse raises a
+    HandParsingException. If errors is a list the exception is appended
+    to it instead, the parser skips to the next hand and carries on.'''
     parser = findParserForFile( file_name )
-    hands = []
-    while parser.moreHands():
-        hands.append( parser.parseHand())
-    return hands  
+    if parser is None:
+        raise HandParsingException( None, 1, 1, 'No parser recognises %s'%file_name )
+    return iterParser( parser, engine, errors )
+
+def iterParser( parser, engine=None, errors=None ):
+    try:
+        while parser.moreHands():
+            try:
+                hand = parser.parseHand(engine)
+            except HandParsingException as e:
+                if errors is None:
+                    raise
+                errors.append( e )
+                parser.skipHand()
+                continue
+            yield hand
+    finally:
+        parser.close()
+
+def iterFolderHands( folder, engine=None, errors=None ):
+    '''Yields the hands of every file in a folder in file name order,
+    skipping files that no parser recognises'''
+    for f in sorted( os.listdir( folder ) ):
+        path = os.path.join( folder, f )
+        if os.path.isfile( path ):
+            parser = findParserForFile( path )
+            if parser is not None:
+                for hand in iterParser( parser, engine, errors ):
+                    yield hand
 
 class HandParsingException(Exception):
     ''' Describes an exception parsing a poker history file'''
-    def __init__(self, hand_id, line_num, char_num, message ):
+    def __init__(self, hand_id, line_num, char_num, message, offset=None ):
+        Exception.__init__(self, hand_id, line_num, char_num, message, offset)
         self.line_num = line_num
         self.char_num = char_num
         self.hand_id = hand_id
         self.message = message
+        self.offset = offset # of the start of the hand in the file
     def __str__(self):
+        if self.hand_id is not None:
+            return "Error parsing hand #%s at line %d, column %d: %s"%(self.hand_id,self.line_num,self.char_num,self.message)
         return "Error parsing hand at line %d, column %d: %s"%(self.line_num,self.char_num,self.message)
 
 class HandParser(object):
@@ -33,10 +135,19 @@ class HandParser(object):
     
     @staticmethod    
     def canParseFile( file_name ):
-        raise Exception('Not implemented') # should return a boolean
+        raise Exception('Not implemented') # should return a boolean, only asked
+                                           # of plugins registered with registerParserPlugin
     
     def moreHands(self):
         raise Exception('Not implemented') # return an bool
     
-    def parseHand(self):
-        return Exception('Not implemented') # should return a Hand
+    def close(self):
+        pass # release any open files
+
+    def skipHand(self):
+        raise Exception('Not implemented') # should move on to the next hand after
+                                           # one that failed to parse
+
+    def parseHand(self, engine=None):
+        return Exception('Not implemented') # should return a Hand, engine selects
+                                            # between parsing engines if a plugin has several
@@ -0,0 +1,59 @@
+'''
+Parses whole files for ingestion runs like parse_history.py.
+
+Each file is parsed on its own by a worker process and comes back as a
+FileResult, a summary that is cheap to send back to the parent: how many
+hands it held, the hands that failed to parse, the hand numbers for
+deduplication and any pot problems. A file that fails is recorded in its
+result instead of raising, so one bad file can't stop a run.
+'''
+import os
+
+import cache
+import handparser
+import pots
+
+class FileResult(object):
+    '''What parsing a single file during ingestion came to'''
+    def __init__(self, file_name, size):
+        self.file_name = file_name
+        self.size = size           # bytes
+        self.recognised = True     # False if no parser knows the format
+        self.hands = 0             # number of hands parsed
+        self.error = None          # message if parsing failed
+        self.badHands = []         # ( hand id, offset, message ) of hands skipped
+        self.cached = False        # True if the hands came from the cache
+        self.potProblems = []      # ( position, problems ) of hands whose pots don't add up
+        self.handIds = []          # the site's numbers of the hands parsed, for deduplication
+
+def ingestFile( task ):
+    '''Parses one file for the ingestion pool. Failures are recorded in
+    the result rather than raised so one bad file can't stop a run, and
+    a hand that fails to parse only costs that hand. If a cache folder
+    is given, unchanged files are loaded from it. If checkPots is set the
+    pots of every hand are worked out and checked against its summary.'''
+    ( file_name, engine, cache_folder, checkPots ) = task
+    result = FileResult( file_name, os.path.getsize( file_name ) )
+    try:
+        if handparser.findPluginForFile( file_name ) is None:
+            result.recognised = False
+            return result
+        errors = []
+        if cache_folder is not None:
+            store = cache.HandCache( cache_folder )
+            hands = store.parseFile( file_name, engine, errors )
+            result.cached = store.hits > 0
+        else:
+            hands = handparser.iterHands( file_name, engine, errors )
+        for hand in hands:
+            if checkPots:
+                problems = pots.computePots( hand )
+                if problems:
+                    result.potProblems.append( ( result.hands, problems ) )
+            if hand.handId is not None:
+                result.handIds.append( hand.handId )
+            result.hands += 1
+        result.badHands = [ ( e.hand_id, e.offset, str(e) ) for e in errors ]
+    except Exception as e:
+        result.error = '%s: %s'%( type(e).__name__, e )
+    return result
@@ -0,0 +1,102 @@
+'''
+Parses hand history files on several processes at once.
+
+Hands are independent of each other, so a file is cut into chunks of
+whole hands at the hand headers. The parent only scans a memory map of
+the file for the headers; each worker reads its own byte range and
+parses the bytes. Chunks are handed back in order, so
+the hands come out exactly as parseFile would return them.
+'''
+import mmap
+import multiprocessing
+import os
+
+import handparser
+
+# Hands parsed by one task, large enough to amortise the pickling of
+# each task but small enough to keep every process busy
+HANDS_PER_CHUNK = 256
+
+def splitFile( file_name, plugin, handsPerChunk=HANDS_PER_CHUNK ):
+    '''Returns the (start, end) byte ranges of chunks of whole hands'''
+    size = os.path.getsize( file_name )
+    if size == 0:
+        return []
+    f = open( file_name, 'rb' )
+    try:
+        data = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
+        try:
+            # Hand starts are the character after the new line
+            starts = [ m.start() + 1 for m in plugin.HAND_START.finditer( data ) ]
+        finally:
+            data.close()
+    finally:
+        f.close()
+    bounds = [0] + starts[handsPerChunk-1::handsPerChunk] + [size]
+    return [ ( bounds[i], bounds[i+1] ) for i in range( len(bounds) - 1 ) if bounds[i] < bounds[i+1] ]
+
+def readChunk( file_name, start, end ):
+    f = open( file_name, 'rb' )
+    try:
+        f.seek( start )
+        return f.read( end - start )
+    finally:
+        f.close()
+
+def parseChunk( task ):
+    ( plugin, file_name, start, end, engine ) = task
+    parser = plugin( None )
+    parser.parseBytes( readChunk( file_name, start, end ) )
+    hands = []
+    try:
+        while parser.moreHands():
+            hands.append( parser.parseHand( engine ) )
+    except handparser.HandParsingException as e:
+        # Report the position within the file rather than the chunk
+        if start > 0:
+            e.line_num += readChunk( file_name, 0, start ).count( '\n' )
+            if e.offset is not None:
+                e.offset += start
+        raise
+    return hands
+
+def tasksForFile( file_name, engine, handsPerChunk, plugin ):
+    return [ ( plugin, file_name, start, end, engine )
+             for ( start, end ) in splitFile( file_name, plugin, handsPerChunk ) ]
+
+def parseTasks( tasks, processes, pool ):
+    own = pool is None
+    if own:
+        pool = multiprocessing.Pool( processes )
+    try:
+        hands = []
+        for chunk in pool.imap( parseChunk, tasks ):
+            hands.extend( chunk )
+        return hands
+    finally:
+        if own:
+            pool.close()
+            pool.join()
+
+def parseFileParallel( file_name, processes=None, engine=None, handsPerChunk=HANDS_PER_CHUNK, pool=None ):
+    '''Like parseFile but parses chunks of the file on a pool of
+    processes, one per CPU unless processes says otherwise. An existing
+    multiprocessing pool can be passed in to avoid starting a new one.'''
+    plugin = handparser.findPluginForFile( file_name )
+    if plugin is None:
+        raise handparser.HandParsingException( None, 1, 1, 'No parser recognises %s'%file_name )
+    return parseTasks( tasksForFile( file_name, engine, handsPerChunk, plugin ), processes, pool )
+
+def parseFolderParallel( folder, processes=None, engine=None, handsPerChunk=HANDS_PER_CHUNK, pool=None ):
+    '''Parses every file in a folder in parallel, returning the hands of
+    the files in file name order. Chunks never span files, so small files
+    are parsed side by side and large ones are split across processes.
+    Files that no parser recognises are skipped.'''
+    tasks = []
+    for f in sorted( os.listdir( folder ) ):
+        path = os.path.join( folder, f )
+        if os.path.isfile( path ):
+            plugin = handparser.findPluginForFile( path )
+            if plugin is not None:
+                tasks.extend( tasksForFile( path, engine, handsPerChunk, plugin ) )
+    return parseTasks( tasks, processes, pool )
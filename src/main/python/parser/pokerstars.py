@@ -1,37 +1,133 @@
 
+import re
+
 import handparser
 import scanner
+import pokerstarsfast
 
 from pokergame import Money, Hand, Player, Card, BettingRound, Action
 
+# Alternatives tried on every line are compiled once up front
+BLIND_POSTS = scanner.Alternatives([ ': posts small blind ', ': posts big blind ', ': posts the ante '])
+LINE_ENDS = scanner.Alternatives([ '\n', ' and is all-in\n' ])
+PLAYER_LINES = scanner.Alternatives([
+    ': doesn\'t show hand ',
+    ': ', # an action is performed
+    ' said, "',
+    ' is disconnected ',
+    ' has timed out while disconnected',
+    ' has timed out while being disconnected',
+    ' is sitting out',
+    ' has timed out',
+    ' has returned',
+    ' is connected ',
+    ' collected ',
+    ' finished the tournament in ',
+    ' wins the tournament and receives ',
+    ' re-buys and receives ',
+    ' wins the '
+    ])
+ACTIONS = scanner.Alternatives(['folds', 'calls', 'checks', 'bets', 'raises', 'shows', 'mucks'])
+CARD_VALUES = scanner.Alternatives('23456789TJQKA')
+CARD_SUITS = scanner.Alternatives('cshd')
+
 class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
 
+    # Parsing engines that can be selected for each call to parseHand
+    SCANNER = 'scanner' # reads the hand token by token
+    REGEX = 'regex'     # dispatches whole lines through regular expressions,
+                        # falling back to the scanner for hands it rejects
+
+    # Where the next hand starts
+    HAND_START = re.compile( r'\nPokerStars (?:Hand|Game) #' )
+
+    # The fields of a hand header that handindex records, matched on the
+    # raw bytes of a file
+    INDEX_HEADER = re.compile( r'(?:\A(?:\xef\xbb\xbf)?|\n)(?P<hand_start>)PokerStars (?:Hand|Game) #(?P<hand>\d+): '
+                               r'(?:Tournament #(?P<tournament>\d+), )?'
+                               r'(?:[^\n]*? Level (?P<level>[IVXLCDM]+) )?'
+                               r'(?:[^\n]*? - (?P<time>\d+/\d+/\d+ \d+:\d+:\d+))?' )
+
     @staticmethod   
     def canParseFile( fileName ):
-        parser_ = PokerStarsHandParser( fileName )
-        try:
-            parser_.readHeader()
-            return True
-        except: # on any exception we assume that this parser can't recognize the file
-            return False
+        return handparser.findPluginForFile( fileName ) is PokerStarsHandParser
         
-    def __init__(self, fileName ):
+    # Files are scanned as raw bytes unless raw is False, see Scanner
+    def __init__(self, fileName, engine=SCANNER, raw=True ):
         scanner.Scanner.__init__(self)
-        self.parseFile(fileName)
+        if fileName is not None: # otherwise call parseString or parseBytes
+            self.parseFile(fileName, raw)
         self.site_name = 'PokerStars'
         self.timezones = ['AEST','ET']
         self.currencies = ['AUD', 'USD']
+        self.engine = engine
+        self.fast = None
         
     def moreHands(self):
         return not self.isEOF
 
-    def parseHand( self ):
+    def parseHand( self, engine=None ):
+        hand = None
+        if ( engine or self.engine ) == PokerStarsHandParser.REGEX:
+            hand = self.parseHandFast()
+        if hand is None:
+            hand = self.scanHand()
+        if self.raw:
+            self.decodeNames( hand )
+        return hand
+
+    # Both engines key the players by their undecoded names in raw mode;
+    # these are the only strings kept from the input so they are all
+    # that gets decoded
+    def decodeNames( self, hand ):
+        bits = {}
+        for ( name, player ) in hand.players.items():
+            player.name = self.decode( name )
+            bits[player.name] = hand.bits[name]
+        hand.players = dict( ( p.name, p ) for p in hand.players.values() )
+        # the rounds share the hand's bits
+        hand.bits.clear()
+        hand.bits.update( bits )
+
+    # Parses the next hand with the line based engine, returns None
+    # without consuming anything if the engine rejects the hand
+    def parseHandFast( self ):
+        if self.fast is None:
+            self.fast = pokerstarsfast.FastHandParser( self.currencies, self.timezones )
+        self.consumeWhitespace()
+        # move the mark to this hand, one left by a hand scanHand parsed
+        # would keep everything after it buffered
+        self.mark()
+        m = self.search( PokerStarsHandParser.HAND_START )
+        if m is None:
+            text = self.acc[self.pos:]
+        else:
+            text = self.acc[self.pos:m.start()+1]
+        try:
+            hand = self.fast.parse( text )
+        except pokerstarsfast.RejectHand:
+            return None
+        self.consume( len(text) )
+        self.consumeWhitespace()
+        return hand
+
+    def scanHand( self ):
+        # mark the header, not blank lines before it, so a failed hand
+        # is skipped past rather than found again by skipHand
+        self.consumeWhitespace()
+        self.mark()
+        self.hand_id = None
         try:
             hand = Hand()
-            self.readHeader()
+            self.readHeader(hand)
             hand.gameType = Hand.HoldEmNoLimit
             ( hand.numOfSeats, buttonPos ) = self.readTable()
             self.readInitialStacks(hand)
+            # Player names are matched on nearly every line so compile them
+            # once; tables keep the same players from hand to hand, so
+            # these usually come straight from the cache
+            self.players = scanner.compileAlternatives( hand.players.keys() )
+            self.actors = scanner.compileAlternatives( hand.players.keys() + [ 'Uncalled bet (' ] )
             self.readBlinds(hand)
             self.readHoleCards(hand)
             flop = True
@@ -44,40 +140,56 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
             self.readSummary(hand,flop)
             self.consumeWhitespace()
             return hand
-        except handparser.HandParsingException:
+        except handparser.HandParsingException as e:
+            if e.hand_id is None:
+                e.hand_id = self.hand_id
+            if e.offset is None:
+                e.offset = self.mark_offset
             raise
         except Exception as e:
-            raise handparser.HandParsingException( None, self.line_num, self.char_num,str(e) )
+            raise handparser.HandParsingException( self.hand_id, self.line_num, self.char_num,str(e), self.mark_offset )
+
+    # Skips a hand that failed to parse by searching the buffer for the
+    # next hand header after the start of the failed hand
+    def skipHand( self ):
+        self.reset()
+        m = self.search( PokerStarsHandParser.HAND_START )
+        if m is None:
+            self.pos = len(self.acc)
+            self.isEOF = True
+        else:
+            self.pos = m.start() + 1
     
     def readBlinds(self,hand):
         preflop = BettingRound()
         actions = []
-        playerSet = set( hand.players.keys() )
         
         while True:
             try:
-                pid = self.alternative(playerSet)
+                pid = self.alternative(self.players)
             except scanner.BadAlternative:
                 break
-            self.alternative( [ ': posts small blind ', ': posts big blind ', ': posts the ante '])
+            alt = self.alternative( BLIND_POSTS )
             act = Action()
-            act.action = Action.Post
+            if alt == ': posts the ante ':
+                act.action = Action.Ante
+            else:
+                act.action = Action.Post
             act.bet = self.number()
             actions.append( [pid, act] )
-            self.alternative([ '\n', ' and is all-in\n' ])
+            self.alternative( LINE_ENDS )
      
         hand.addBetRound(preflop,actions)
     
     def readHoleCards(self,hand):
         preflop = hand.rounds[0]
-        playerSet = set( hand.players.keys() )
         self.text('*** HOLE CARDS ***\n')
         self.text('Dealt to ')
-        pid = self.alternative(playerSet)
+        pid = self.alternative(self.players)
         self.text(' ')
         hand.players[pid].startingHand = self.readCards()
         self.text('\n')
-        actions = self.readBettingActions( preflop, playerSet )
+        actions = self.readBettingActions( preflop )
         hand.addBetRound(preflop,actions)
         
     def readFlop(self,hand):
@@ -87,7 +199,7 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
             flop = BettingRound()
             flop.cards = self.readCards()
             self.text('\n')
-            actions = self.readBettingActions( flop, set( hand.players.keys() ) )
+            actions = self.readBettingActions( flop )
             hand.addBetRound(flop,actions)
             return True
         else:
@@ -102,7 +214,7 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
             self.text(' ')
             turn.cards = self.readCards()
             self.text('\n')
-            actions = self.readBettingActions( turn, set( hand.players.keys() ) )
+            actions = self.readBettingActions( turn )
             hand.addBetRound(turn,actions)
             return True
         else:
@@ -117,7 +229,7 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
             self.text(' ')
             river.cards = self.readCards()
             self.text('\n')
-            actions = self.readBettingActions( river, set( hand.players.keys() ) )
+            actions = self.readBettingActions( river )
             hand.addBetRound(river,actions)
             return True
         else:
@@ -128,7 +240,7 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
         if self.peek( len(showdownText) ) == showdownText:
             self.text( showdownText )
             showdown = BettingRound()
-            actions = self.readBettingActions( showdown, set( hand.players.keys() ) )
+            actions = self.readBettingActions( showdown )
             hand.addBetRound(showdown,actions)
             return True
         else:
@@ -137,11 +249,11 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
     def readSummary(self,hand,flop):
         self.text( '*** SUMMARY ***\n' )
         self.text( 'Total pot ')
-        self.number()
+        hand.totalPot = Money( self.number() )
         self.text(' ')
         alt = self.alternative( [ 'Main pot ', '|' ] )
         if alt != '|':
-            self.number()
+            hand.summaryPots.append( Money( self.number() ) )
             while True:
                 try:
                     self.text( '. Side pot' )
@@ -151,10 +263,10 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
                     self.text('-')
                     self.number()
                 self.text(' ')
-                self.number()
+                hand.summaryPots.append( Money( self.number() ) )
             self.text( '. |')
         self.text( ' Rake ')
-        self.number()
+        hand.rake = Money( self.number() )
         self.text(' \n')
         if flop:
             self.text('Board ')
@@ -164,17 +276,17 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
             # If a seat is empty we need to skip it...
             try:
                 self.text('Seat ' + str(i+1) + ': ')
-                self.alternative(hand.players.keys())
+                self.alternative(self.players)
                 txt = self.lookaheadTill('\n')
                 self.consume( len(txt)+1 )
             except scanner.BadAlternative:
                 pass
 
-    def readBettingActions(self, betRound, livePlayers):
+    def readBettingActions(self, betRound):
         actions = []
         while True:
             try: 
-                p = self.alternative(list(livePlayers) + ['Uncalled bet (' ])
+                p = self.alternative(self.actors)
             except scanner.BadAlternative:
                 if self.peek(3) == '***': # we've finished this section
                     break
@@ -186,28 +298,11 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
             if p == 'Uncalled bet (':
                 amount = self.number()
                 self.text(') returned to ')
-                p = self.alternative(livePlayers)
-                actions.append( [p, self.collectMoney(amount) ])
+                p = self.alternative(self.players)
+                actions.append( [p, self.collectMoney(amount, Action.Return) ])
                 self.text('\n')
             else:
-                alt = self.alternative(
-                        [ 
-                         ': doesn\'t show hand ',
-                         ': ', # an action is performed
-                         ' said, "',
-                         ' is disconnected ', 
-                         ' has timed out while disconnected', 
-                         ' has timed out while being disconnected',
-                         ' is sitting out', 
-                         ' has timed out',
-                         ' has returned',
-                         ' is connected ',
-                         ' collected ',  
-                         ' finished the tournament in ',
-                         ' wins the tournament and receives ',
-                         ' re-buys and receives ',
-                         ' wins the '
-                        ])
+                alt = self.alternative( PLAYER_LINES )
                 if alt == ': ':
                     actions.append( [p, self.readAction()] )
                     self.text('\n')
@@ -239,29 +334,29 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
                     self.text('\n')
                 elif alt == ' re-buys and receives ':
                     amount = self.number()
-                    actions.append( [p, self.collectMoney(amount) ])
+                    actions.append( [p, self.collectMoney(amount, Action.Rebuy) ])
                     self.text(' chips for ')
                     self.money()
                     self.text('\n')
                 elif alt == ' wins the ':
                     self.money()
                     self.text(' bounty for eliminating ')
-                    self.alternative(livePlayers)
+                    self.alternative(self.players)
                     self.text('\n')
                 else:
                     self.text('\n')    
         return actions
 
     
-    def collectMoney(self,amount):
+    def collectMoney(self,amount,action=Action.Collect):
         act = Action()
-        act.action = Action.Collect
+        act.action = action
         act.amount = amount
         return act
     
     def readAction(self):
         act = Action()
-        txt = self.alternative(['folds', 'calls', 'checks', 'bets', 'raises', 'shows', 'mucks'])
+        txt = self.alternative( ACTIONS )
         
         if txt == 'folds' or txt == 'checks':
             self.text(' ')
@@ -322,8 +417,8 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
         return cards
 
     def readCard(self):
-        card = self.alternative('23456789TJQKA')
-        card += self.alternative('cshd')
+        card = self.alternative( CARD_VALUES )
+        card += self.alternative( CARD_SUITS )
         return Card( card )
     
     def readInitialStacks(self,hand):
@@ -363,6 +458,7 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
             # so far so good treat the rest of the string
             # as a player id
             player = Player( self.consume( len(txt) - (bs+1) ) )
+            player.seat = i+1
             
             # parse the rest as normal
             self.text(' (')
@@ -370,6 +466,7 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
             self.text(' in chips) ')
             alt = self.alternative(['\n', 'out of hand', 'is sitting out\n'])
             if alt == 'out of hand': # skip reason for out of hand
+                player.outOfHand = True
                 self.text( self.lookaheadTill('\n'))
                 self.text('\n')
             hand.addPlayer( player )
@@ -388,13 +485,13 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
         return ( tableSize, buttonPos )
         
          
-    def readHeader( self ):
+    def readHeader( self, hand ):
         self.consumeWhitespace()
         self.text('PokerStars ')
         self.alternative(['Hand #', 'Game #' ])
-        self.number()
+        self.hand_id = hand.handId = self.number()
         self.text(': Tournament #')
-        self.number()
+        hand.tournamentId = self.number()
         self.text(', ')
         if self.peek(1) == '$':
             self.money()
@@ -427,26 +524,28 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
         self.text(' ')
         self.alternative( self.timezones )
         self.text(' [')
-        self.date()
+        date = self.date()
         self.text(' ')
-        self.time()
+        time = self.time()
         self.text(' ')
         self.alternative( self.timezones )
         self.text(']\n')
+        # the time in brackets is the site's own, the same for everyone
+        hand.timestamp = handparser.wallClockSeconds( *( date + time ) )
         
     def date( self ):
-        self.number(4)
+        year = self.number(4)
         self.text('/')
-        self.number(2)
+        month = self.number(2)
         self.text('/')
-        self.number(2)
+        return ( year, month, self.number(2) )
         
     def time( self ):
-        self.number(2)
+        hour = self.number(2)
         self.text(':')
-        self.number(2)
+        minute = self.number(2)
         self.text(':')
-        self.number(2)
+        return ( hour, minute, self.number(2) )
         
     def roman( self ):
         bs = 1
@@ -471,5 +570,3 @@ class PokerStarsHandParser(scanner.Scanner,handparser.HandParser):
             return int(self.consume(bs-1))
         else:
             raise handparser.HandParsingException( None, self.line_num, self.char_num, 'Expecting a number' )
-
-handparser.registerParserPlugin( PokerStarsHandParser )
\ No newline at end of file
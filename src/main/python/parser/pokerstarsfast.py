@@ -0,0 +1,312 @@
+'''
+Line oriented fast path for PokerStars hand histories.
+
+A hand is split into lines and each line is dispatched through a small
+set of precompiled regular expressions. The dispatch mirrors the
+grammar implemented by PokerStarsHandParser line for line and builds the
+same Hand, BettingRound and Action objects. Anything the expressions
+don't recognise exactly raises RejectHand, so the caller can hand the
+text to the scanner based parser, which is the reference for what a
+valid hand looks like and how errors are reported.
+'''
+import re
+
+import handparser
+import scanner
+import pokerstars
+
+from pokergame import Money, Hand, Player, Card, BettingRound, Action
+
+class RejectHand(Exception):
+    ''' Raised when the fast path can't vouch for parsing a hand exactly like the scanner'''
+    pass
+
+NUMBER = r'[0-9]+'
+MONEY = r'\$[0-9]{1,2}\.[0-9]{1,2}'
+CARDS = r'[23456789TJQKA][cshd](?: [23456789TJQKA][cshd])*'
+ROMAN = r'[IVXMC]+'
+DATE = r'[0-9]{1,4}/[0-9]{1,2}/[0-9]{1,2}'
+TIME = r'[0-9]{1,2}:[0-9]{1,2}:[0-9]{1,2}'
+
+TABLE = re.compile( r"Table '" + NUMBER + " " + NUMBER + r"' (" + NUMBER + r")-max Seat #" + NUMBER + r" is the button$" )
+STACK = re.compile( r"(.*) \((" + NUMBER + r") in chips\) (?:|(out of hand).*|is sitting out)$" )
+BLIND = re.compile( r": posts (small blind|big blind|the ante) (" + NUMBER + r")(?: and is all-in)?$" )
+DEALT = re.compile( r" \[(" + CARDS + r")\]$" )
+FLOP = re.compile( r"\*\*\* FLOP \*\*\* \[(" + CARDS + r")\]$" )
+TURN = re.compile( r"\*\*\* TURN \*\*\* \[" + CARDS + r"\] \[(" + CARDS + r")\]$" )
+RIVER = re.compile( r"\*\*\* RIVER \*\*\* \[" + CARDS + r"\] \[(" + CARDS + r")\]$" )
+POT = re.compile( r"Total pot (" + NUMBER + r") (?:Main pot (" + NUMBER + r")((?:\. Side pot(?:-" + NUMBER + r")? " + NUMBER + r")*)\. )?\| Rake (" + NUMBER + r") $" )
+SIDE_POT = re.compile( r"Side pot(?:-" + NUMBER + r")? (" + NUMBER + r")" )
+BOARD = re.compile( r"Board \[" + CARDS + r"\]$" )
+UNCALLED = re.compile( r"(" + NUMBER + r")\) returned to " )
+
+# What may follow each of the alternatives in pokerstars.PLAYER_LINES
+CHAT = re.compile( r'[^"]*"$' )
+COLLECTED = re.compile( r"(" + NUMBER + r") from (?:pot|main pot|side pot(?:-" + NUMBER + r" )?)$" )
+FINISHED = re.compile( NUMBER + r"(?:st|nd|rd|th) place(?: and received " + MONEY + r"\.)?$" )
+WINS_TOURNAMENT = re.compile( MONEY + r" - congratulations!$" )
+REBUY = re.compile( r"(" + NUMBER + r") chips for " + MONEY + r"$" )
+BOUNTY = re.compile( MONEY + r" bounty for eliminating " )
+
+# What may follow each of the alternatives in pokerstars.ACTIONS
+ACTION_LINES = {
+    'folds' : re.compile( r" (?:\[(" + CARDS + r")\])?$" ),
+    'checks' : re.compile( r" $" ),
+    'calls' : re.compile( r" (" + NUMBER + r")(?: and is all-in)?$" ),
+    'bets' : re.compile( r" (" + NUMBER + r")(?: and is all-in)?$" ),
+    'raises' : re.compile( r" " + NUMBER + r" to (" + NUMBER + r")(?: and is all-in)?$" ),
+    'shows' : re.compile( r" \[(" + CARDS + r")\]" ),
+    'mucks' : re.compile( r" hand $" ),
+    }
+
+# Player lines that carry no information
+IGNORED = set([
+    ': doesn\'t show hand ',
+    ' is disconnected ',
+    ' has timed out while disconnected',
+    ' has timed out while being disconnected',
+    ' is sitting out',
+    ' has timed out',
+    ' has returned',
+    ' is connected ',
+    ])
+
+def cards(text):
+    return [ Card(c) for c in text.split(' ') ]
+
+class FastHandParser(object):
+    '''Parses the text of a single PokerStars hand line by line'''
+    def __init__(self, currencies, timezones):
+        tz = '(?:' + '|'.join( [ re.escape(t) for t in timezones ] ) + ')'
+        self.header = re.compile(
+            r"PokerStars (?:Hand|Game) #(" + NUMBER + r"): Tournament #(" + NUMBER + r"), "
+            + r"(?:" + MONEY + r"\+" + MONEY + r"(?:\+" + MONEY + r")? (?:" + '|'.join( [ re.escape(c) for c in currencies ] ) + r")"
+            + r"|Freeroll |" + NUMBER + r"FPP)"
+            + r" Hold'em No Limit - (?:Level |Match Round " + ROMAN + r", Level )" + ROMAN
+            + r" \(" + NUMBER + r"/" + NUMBER + r"\) - "
+            + DATE + " " + TIME + " " + tz + r" \[(" + DATE + ") (" + TIME + ") " + tz + r"\]$" )
+
+    def parse(self, text):
+        '''Returns the Hand in text, which must hold exactly one hand
+        ending in its summary and optional trailing whitespace'''
+        self.lines = text.lstrip().split('\n')
+        self.i = 0
+        hand = Hand()
+        m = self.expect( self.header )
+        hand.handId = int( m.group(1) )
+        hand.tournamentId = int( m.group(2) )
+        hand.timestamp = handparser.wallClockSeconds( *[ int(n) for n in m.group(3).split('/') + m.group(4).split(':') ] )
+        hand.gameType = Hand.HoldEmNoLimit
+        hand.numOfSeats = int( self.expect( TABLE ).group(1) )
+        self.readInitialStacks(hand)
+        self.players = scanner.compileAlternatives( hand.players.keys() )
+        self.actors = scanner.compileAlternatives( hand.players.keys() + [ 'Uncalled bet (' ] )
+        self.readBlinds(hand)
+        self.readHoleCards(hand)
+        flop = self.readStreet( hand, '*** FLOP *** ', FLOP )
+        if flop:
+            if self.readStreet( hand, '*** TURN *** ', TURN ):
+                if self.readStreet( hand, '*** RIVER *** ', RIVER ):
+                    if self.line() == '*** SHOW DOWN ***':
+                        self.i += 1
+                        hand.addBetRound( BettingRound(), self.readBettingActions() )
+        self.readSummary( hand, flop )
+        return hand
+
+    # The current line, only lines terminated by a new line count
+    def line(self):
+        if self.i >= len(self.lines) - 1:
+            raise RejectHand( 'Unexpected end of hand' )
+        return self.lines[self.i]
+
+    def expect(self, regex):
+        m = regex.match( self.line() )
+        if m is None:
+            raise RejectHand( 'Unexpected line "%s"'%self.line() )
+        self.i += 1
+        return m
+
+    # Matches a player name that must make up the rest of a line
+    def player(self, text):
+        pid = self.players.match( text )
+        if pid is None or len(pid) != len(text):
+            raise RejectHand( 'Expected a player but found "%s"'%text )
+        return pid
+
+    def readInitialStacks(self, hand):
+        for seat in range( 1, hand.numOfSeats+1 ):
+            prefix = 'Seat ' + str(seat) + ': '
+            line = self.line()
+            if not line.startswith( prefix ):
+                continue
+            m = STACK.match( line, len(prefix) )
+            # The scanner takes the last ' in chips) ' on the line
+            if m is None or line.rfind( ' in chips) ' ) != m.end(2):
+                raise RejectHand( 'Bad seat line "%s"'%line )
+            player = Player( m.group(1) )
+            player.seat = seat
+            player.initialStack = int( m.group(2) )
+            player.outOfHand = m.group(3) is not None
+            hand.addPlayer( player )
+            self.i += 1
+
+    def readBlinds(self, hand):
+        actions = []
+        while True:
+            line = self.line()
+            pid = self.players.match( line )
+            if pid is None:
+                break
+            m = BLIND.match( line, len(pid) )
+            if m is None:
+                raise RejectHand( 'Bad blind line "%s"'%line )
+            act = Action()
+            if m.group(1) == 'the ante':
+                act.action = Action.Ante
+            else:
+                act.action = Action.Post
+            act.bet = int( m.group(2) )
+            actions.append( [pid, act] )
+            self.i += 1
+        hand.addBetRound( BettingRound(), actions )
+
+    def readHoleCards(self, hand):
+        if self.line() != '*** HOLE CARDS ***':
+            raise RejectHand( 'Expected hole cards' )
+        self.i += 1
+        line = self.line()
+        if not line.startswith( 'Dealt to ' ):
+            raise RejectHand( 'Expected dealt cards' )
+        pid = self.players.match( line, len('Dealt to ') )
+        if pid is None:
+            raise RejectHand( 'Expected a player in "%s"'%line )
+        m = DEALT.match( line, len('Dealt to ') + len(pid) )
+        if m is None:
+            raise RejectHand( 'Bad dealt cards line "%s"'%line )
+        self.i += 1
+        hand.players[pid].startingHand = cards( m.group(1) )
+        hand.addBetRound( hand.rounds[0], self.readBettingActions() )
+
+    def readStreet(self, hand, prefix, regex):
+        line = self.line()
+        if not line.startswith( prefix ):
+            return False
+        m = regex.match( line )
+        if m is None:
+            raise RejectHand( 'Bad street line "%s"'%line )
+        self.i += 1
+        street = BettingRound()
+        street.cards = cards( m.group(1) )
+        hand.addBetRound( street, self.readBettingActions() )
+        return True
+
+    def readBettingActions(self):
+        actions = []
+        while True:
+            line = self.line()
+            p = self.actors.match( line )
+            if p is None:
+                if line[:3] == '***': # we've finished this section
+                    return actions
+                self.i += 1 # we can't parse this line so skip it instead
+                continue
+            self.i += 1
+            if p == 'Uncalled bet (':
+                m = UNCALLED.match( line, len(p) )
+                if m is None:
+                    raise RejectHand( 'Bad uncalled bet line "%s"'%line )
+                actions.append( [ self.player( line[m.end():] ), collectMoney( int( m.group(1) ), Action.Return ) ] )
+                continue
+            alt = pokerstars.PLAYER_LINES.match( line, len(p) )
+            if alt is None:
+                raise RejectHand( 'Unknown player line "%s"'%line )
+            rest = len(p) + len(alt)
+            if alt == ': ':
+                actions.append( [p, self.readAction( line, rest )] )
+            elif alt == ' collected ':
+                m = self.expectRest( COLLECTED, line, rest )
+                actions.append( [p, collectMoney( int( m.group(1) ) ) ] )
+            elif alt == ' re-buys and receives ':
+                m = self.expectRest( REBUY, line, rest )
+                actions.append( [p, collectMoney( int( m.group(1) ), Action.Rebuy ) ] )
+            elif alt == ' finished the tournament in ':
+                self.expectRest( FINISHED, line, rest )
+            elif alt == ' wins the tournament and receives ':
+                self.expectRest( WINS_TOURNAMENT, line, rest )
+            elif alt == ' said, "':
+                self.expectRest( CHAT, line, rest )
+            elif alt == ' wins the ':
+                m = self.expectRest( BOUNTY, line, rest )
+                self.player( line[m.end():] )
+            elif alt in IGNORED:
+                if len(line) != rest:
+                    raise RejectHand( 'Unexpected text in "%s"'%line )
+            else:
+                raise RejectHand( 'Unknown player line "%s"'%line )
+
+    def expectRest(self, regex, line, pos):
+        m = regex.match( line, pos )
+        if m is None:
+            raise RejectHand( 'Bad player line "%s"'%line )
+        return m
+
+    def readAction(self, line, pos):
+        txt = pokerstars.ACTIONS.match( line, pos )
+        if txt is None:
+            raise RejectHand( 'Unknown action in "%s"'%line )
+        m = self.expectRest( ACTION_LINES[txt], line, pos + len(txt) )
+        act = Action()
+        if txt == 'folds':
+            act.action = Action.Fold
+            if m.group(1) is not None:
+                act.cards = cards( m.group(1) )
+        elif txt == 'checks':
+            act.action = Action.Check
+        elif txt == 'calls':
+            act.action = Action.Call
+            act.amount = Money( int( m.group(1) ) )
+        elif txt == 'bets':
+            act.action = Action.Bet
+            act.amount = Money( int( m.group(1) ) )
+        elif txt == 'raises':
+            act.action = Action.Raise
+            act.amount = Money( int( m.group(1) ) )
+        elif txt == 'shows':
+            act.action = Action.Show
+            act.cards = cards( m.group(1) )
+        elif txt == 'mucks':
+            act.action = Action.Muck
+        return act
+
+    def readSummary(self, hand, flop):
+        if self.line() != '*** SUMMARY ***':
+            raise RejectHand( 'Expected summary' )
+        self.i += 1
+        m = self.expect( POT )
+        hand.totalPot = Money( int( m.group(1) ) )
+        if m.group(2) is not None:
+            hand.summaryPots.append( Money( int( m.group(2) ) ) )
+            for side in SIDE_POT.findall( m.group(3) ):
+                hand.summaryPots.append( Money( int( side ) ) )
+        hand.rake = Money( int( m.group(4) ) )
+        if flop:
+            self.expect( BOARD )
+        for seat in range( 1, hand.numOfSeats+1 ):
+            # The last line of the hand doesn't need a new line
+            if self.i >= len(self.lines):
+                break
+            line = self.lines[self.i]
+            prefix = 'Seat ' + str(seat) + ': '
+            if not line.startswith( prefix ):
+                continue
+            if self.players.match( line, len(prefix) ) is None:
+                raise RejectHand( 'Expected a player in "%s"'%line )
+            self.i += 1
+        if '\n'.join( self.lines[self.i:] ).strip() != '':
+            raise RejectHand( 'Unexpected text after the summary' )
+
+def collectMoney(amount, action=Action.Collect):
+    act = Action()
+    act.action = action
+    act.amount = amount
+    return act
@@ -1,52 +1,265 @@
+import bisect
 import codecs
+import re
 
 class BadAlternative(Exception):
     pass
 
+class Alternatives(object):
+    '''A fixed set of alternative strings compiled for matching.
+
+    The alternatives are arranged in a prefix trie which is turned into a
+    regular expression with one branch per distinct next character, so a
+    match is a single forward pass over the input. When one alternative is
+    a prefix of another the longest one that matches wins. Build these once
+    and reuse them, e.g. once per hand for the set of player names.
+    '''
+    def __init__(self, alts):
+        self.alts = list(alts)
+        trie = {}
+        for alt in self.alts:
+            node = trie
+            for c in alt:
+                node = node.setdefault(c, {})
+            node[None] = alt
+        self.maxLen = max( [ len(alt) for alt in self.alts ] + [0] )
+        self.regex = re.compile( Alternatives._pattern(trie), re.DOTALL )
+
+    @staticmethod
+    def _pattern(node):
+        branches = [ re.escape(c) + Alternatives._pattern(child)
+                     for c, child in sorted( node.items() ) if c is not None ]
+        if len(branches) == 0:
+            return ''
+        elif len(branches) == 1:
+            pattern = branches[0]
+        else:
+            pattern = '(?:' + '|'.join(branches) + ')'
+        if None in node: # an alternative ends here but longer ones may follow
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    # Returns the longest alternative found at pos in text or None
+    def match(self, text, pos=0):
+        if len(self.alts) == 0:
+            return None
+        m = self.regex.match( text, pos )
+        if m is None:
+            return None
+        return m.group()
+
+    def __iter__(self):
+        return iter(self.alts)
+
+    def __repr__(self):
+        return str(self.alts)
+
+# Alternatives compiled on the fly for plain lists, keyed by their contents
+_compiled = {}
+_MAX_COMPILED = 256
+
+def compileAlternatives(alts):
+    if isinstance(alts, Alternatives):
+        return alts
+    key = frozenset(alts)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        if len(_compiled) >= _MAX_COMPILED:
+            _compiled.clear()
+        compiled = _compiled[key] = Alternatives(key)
+    return compiled
+
 class Scanner(object):
+    '''Tokenises a character stream for the hand parsers.
+
+    All text that has been read but not yet consumed lives in a single
+    buffer and consuming only moves an integer cursor forward. The buffer
+    is refilled from the file in large blocks and the consumed prefix is
+    dropped only when a refill happens, so each character is copied a
+    constant number of times no matter how small the tokens are.
+
+    Only the cursor is maintained while scanning. The line and column
+    used for error reporting are worked out on demand from an index of
+    line starts that is built the first time they are asked for.
+
+    In raw mode the buffer holds the undecoded UTF-8 bytes of the input.
+    Every token the parsers look for is ASCII, which can't occur inside
+    a multi-byte UTF-8 sequence, so the bytes can be scanned directly and
+    only the strings that end up in the model need decoding, see decode.
+    Offsets and columns then count bytes rather than characters.
+    '''
+
+    # Number of characters read from the file on each refill
+    BLOCK_SIZE = 64 * 1024
+
+    BOM = codecs.BOM_UTF8
+
     def __init__(self):
         self.file_ = None
         self.isEOF = False
-        self.acc =""
-        self.char_num = 1
-        self.line_num = 1
- 
-    def parseFile(self,fileName):
-        self.file_ = codecs.open( fileName, 'r', 'utf_8_sig' )
-        
+        self.acc = ""      # read ahead buffer
+        self.pos = 0       # cursor into acc, everything before it is consumed
+        self.base = 0      # offset of acc[0] from the start of the input
+        self.mark_pos = None
+        # Position accounting for text dropped from the buffer, only
+        # updated when the buffer is refilled
+        self.dropped_lines = 0
+        self.dropped_line_start = 0
+        self.line_starts = None
+        self.raw = False
+        # Profiling counters: how much input was read and how much of it
+        # had to be decoded, in bytes for raw input and characters otherwise
+        self.read_count = 0
+        self.decode_count = 0
+
+    # Reads from a file name or from a file already opened in binary
+    # mode, as raw bytes if raw is set
+    def parseFile(self,fileName,raw=False):
+        if not hasattr( fileName, 'read' ):
+            fileName = open( fileName, 'rb' )
+        self.raw = raw
+        if raw:
+            self.file_ = fileName
+            head = fileName.read( len(self.BOM) )
+            if head == self.BOM:
+                # keep offsets relative to the start of the file
+                self.base = self.dropped_line_start = len(self.BOM)
+            else:
+                self.acc = head
+                self.read_count += len(head)
+        else:
+            self.file_ = codecs.getreader( 'utf_8_sig' )( fileName )
+
+    def close(self):
+        if self.file_ is not None:
+            self.file_.close()
+            self.file_ = None
+
     def parseString(self,s):
+        self.close()
+        self.isEOF = False
         self.acc = s
- 
+        self.pos = 0
+        self.base = 0
+        self.mark_pos = None
+        self.dropped_lines = 0
+        self.dropped_line_start = 0
+        self.line_starts = None
+        self.raw = False
+
+    # Scans the UTF-8 encoded bytes of s without decoding them
+    def parseBytes(self,s):
+        bom = s.startswith( self.BOM )
+        self.parseString( s[len(self.BOM):] if bom else s )
+        self.raw = True
+        if bom:
+            self.base = self.dropped_line_start = len(self.BOM)
+        self.read_count += len(s)
+
+    # Turns text taken from the buffer into a unicode string; only
+    # needed in raw mode but harmless otherwise
+    def decode(self, text):
+        if not self.raw:
+            return text
+        self.decode_count += len(text)
+        return text.decode( 'utf_8' )
+
+    # Buffers at least size characters past the cursor if the input
+    # has that many left, reading whole blocks from the file. Returns
+    # False when the input ran out first.
+    def fill(self, size):
+        if self.pos + size <= len(self.acc):
+            return True
+        if self.file_ is not None:
+            self.drop()
+            blocks = [ self.acc ]
+            have = len(self.acc) - self.pos
+            while have < size:
+                txt = self.file_.read( max( self.BLOCK_SIZE, size - have ) )
+                if len(txt) == 0:
+                    break
+                blocks.append(txt)
+                have += len(txt)
+                self.read_count += len(txt)
+                if not self.raw:
+                    self.decode_count += len(txt)
+            self.acc = ''.join(blocks)
+            self.line_starts = None
+        return self.pos + size <= len(self.acc)
+
+    # Forgets the consumed part of the buffer before the cursor or the
+    # mark, remembering just enough about it to report line numbers later
+    def drop(self):
+        keep = self.pos
+        if self.mark_pos is not None:
+            keep = min( keep, self.mark_pos )
+            self.mark_pos -= keep
+        nl = self.acc.rfind( '\n', 0, keep )
+        if nl >= 0:
+            self.dropped_lines += self.acc.count( '\n', 0, nl+1 )
+            self.dropped_line_start = self.base + nl + 1
+        self.acc = self.acc[keep:]
+        self.base += keep
+        self.pos -= keep
+        self.line_starts = None
+
+    # Keeps the input from the cursor onwards buffered until the next
+    # mark, so the scanner can return to it with reset
+    def mark(self):
+        self.mark_pos = self.pos
+
+    def reset(self):
+        self.pos = self.mark_pos
+
+    # Absolute offset of the mark from the start of the input
+    @property
+    def mark_offset(self):
+        return self.base + self.mark_pos
+
+    # Absolute offset of the cursor from the start of the input
+    @property
+    def offset(self):
+        return self.base + self.pos
+
+    # Starts of the lines within the buffer, built lazily
+    def lineStarts(self):
+        if self.line_starts is None:
+            starts = []
+            nl = self.acc.find( '\n' )
+            while nl >= 0:
+                starts.append( nl+1 )
+                nl = self.acc.find( '\n', nl+1 )
+            self.line_starts = starts
+        return self.line_starts
+
+    @property
+    def line_num(self):
+        return self.dropped_lines + bisect.bisect_right( self.lineStarts(), self.pos ) + 1
+
+    @property
+    def char_num(self):
+        starts = self.lineStarts()
+        i = bisect.bisect_right( starts, self.pos )
+        if i > 0:
+            return self.pos - starts[i-1] + 1
+        return self.offset - self.dropped_line_start + 1
+
     # Reads a number of characters ahead, only reads them
     # if they haven't already been read
     def readAhead(self, size):
-        if size > len(self.acc):
-            if self.file_ is None:
-                txt = ''
-            else:
-                txt = self.file_.read( size - len(self.acc) )
-            if len(txt) == 0:
-                self.isEOF = True
-            self.acc += txt
+        if not self.fill(size):
+            self.isEOF = True
 
     def peek(self,size):
         self.readAhead(size)
-        return self.acc[:size]
-    
+        return self.acc[self.pos:self.pos+size]
+
     # Consumes a number of characters from the read ahead buffer
     def consume(self, size):
-        txt = self.acc[0:size]
-        self.acc = self.acc[size:]
-        
-        # The following is purely to keep track of the position
-        # with a file for error reporting purposes
-        self.char_num += size
-        nl = txt.find('\n');
-        if nl >= 0:
-            self.line_num += txt.count('\n')
-            self.char_num = size - nl
-        return txt
-    
+        start = self.pos
+        self.pos += size
+        return self.acc[start:self.pos]
+
     def consumeWhitespace(self):
         i = 0
         while self.peek(i+1).isspace() and not self.isEOF:
@@ -54,22 +267,49 @@ class Scanner(object):
         self.consume(i)
 
     def alternative( self, alts ):
-        for alt in alts:
-            if self.peek( len(alt) ) == alt:
-                self.consume( len(alt) )
-                return alt
-        raise BadAlternative( 'Expecting one of ' + str(alts) + ' but got \'' + self.peek( len(alt) ) + '\' instead')
+        alts = compileAlternatives(alts)
+        full = self.fill( alts.maxLen )
+        alt = alts.match( self.acc, self.pos )
+        if alt is None:
+            if not full:
+                self.isEOF = True
+            raise BadAlternative( 'Expecting one of ' + str(alts) + ' but got \'' + self.acc[self.pos:self.pos+alts.maxLen] + '\' instead')
+        self.consume( len(alt) )
+        return alt
 
     def text( self, text ):
         txt = self.peek( len(text) )
         if txt != text:
-            raise BadAlternative( 'Expecting \'' + text + '\' found \'' + txt +'\'') 
+            raise BadAlternative( 'Expecting \'' + text + '\' found \'' + txt +'\'')
         else:
             self.consume( len(text) )
-            
-    def lookaheadTill(self,text):
-        bs = 0
-        while self.peek( bs )[-len(text):] != text and not self.isEOF: 
-            bs += 1
-        return self.peek( bs )[:-len(text)]
 
+    # Finds the next match of a compiled regex at or after the cursor,
+    # reading further blocks as needed. Returns None if the input ends
+    # without a match, by then the rest of the input is buffered.
+    # Matches may be at most overlap characters long.
+    def search(self, regex, overlap=256):
+        start = 0 # how far past the cursor matches could still start
+        while True:
+            m = regex.search( self.acc, self.pos + start )
+            if m is not None:
+                return m
+            start = max( 0, len(self.acc) - self.pos - overlap )
+            if not self.fill( len(self.acc) - self.pos + self.BLOCK_SIZE ):
+                return regex.search( self.acc, self.pos + start )
+
+    # Returns everything up to (but excluding) the next occurrence of
+    # text without consuming it
+    def lookaheadTill(self,text):
+        more = True
+        while True:
+            idx = self.acc.find( text, self.pos )
+            if idx >= 0:
+                return self.acc[self.pos:idx]
+            if not more:
+                break
+            more = self.fill( len(self.acc) - self.pos + self.BLOCK_SIZE )
+        # Mirror the historical behaviour of dropping the last
+        # len(text) characters of the remaining input
+        self.isEOF = True
+        return self.acc[self.pos:len(self.acc)-len(text)]
@@ -0,0 +1,115 @@
+'''
+Follows hand history files that the poker client is still writing.
+
+The client appends each hand to the tournament file once it is over.
+A tailer remembers the byte offset just past the last complete hand it
+has parsed and on each poll only reads what was appended after it.
+Complete hands are handed to the plugin's scanner with parseBytes;
+a hand that is still being written is left for the next poll. Hands
+that fail to parse are skipped and their errors kept in errors, so an
+odd hand can't stop the tailer. Offsets
+can be kept in a checkpoint file so a restarted tailer carries on where
+it stopped instead of reparsing the whole file.
+'''
+import json
+import os
+import re
+import time
+
+import handparser
+from atomic import replaceFile
+
+# A hand is over once its summary has been followed by a blank line
+HAND_END = re.compile( r'\n\*\*\* SUMMARY \*\*\*\r?\n.*\n\r?\n', re.DOTALL )
+
+class Checkpoint(object):
+    '''Byte offsets of the tailed files, saved as JSON'''
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.offsets = {}
+        if os.path.exists( file_name ):
+            f = open( file_name, 'rb' )
+            try:
+                self.offsets = json.load( f )
+            finally:
+                f.close()
+
+    def get(self, path):
+        return self.offsets.get( os.path.abspath(path), 0 )
+
+    def set(self, path, offset):
+        self.offsets[ os.path.abspath(path) ] = offset
+        tmp = self.file_name + '.tmp'
+        f = open( tmp, 'wb' )
+        try:
+            json.dump( self.offsets, f )
+        finally:
+            f.close()
+        replaceFile( tmp, self.file_name )
+
+class HandTailer(object):
+    '''Yields the hands appended to a file since it was last polled'''
+    def __init__(self, file_name, checkpoint=None, engine=None):
+        self.file_name = file_name
+        self.checkpoint = checkpoint
+        self.engine = engine
+        self.plugin = None
+        self.offset = 0 if checkpoint is None else checkpoint.get( file_name )
+        self.errors = [] # HandParsingExceptions of the hands skipped, offsets in the file
+
+    # Length of the complete hands at the start of data
+    def completeLength(self, data):
+        starts = [ m.start() + 1 for m in self.plugin.HAND_START.finditer( data ) ]
+        if len(starts) > 0:
+            # every hand before the last header is over
+            done = starts[-1]
+        else:
+            done = 0
+        # the client may have started writing the next hand already
+        m = HAND_END.search( data, done )
+        if m is not None:
+            done = m.end()
+        return done
+
+    def poll(self):
+        '''Parses and returns the complete hands appended since the last poll'''
+        if not os.path.exists( self.file_name ):
+            return []
+        size = os.path.getsize( self.file_name )
+        if size < self.offset: # the file was replaced, start over
+            self.offset = 0
+        if size == self.offset:
+            return []
+        if self.plugin is None:
+            self.plugin = handparser.findPluginForFile( self.file_name )
+            if self.plugin is None:
+                return []
+        f = open( self.file_name, 'rb' )
+        try:
+            f.seek( self.offset )
+            data = f.read( size - self.offset )
+        finally:
+            f.close()
+        done = self.completeLength( data )
+        if done == 0:
+            return []
+        parser = self.plugin( None )
+        parser.parseBytes( data[:done] )
+        errors = []
+        hands = list( handparser.iterParser( parser, self.engine, errors ) )
+        for e in errors:
+            if e.offset is not None:
+                e.offset += self.offset
+        self.errors.extend( errors )
+        self.offset += done
+        if self.checkpoint is not None:
+            self.checkpoint.set( self.file_name, self.offset )
+        return hands
+
+    def follow(self, interval=0.5, stop=None):
+        '''Polls the file every interval seconds and yields new hands as
+        they are completed, until stop() returns True'''
+        while stop is None or not stop():
+            for hand in self.poll():
+                yield hand
+            time.sleep( interval )
@@ -1,14 +1,37 @@
 
 class Money(object):
-    '''Represents a money amount in a specified currency '''
+    '''Represents a money amount in a specified currency.
+
+    Amounts are never changed once created, so small tournament money
+    amounts are shared: Money(100) returns the same object every time.
+    '''
+    __slots__ = ( 'cents', 'currency' )
     AUD, USD, TMONEY = range(3)
+
+    # Tournament money amounts below this are shared
+    SMALL = 1 << 16
+    _small = {}
     
     def currencyToString(self):
         return [ 'AUD', 'USD', ''][self.currency]
     
-    def __init__(self, cents, currency=TMONEY):
-        self.cents = cents
-        self.currency = currency      # Currency
+    def __new__(cls, cents, currency=TMONEY):
+        if currency == Money.TMONEY and 0 <= cents < Money.SMALL:
+            m = Money._small.get(cents)
+            if m is None:
+                m = Money._small[cents] = Money._create(cls, cents, currency)
+            return m
+        return Money._create(cls, cents, currency)
+
+    @staticmethod
+    def _create(cls, cents, currency):
+        m = object.__new__(cls)
+        m.cents = cents
+        m.currency = currency      # Currency
+        return m
+
+    def __reduce__(self):
+        return ( Money, ( self.cents, self.currency ) )
     
     def __add__(a, b): #@NoSelf
         if a is None and b is None:
@@ -31,6 +54,8 @@ class Money(object):
         
 class Hand(object):
     '''A single hand in a game'''
+    __slots__ = ( 'numOfSeats', 'gameType', 'players', 'rounds', 'ante', 'totalPot', 'rake', 'board',
+                  'bits', 'allBits', 'summaryPots', 'pots', 'handId', 'tournamentId', 'timestamp' )
     HoldEmFixedLimit, HoldEmNoLimit, HoldEmPotLimit = range(3)
     
     def gameTypeToString(self):
@@ -49,9 +74,23 @@ class Hand(object):
         self.totalPot = None     # Money
         self.rake = None          # Money
         self.board = []           # Card[]
+        self.bits = {}            # bit of each player in liveness masks by name
+        self.allBits = 0          # bits of all the players
+        self.summaryPots = []     # Money[], main and side pots as the summary reports them
+        self.pots = None          # Pot[], main then side pots, see pots.computePots
+        self.handId = None        # int, the site's hand number
+        self.tournamentId = None  # int
+        self.timestamp = None     # int, seconds since 1970 of the site's ET wall clock time
         
     def addPlayer(self, player):
         self.players[player.name] = player
+        # a player's bit is their seat's, or the first one free if the
+        # seat isn't known
+        bit = 1 << player.seat if player.seat is not None else 1
+        while self.allBits & bit:
+            bit <<= 1
+        self.bits[player.name] = bit
+        self.allBits |= bit
     
     def addWinnings(self, winList):
         for w in winList:
@@ -64,20 +103,23 @@ class Hand(object):
     def addBetRound(self, betRound, actionList):
         # add the actions
         betRound.addActions(self, actionList)
-        # calculate liveness by removing any players that folded
+        # calculate liveness by clearing the bits of players that folded
+        live = betRound.liveMask
         if len(self.rounds) > 0:
-            betRound.livePlayers = self.rounds[-1].livePlayers.copy()
+            live = self.rounds[-1].liveMask
         for a in betRound.actions:
             if a.action == Action.Fold:
-                betRound.livePlayers = betRound.livePlayers.difference([a.player.name])
+                live &= ~self.bits[a.player.name]
             if not a.cards is None:
                 self.players[a.player.name].startingHand = a.cards
+        betRound.liveMask = live
         # append the new bet round
         self.rounds.append(betRound)
     
     def __repr__(self):
         return ("Hand( "
-            + "numOfSeats = " + str(self.numOfSeats)
+            + "handId = " + str(self.handId)
+            + ", numOfSeats = " + str(self.numOfSeats)
             + ", gameType = \"" + self.gameTypeToString() + "\""
             + ", players = " + str(self.players)
             + ", rounds = " + str(self.rounds)
@@ -87,38 +129,91 @@ class Hand(object):
 
 class Player(object):
     '''Represents a player'''
+    __slots__ = ( 'name', 'seat', 'win', 'startingHand', 'initialStack', 'outOfHand' )
     def __init__(self, name):
         self.name = name
         self.seat = None
         self.win = 0
         self.startingHand = None  # Card[], might be not known
         self.initialStack = None  # Money
+        self.outOfHand = False    # seated but not dealt in
     
     def __repr__(self):
         return ("Player( name = \"" + repr(self.name) + "\""
                  + ", seat = " + str(self.seat)
                  + ", win = " + str(self.win)
                  + ", startingHand = " + str(self.startingHand) 
-                 + ", initialStack  = " + str(self.initialStack) + "]")
+                 + ", initialStack  = " + str(self.initialStack)
+                 + ", outOfHand = " + str(self.outOfHand) + "]")
 
 class Card(object):
-    '''A card with both value and suit'''
-    def __init__(self, value):
-        self.value = value[0]      # 2-9, T, J, Q, K, A
-        self.suit = value[1]       # d, h, s, c
+    '''A card with both value and suit.
+
+    There are only 52 cards and they never change, so Card('Ah') always
+    returns the same object. Each card also has an integer code, its
+    value index times four plus its suit index, for compact storage and
+    table lookups.
+    '''
+    __slots__ = ( 'value', 'suit', 'code' )
+    VALUES = '23456789TJQKA'
+    SUITS = 'cdhs'
+
+    _cards = {} # by name and by code
+    
+    def __new__(cls, value):
+        card = Card._cards.get(value)
+        if card is None:
+            raise ValueError( 'Not a card: %r'%( value, ) )
+        return card
+
+    @staticmethod
+    def fromCode(code):
+        return Card._cards[code]
+
+    def __reduce__(self):
+        return ( Card, ( self.value + self.suit, ) )
         
     def __repr__(self):
         return self.value + self.suit
+
+def _makeCards():
+    for v in range( len(Card.VALUES) ):
+        for s in range( len(Card.SUITS) ):
+            card = object.__new__(Card)
+            card.value = Card.VALUES[v] # 2-9, T, J, Q, K, A
+            card.suit = Card.SUITS[s]   # c, d, h, s
+            card.code = v * 4 + s
+            Card._cards[ card.value + card.suit ] = Card._cards[ card.code ] = card
+_makeCards()
         
         
 class BettingRound(object):
     '''What actions each player takes in a betting round'''
+    __slots__ = ( 'pot', 'cards', 'actions', 'rake', 'liveMask', 'bits' )
     def __init__(self):
         self.pot = None
         self.cards = None
         self.actions = []          # Action[]
         self.rake = None           # Money
-        self.livePlayers = None    # set of player id strings
+        self.liveMask = None       # bits of the players still in the hand
+        self.bits = None           # the hand's player bits by name
+
+    # The names of the live players as a set, built when asked for
+    @property
+    def livePlayers(self):
+        if self.liveMask is None:
+            return None
+        return set( [ name for ( name, bit ) in self.bits.items() if self.liveMask & bit ] )
+
+    @livePlayers.setter
+    def livePlayers(self, names):
+        if names is None:
+            self.liveMask = None
+            return
+        mask = 0
+        for name in names:
+            mask |= self.bits[name]
+        self.liveMask = mask
         
     def __repr__(self):
         return ("BettingRound( pot = " + str(self.pot)
@@ -132,14 +227,17 @@ class BettingRound(object):
         for a in actionList:
             a[1].player = hand.players[ a[0] ]
             self.actions.append(a[1])
-        self.livePlayers = set(hand.players.keys())
+        self.bits = hand.bits
+        self.liveMask = hand.allBits
 
 class Action(object):
     '''The action a player takes'''
-    Raise, Bet, ReRaise, Call, Fold, Check, Post, Collect, Show, Muck = range(10)
+    __slots__ = ( 'player', 'cards', 'action', 'amount', 'stack', 'bet' )
+    Raise, Bet, ReRaise, Call, Fold, Check, Post, Collect, Show, Muck, Ante, Return, Rebuy = range(13)
     
     def actionToString(self):
-        return [ "Raise", "Bet", "Reraise", "Call", "Fold", "Check", "Post", "Collect", "Show", "Muck" ][self.action]
+        return [ "Raise", "Bet", "Reraise", "Call", "Fold", "Check", "Post", "Collect", "Show", "Muck",
+                 "Ante", "Return", "Rebuy" ][self.action]
     
     def __init__(self):
         self.player = None          # Player
@@ -147,6 +245,7 @@ class Action(object):
         self.action = None          # ActionType
         self.amount = None             # Money
         self.stack = None           # Money
+        self.bet = None             # chips posted by a Post or Ante action
     
     def __repr__(self):
         return ("Action( player = \"" + repr(self.player.name) + "\""
@@ -155,4 +254,19 @@ class Action(object):
                   + ", stack = " + str(self.stack) + ")")
         
         
-        
\ No newline at end of file
+        
+
+class Pot(object):
+    '''A main or side pot and the players who can win it'''
+    __slots__ = ( 'amount', 'mask', 'bits' )
+    def __init__(self, amount, mask, bits):
+        self.amount = amount       # Money
+        self.mask = mask           # bits of the players who can win it
+        self.bits = bits           # the hand's player bits by name
+
+    @property
+    def players(self):
+        return set( [ name for ( name, bit ) in self.bits.items() if self.mask & bit ] )
+
+    def __repr__(self):
+        return "Pot( amount = " + str(self.amount) + ", players = " + str(sorted(self.players)) + " )"
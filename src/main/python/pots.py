@@ -0,0 +1,133 @@
+'''
+Works out the money side of parsed hands: each player's stack after
+every action, the pot at the end of each betting round, and the main and
+side pots at the end of the hand.
+
+computePots walks a hand's actions once. Antes go straight into the pot,
+blinds, calls and bets add to what the player has put in on the current
+street, and raises take it up to their total. Uncalled bets returned,
+winnings collected and re-buys go back onto the stack. The side pots are
+built from how much each player put in: every distinct amount put in by
+a player who didn't fold caps a layer, and the layer can be won by the
+players who put in at least that much.
+
+The result is checked against the summary the site wrote for the hand,
+so a parser or engine bug shows up as a list of problems rather than as
+quietly wrong numbers. checkAll does this for a batch of hands.
+'''
+from pokergame import Money, Action, Pot
+
+def computePots( hand ):
+    '''Fills Action.stack, BettingRound.pot and Hand.pots, filling in
+    Hand.totalPot and Hand.rake if the parser didn't, and returns a list
+    of the ways the result disagrees with the hand's summary'''
+    problems = []
+    stacks = {}
+    for ( name, player ) in hand.players.items():
+        stacks[name] = player.initialStack or 0
+    put = dict.fromkeys( stacks, 0 )       # in the pot over the whole hand
+    collected = 0
+    total = 0
+    seen = set()
+    for r in hand.rounds:
+        if id(r) in seen: # the preflop round is listed twice
+            continue
+        seen.add( id(r) )
+        street = dict.fromkeys( stacks, 0 ) # put in on this street
+        for a in r.actions:
+            name = a.player.name
+            kind = a.action
+            if kind == Action.Post or kind == Action.Ante:
+                chips = a.bet
+                if kind == Action.Post:
+                    street[name] += chips
+            elif kind == Action.Call or kind == Action.Bet:
+                chips = a.amount.cents
+                street[name] += chips
+            elif kind == Action.Raise:
+                chips = a.amount.cents - street[name]
+                street[name] = a.amount.cents
+            elif kind == Action.Return:
+                chips = -a.amount
+                street[name] += chips
+            elif kind == Action.Collect:
+                stacks[name] += a.amount
+                collected += a.amount
+                a.stack = Money( stacks[name] )
+                continue
+            elif kind == Action.Rebuy:
+                stacks[name] += a.amount
+                a.stack = Money( stacks[name] )
+                continue
+            else:
+                a.stack = Money( stacks[name] )
+                continue
+            stacks[name] -= chips
+            put[name] += chips
+            total += chips
+            if stacks[name] < 0:
+                problems.append( '%s put in more than their stack'%name )
+            a.stack = Money( stacks[name] )
+        r.pot = Money( total )
+
+    hand.pots = sidePots( hand, put )
+    if hand.totalPot is None:
+        hand.totalPot = Money( total )
+    elif hand.totalPot.cents != total:
+        problems.append( 'total pot is %d but the summary says %d'%( total, hand.totalPot.cents ) )
+    if hand.rake is None:
+        hand.rake = Money( total - collected )
+    elif collected + hand.rake.cents != total:
+        problems.append( '%d collected and %d rake from a pot of %d'%( collected, hand.rake.cents, total ) )
+    if len( hand.summaryPots ) > 0:
+        amounts = [ p.amount.cents for p in hand.pots ]
+        reported = [ m.cents for m in hand.summaryPots ]
+        if amounts != reported:
+            problems.append( 'pots are %s but the summary says %s'%( amounts, reported ) )
+    elif len( hand.pots ) > 1:
+        problems.append( '%d pots but the summary only has a total'%len( hand.pots ) )
+    return problems
+
+def sidePots( hand, put ):
+    '''The main and side pots given how much each player put in'''
+    if len( hand.rounds ) > 0:
+        live = hand.rounds[-1].liveMask
+    else:
+        live = hand.allBits
+    bits = hand.bits
+    levels = sorted( set( [ chips for ( name, chips ) in put.items() if chips > 0 and live & bits[name] ] ) )
+    pots = []
+    below = 0
+    for level in levels:
+        amount = 0
+        mask = 0
+        for ( name, chips ) in put.items():
+            if chips > below:
+                amount += min( chips, level ) - below
+            if chips >= level and live & bits[name]:
+                mask |= bits[name]
+        if len( pots ) > 0 and pots[-1].mask == mask:
+            # players all-in for the same amount don't make a new pot
+            pots[-1].amount = Money( pots[-1].amount.cents + amount )
+        else:
+            pots.append( Pot( Money( amount ), mask, bits ) )
+        below = level
+    # chips put in by folded players above the last live level are dead
+    # money in the last pot
+    dead = sum( [ chips - below for chips in put.values() if chips > below ] )
+    if dead > 0:
+        if len( pots ) > 0:
+            pots[-1].amount = Money( pots[-1].amount.cents + dead )
+        else:
+            pots.append( Pot( Money( dead ), 0, bits ) )
+    return pots
+
+def checkAll( hands ):
+    '''Computes the pots of a batch of hands, returning ( position,
+    problems ) for each hand whose result disagrees with its summary'''
+    failed = []
+    for ( i, hand ) in enumerate( hands ):
+        problems = computePots( hand )
+        if problems:
+            failed.append( ( i, problems ) )
+    return failed
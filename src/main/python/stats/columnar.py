@@ -0,0 +1,285 @@
+'''
+Column oriented tables of parsed hands for analysis with NumPy.
+
+Walking Hand.rounds[*].actions in Python is slow once a database holds
+millions of hands. A HandTable holds the same information as parallel
+NumPy arrays, one row per action, player, round or hand, so aggregate
+queries become vectorised array operations:
+
+    table = HandTable.fromHands( hands )
+    raises = table.countByPlayer( Action.Raise )
+    print dict( zip( table.names, raises ) )
+
+Hands are numbered by their position in the list the table was built
+from, with the site's hand number in hand_id. Player names are interned
+into table.names and referred to by index. Cards are stored as their
+Card.code with -1 for no card, and missing amounts and ids as -1. The
+table can be turned back into Hand objects that describe the same hands
+as the originals.
+'''
+import array
+
+import numpy
+
+from pokergame import Money, Hand, Player, Card, BettingRound, Action
+
+NO_CARD = -1
+NO_AMOUNT = -1
+
+# How an action's amount was recorded, the parsers keep some amounts
+# as plain chip counts and others as Money
+AMOUNT_NONE, AMOUNT_INT, AMOUNT_MONEY = 0, 1, 2 # plus the Money currency
+
+# The columns of each table, the first of each is the hand of the row
+# except for the hands themselves
+ACTION_COLUMNS = [ 'hand', 'street', 'player', 'seat', 'action', 'amount', 'amount_type', 'bet', 'cards' ]
+PLAYER_COLUMNS = [ 'player_hand', 'player_id', 'player_seat', 'player_stack', 'player_win', 'player_cards',
+                   'player_out' ]
+ROUND_COLUMNS = [ 'round_hand', 'round_street', 'round_cards' ]
+HAND_COLUMNS = [ 'num_seats', 'game_type', 'ante', 'total_pot', 'rake', 'board', 'summary_pots',
+                 'hand_id', 'tournament_id', 'timestamp' ]
+COLUMNS = ACTION_COLUMNS + PLAYER_COLUMNS + ROUND_COLUMNS + HAND_COLUMNS
+
+# array typecodes of the columns that aren't bytes. Amounts and ids are
+# collected as doubles, as a C long is only 32 bits on Windows and hand
+# numbers need more; doubles hold integers exactly up to 2**53 and the
+# columns end up as int64
+TYPECODES = { 'hand': 'i', 'player': 'i', 'amount': 'd', 'bet': 'd',
+              'player_hand': 'i', 'player_id': 'i', 'player_stack': 'd', 'player_win': 'd',
+              'round_hand': 'i', 'ante': 'd', 'total_pot': 'd', 'rake': 'd', 'summary_pots': 'd',
+              'hand_id': 'd', 'tournament_id': 'd', 'timestamp': 'd' }
+
+# Cards kept per row, enough for hold'em
+HOLE_CARDS = 2
+STREET_CARDS = 3
+BOARD_CARDS = 5
+# Main and side pots kept from the summary, one per seat at most
+SUMMARY_POTS = 10
+WIDTHS = { 'cards': HOLE_CARDS, 'player_cards': HOLE_CARDS,
+           'round_cards': STREET_CARDS, 'board': BOARD_CARDS, 'summary_pots': SUMMARY_POTS }
+
+def _cardCodes( codes, cards, width ):
+    '''Appends the codes of cards to codes padded to width'''
+    n = 0
+    if cards is not None:
+        for c in cards:
+            codes.append( c.code )
+        n = len(cards)
+    for i in range( width - n ):
+        codes.append( NO_CARD )
+
+def _cents( m ):
+    if m is None:
+        return NO_AMOUNT
+    return m.cents
+
+def _int( i ):
+    if i is None:
+        return NO_AMOUNT
+    return i
+
+class HandTable(object):
+    '''Parsed hands as parallel NumPy arrays.
+
+    Actions, one row each in the order they were taken:
+        hand, street, player, seat, action, amount, amount_type, bet, cards
+    Players, one row per player in each hand:
+        player_hand, player_id, player_seat, player_stack, player_win, player_cards,
+        player_out
+    Rounds, one row per entry of Hand.rounds (the parsers list the
+    preflop round twice):
+        round_hand, round_street, round_cards
+    Hands, one row each:
+        num_seats, game_type, ante, total_pot, rake, board, summary_pots,
+        hand_id, tournament_id, timestamp
+    '''
+    def __init__(self):
+        self.names = []  # player names by id
+        self.ids = {}    # player ids by name
+
+    def playerId(self, name):
+        pid = self.ids.get( name )
+        if pid is None:
+            pid = self.ids[name] = len( self.names )
+            self.names.append( name )
+        return pid
+
+    @staticmethod
+    def fromHands( hands ):
+        '''Builds a table from a sequence of hands in a single pass'''
+        table = HandTable()
+        cols = dict( ( name, array.array( TYPECODES.get( name, 'b' ) ) ) for name in COLUMNS )
+        # bound methods of the columns, fetched once for the inner loops
+        add = dict( ( name, col.append ) for ( name, col ) in cols.items() )
+        hand_, street_, player_, seat_ = add['hand'], add['street'], add['player'], add['seat']
+        action_, amount_, amountType_, bet_ = add['action'], add['amount'], add['amount_type'], add['bet']
+        cards = cols['cards']
+        for ( h, hand ) in enumerate( hands ):
+            add['num_seats']( hand.numOfSeats or 0 )
+            add['game_type']( -1 if hand.gameType is None else hand.gameType )
+            add['ante']( _cents( hand.ante ) )
+            add['total_pot']( _cents( hand.totalPot ) )
+            add['rake']( _cents( hand.rake ) )
+            add['hand_id']( _int( hand.handId ) )
+            add['tournament_id']( _int( hand.tournamentId ) )
+            add['timestamp']( _int( hand.timestamp ) )
+            _cardCodes( cols['board'], hand.board, BOARD_CARDS )
+            pots = cols['summary_pots']
+            for m in hand.summaryPots:
+                pots.append( m.cents )
+            for i in range( SUMMARY_POTS - len( hand.summaryPots ) ):
+                pots.append( NO_AMOUNT )
+            ids = {}
+            seats = {}
+            for player in hand.players.values():
+                pid = ids[player.name] = table.playerId( player.name )
+                seat = seats[player.name] = -1 if player.seat is None else player.seat
+                add['player_hand']( h )
+                add['player_id']( pid )
+                add['player_seat']( seat )
+                add['player_stack']( _int( player.initialStack ) )
+                add['player_win']( player.win )
+                _cardCodes( cols['player_cards'], player.startingHand, HOLE_CARDS )
+                add['player_out']( player.outOfHand )
+            streets = {}
+            for r in hand.rounds:
+                street = streets.get( id(r) )
+                add['round_hand']( h )
+                _cardCodes( cols['round_cards'], r.cards, STREET_CARDS )
+                if street is not None:
+                    # a round listed again, its actions are already in
+                    add['round_street']( street )
+                    continue
+                street = streets[ id(r) ] = len( streets )
+                add['round_street']( street )
+                for a in r.actions:
+                    name = a.player.name
+                    hand_( h )
+                    street_( street )
+                    player_( ids[name] )
+                    seat_( seats[name] )
+                    action_( a.action )
+                    amount = a.amount
+                    if amount is None:
+                        amount_( NO_AMOUNT )
+                        amountType_( AMOUNT_NONE )
+                    elif isinstance( amount, Money ):
+                        amount_( amount.cents )
+                        amountType_( AMOUNT_MONEY + amount.currency )
+                    else:
+                        amount_( amount )
+                        amountType_( AMOUNT_INT )
+                    bet_( _int( a.bet ) )
+                    _cardCodes( cards, a.cards, HOLE_CARDS )
+        for ( name, col ) in cols.items():
+            values = numpy.frombuffer( col, dtype=col.typecode ) if len(col) > 0 \
+                     else numpy.zeros( 0, dtype=col.typecode )
+            values = values.astype( numpy.int64 if col.typecode == 'd' else col.typecode )
+            if name in WIDTHS:
+                values = values.reshape( -1, WIDTHS[name] )
+            setattr( table, name, values )
+        return table
+
+    def __len__(self):
+        '''Number of hands'''
+        return len( self.num_seats )
+
+    # Vectorised queries
+
+    def countByPlayer(self, action):
+        '''Number of actions of a kind taken by each player, indexed by id'''
+        return numpy.bincount( self.player[ self.action == action ], minlength=len(self.names) )
+
+    def amountByPlayer(self, action):
+        '''Total amount of the actions of a kind by each player'''
+        rows = ( self.action == action ) & ( self.amount_type != AMOUNT_NONE )
+        return numpy.bincount( self.player[rows], weights=self.amount[rows], minlength=len(self.names) ).astype( numpy.int64 )
+
+    def handsByPlayer(self):
+        '''Number of hands each player was dealt into'''
+        return numpy.bincount( self.player_id, minlength=len(self.names) )
+
+    # Turning rows back into hands
+
+    def toHands(self, rows=None):
+        '''Rebuilds the hands in rows (all by default) as Hand objects'''
+        if rows is None:
+            rows = range( len(self) )
+        # plain lists are much quicker to index than arrays one at a time
+        c = dict( ( name, getattr( self, name ).tolist() ) for name in COLUMNS )
+        bounds = numpy.arange( len(self) + 1 )
+        starts = [ numpy.searchsorted( getattr( self, column ), bounds ).tolist()
+                   for column in [ 'player_hand', 'hand', 'round_hand' ] ]
+        return [ self._hand( c, h, *[ range( s[h], s[h+1] ) for s in starts ] ) for h in rows ]
+
+    def toHand(self, h):
+        '''Rebuilds the hand in row h, converting only its own rows'''
+        c = {}
+        ranges = []
+        for columns in [ PLAYER_COLUMNS, ACTION_COLUMNS, ROUND_COLUMNS ]:
+            ( lo, hi ) = numpy.searchsorted( getattr( self, columns[0] ), [ h, h+1 ] )
+            for name in columns:
+                c[name] = getattr( self, name )[lo:hi].tolist()
+            ranges.append( range( hi - lo ) )
+        for name in HAND_COLUMNS:
+            c[name] = getattr( self, name )[h:h+1].tolist()
+        return self._hand( c, 0, *ranges )
+
+    def _hand(self, c, h, players, actions, rounds):
+        names = self.names
+        hand = Hand()
+        hand.numOfSeats = c['num_seats'][h] or None
+        hand.gameType = None if c['game_type'][h] < 0 else c['game_type'][h]
+        hand.ante = _money( c['ante'][h] )
+        hand.totalPot = _money( c['total_pot'][h] )
+        hand.rake = _money( c['rake'][h] )
+        hand.board = _cards( c['board'][h] ) or []
+        hand.summaryPots = [ Money( cents ) for cents in c['summary_pots'][h] if cents != NO_AMOUNT ]
+        hand.handId = _id( c['hand_id'][h] )
+        hand.tournamentId = _id( c['tournament_id'][h] )
+        hand.timestamp = _id( c['timestamp'][h] )
+        for i in players:
+            player = Player( names[ c['player_id'][i] ] )
+            player.seat = None if c['player_seat'][i] < 0 else c['player_seat'][i]
+            player.initialStack = None if c['player_stack'][i] == NO_AMOUNT else c['player_stack'][i]
+            player.win = c['player_win'][i]
+            player.startingHand = _cards( c['player_cards'][i] )
+            player.outOfHand = bool( c['player_out'][i] )
+            hand.addPlayer( player )
+        byStreet = {}
+        for i in actions:
+            act = Action()
+            act.action = c['action'][i]
+            kind = c['amount_type'][i]
+            if kind == AMOUNT_INT:
+                act.amount = c['amount'][i]
+            elif kind != AMOUNT_NONE:
+                act.amount = Money( c['amount'][i], kind - AMOUNT_MONEY )
+            act.bet = None if c['bet'][i] == NO_AMOUNT else c['bet'][i]
+            act.cards = _cards( c['cards'][i] )
+            byStreet.setdefault( c['street'][i], [] ).append( [ names[ c['player'][i] ], act ] )
+        built = {}
+        for i in rounds:
+            street = c['round_street'][i]
+            r = built.get( street )
+            if r is None:
+                r = built[street] = BettingRound()
+                r.cards = _cards( c['round_cards'][i] )
+                hand.addBetRound( r, byStreet.get( street, [] ) )
+            else:
+                hand.addBetRound( r, [] )
+        return hand
+
+def _money( cents ):
+    if cents == NO_AMOUNT:
+        return None
+    return Money( cents )
+
+def _id( i ):
+    if i == NO_AMOUNT:
+        return None
+    return i
+
+def _cards( codes ):
+    cards = [ Card.fromCode(c) for c in codes if c != NO_CARD ]
+    return cards or None
@@ -0,0 +1,196 @@
+'''
+Per player statistics kept up to date one hand at a time.
+
+A StatsAggregator holds a PlayerStats of plain counters for everyone it
+has seen. Adding a hand only touches the counters of the players in it,
+so new hands can be added to saved totals without going back over the
+history. The ratios are worked out from the counters when asked for:
+
+    VPIP  how often a player put money in preflop voluntarily
+    PFR   how often a player raised preflop
+    AF    postflop bets and raises for each postflop call
+    WTSD  how often a player who saw the flop went to showdown
+
+Counters add up, so aggregators built from different files, on
+different processes or in different sessions can be merged into one;
+aggregateFiles does the map and reduce over a pool of processes.
+'''
+import cPickle
+import multiprocessing
+import os
+
+from pokergame import Action
+
+# Actions that put money in the pot by choice
+VOLUNTARY = frozenset([ Action.Call, Action.Bet, Action.Raise, Action.ReRaise ])
+AGGRESSIVE = frozenset([ Action.Bet, Action.Raise, Action.ReRaise ])
+
+class PlayerStats(object):
+    '''Counters for a single player'''
+    __slots__ = ( 'hands', 'vpip', 'pfr', 'postflopAggressive', 'postflopCalls',
+                  'sawFlop', 'wentToShowdown', 'wonAtShowdown' )
+
+    def __init__(self):
+        self.hands = 0              # hands dealt in
+        self.vpip = 0               # hands with a voluntary preflop call, bet or raise
+        self.pfr = 0                # hands with a preflop raise
+        self.postflopAggressive = 0 # bets and raises after the flop
+        self.postflopCalls = 0      # calls after the flop
+        self.sawFlop = 0            # hands still in when the flop came
+        self.wentToShowdown = 0     # hands still in at showdown
+        self.wonAtShowdown = 0      # showdowns with something collected
+
+    def merge(self, other):
+        for name in PlayerStats.__slots__:
+            setattr( self, name, getattr( self, name ) + getattr( other, name ) )
+        return self
+
+    def __getstate__(self):
+        return [ getattr( self, name ) for name in PlayerStats.__slots__ ]
+
+    def __setstate__(self, state):
+        for ( name, value ) in zip( PlayerStats.__slots__, state ):
+            setattr( self, name, value )
+
+    @staticmethod
+    def ratio(a, b):
+        if b == 0:
+            return None
+        return float(a) / b
+
+    def VPIP(self):
+        return PlayerStats.ratio( self.vpip, self.hands )
+
+    def PFR(self):
+        return PlayerStats.ratio( self.pfr, self.hands )
+
+    def AF(self):
+        return PlayerStats.ratio( self.postflopAggressive, self.postflopCalls )
+
+    def WTSD(self):
+        return PlayerStats.ratio( self.wentToShowdown, self.sawFlop )
+
+    def __repr__(self):
+        return ( "PlayerStats( hands = %d, VPIP = %s, PFR = %s, AF = %s, WTSD = %s )"
+                 %( self.hands, self.VPIP(), self.PFR(), self.AF(), self.WTSD() ) )
+
+class StatsAggregator(object):
+    '''PlayerStats for every player seen, by name'''
+    def __init__(self):
+        self.players = {}
+        self.hands = 0
+
+    def get(self, name):
+        stats = self.players.get( name )
+        if stats is None:
+            stats = self.players[name] = PlayerStats()
+        return stats
+
+    def add(self, hand):
+        '''Counts a single hand'''
+        self.hands += 1
+        # the distinct rounds in order: preflop, flop, turn, river, showdown
+        rounds = []
+        for r in hand.rounds:
+            if r not in rounds: # the parsers list preflop twice
+                rounds.append( r )
+        stats = {} # of the players dealt in
+        for ( name, player ) in hand.players.items():
+            if player.outOfHand:
+                continue
+            s = stats[name] = self.get( name )
+            s.hands += 1
+        preflop = set()
+        raised = set()
+        if len( rounds ) > 0:
+            for a in rounds[0].actions:
+                if a.action in VOLUNTARY:
+                    preflop.add( a.player.name )
+                    if a.action in AGGRESSIVE:
+                        raised.add( a.player.name )
+        for name in preflop:
+            stats[name].vpip += 1
+        for name in raised:
+            stats[name].pfr += 1
+        if len( rounds ) < 2:
+            return
+        for r in rounds[1:]:
+            for a in r.actions:
+                if a.action in AGGRESSIVE:
+                    stats[a.player.name].postflopAggressive += 1
+                elif a.action == Action.Call:
+                    stats[a.player.name].postflopCalls += 1
+        bits = hand.bits
+        # still in once the preflop betting was over
+        flopMask = rounds[0].liveMask
+        for ( name, s ) in stats.items():
+            if flopMask & bits[name]:
+                s.sawFlop += 1
+        if len( rounds ) == 5: # there was a showdown
+            winners = set( [ a.player.name for a in rounds[4].actions if a.action == Action.Collect ] )
+            showdownMask = rounds[4].liveMask
+            for ( name, s ) in stats.items():
+                if showdownMask & bits[name]:
+                    s.wentToShowdown += 1
+                    if name in winners:
+                        s.wonAtShowdown += 1
+
+    def addHands(self, hands):
+        '''Counts every hand of an iterable, e.g. iterHands'''
+        for hand in hands:
+            self.add( hand )
+        return self
+
+    def merge(self, other):
+        '''Adds the counts of another aggregator to this one'''
+        self.hands += other.hands
+        for ( name, stats ) in other.players.items():
+            self.get( name ).merge( stats )
+        return self
+
+    def save(self, file_name):
+        # imported here so the statistics don't depend on the parsers
+        from parser.atomic import replaceFile
+        tmp = file_name + '.tmp'
+        f = open( tmp, 'wb' )
+        try:
+            cPickle.dump( self, f, 2 )
+        finally:
+            f.close()
+        replaceFile( tmp, file_name )
+
+    @staticmethod
+    def load(file_name):
+        '''Loads saved totals, or returns an empty aggregator if there are none'''
+        if not os.path.exists( file_name ):
+            return StatsAggregator()
+        f = open( file_name, 'rb' )
+        try:
+            return cPickle.load( f )
+        finally:
+            f.close()
+
+def statsForFile( task ):
+    '''Aggregates the hands of one file, for the pool in aggregateFiles'''
+    ( file_name, engine ) = task
+    # imported here so the statistics don't depend on the parsers
+    from parser import handparser
+    errors = []
+    return StatsAggregator().addHands( handparser.iterHands( file_name, engine, errors ) )
+
+def aggregateFiles( files, processes=None, engine=None, into=None ):
+    '''Aggregates the hands of many files on a pool of processes, adding
+    them to the aggregator into if one is given. Hands that fail to parse
+    are skipped.'''
+    total = into or StatsAggregator()
+    pool = multiprocessing.Pool( processes )
+    try:
+        for partial in pool.imap_unordered( statsForFile, [ ( f, engine ) for f in files ] ):
+            total.merge( partial )
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return total
@@ -0,0 +1,400 @@
+'''
+Keeps parsed hands in an SQLite database so analyses can start from the
+database instead of parsing the text again.
+
+The schema is normalised: a row per hand, per player in a hand, per
+entry of Hand.rounds and per action, with player names stored once in
+players. Cards are stored as their names run together, like 'AcJd2d',
+and amounts as cents (or chips), with the currency of an action's
+amount when it was Money rather than a plain chip count.
+
+Loading is built for bulk imports. The database runs in WAL mode with
+normal syncing, hands are inserted with executemany a batch at a time,
+each batch is a single transaction, and row ids are handed out here
+rather than read back after each insert. The indexes are only created
+when a load finishes, as building them once over sorted data is much
+quicker than keeping them up to date row by row; loadHands drops them
+first for large loads.
+
+Besides the indexes joining the tables, hands are indexed by player,
+tournament, hand number, date and final pot, so query can find, say, a
+player's hands in a tournament between two dates without reading every
+hand. It returns the row ids found, as a StoredHands that only rebuilds
+the Hand objects as they are read, or makes a columnar HandTable of
+them. explain shows how SQLite will run a query, to check that it uses
+the indexes.
+
+    store = SQLiteStore( 'hands.db' )
+    store.loadHands( parser.iterHands( file_name ) )
+    for hand in store.query( player='Hero', tournament=525756016, since=start ):
+        ...
+    print '\n'.join( store.explain( player='Hero', tournament=525756016 ) )
+'''
+import sqlite3
+
+from pokergame import Money, Hand, Player, Card, BettingRound, Action
+from stats.columnar import HandTable
+
+# Hands inserted per transaction, and rebuilt per read by StoredHands
+BATCH = 5000
+# Loads of at least this many hands drop the indexes first
+BULK = 20000
+# Rows of each index sampled by ANALYZE after smaller loads, so that they
+# don't cost time in proportion to the whole database
+ANALYSIS_LIMIT = 1000
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS players (
+           id INTEGER PRIMARY KEY,
+           name TEXT NOT NULL UNIQUE )''',
+    '''CREATE TABLE IF NOT EXISTS hands (
+           id INTEGER PRIMARY KEY,
+           hand_id INTEGER,
+           tournament_id INTEGER,
+           timestamp INTEGER,
+           num_seats INTEGER,
+           game_type INTEGER,
+           ante INTEGER,
+           total_pot INTEGER,
+           rake INTEGER,
+           board TEXT )''',
+    '''CREATE TABLE IF NOT EXISTS summary_pots (
+           hand INTEGER NOT NULL,
+           pot INTEGER NOT NULL,
+           amount INTEGER NOT NULL )''',
+    '''CREATE TABLE IF NOT EXISTS hand_players (
+           hand INTEGER NOT NULL,
+           player INTEGER NOT NULL,
+           seat INTEGER,
+           initial_stack INTEGER,
+           win INTEGER,
+           cards TEXT,
+           out_of_hand INTEGER )''',
+    '''CREATE TABLE IF NOT EXISTS rounds (
+           hand INTEGER NOT NULL,
+           position INTEGER NOT NULL,
+           street INTEGER NOT NULL,
+           cards TEXT )''',
+    '''CREATE TABLE IF NOT EXISTS actions (
+           hand INTEGER NOT NULL,
+           position INTEGER NOT NULL,
+           street INTEGER NOT NULL,
+           player INTEGER NOT NULL,
+           action INTEGER NOT NULL,
+           amount INTEGER,
+           currency INTEGER,
+           bet INTEGER,
+           cards TEXT )''',
+    ]
+
+# ( name, definition ) of every index, created after loading
+INDEXES = [
+    ( 'summary_pots_hand', 'summary_pots ( hand )' ),
+    ( 'hand_players_hand', 'hand_players ( hand )' ),
+    ( 'rounds_hand', 'rounds ( hand )' ),
+    ( 'actions_hand', 'actions ( hand )' ),
+    # for queries
+    ( 'hand_players_player', 'hand_players ( player, hand )' ),
+    ( 'hands_hand_id', 'hands ( hand_id )' ),
+    ( 'hands_tournament', 'hands ( tournament_id, timestamp )' ),
+    ( 'hands_timestamp', 'hands ( timestamp )' ),
+    ( 'hands_total_pot', 'hands ( total_pot )' ),
+    ]
+
+def cardsText( cards ):
+    if cards is None:
+        return None
+    return ''.join( [ c.value + c.suit for c in cards ] )
+
+def textCards( text ):
+    if text is None:
+        return None
+    return [ Card( text[i:i+2] ) for i in range( 0, len( text ), 2 ) ]
+
+def _cents( m ):
+    if m is None:
+        return None
+    return m.cents
+
+def _money( cents ):
+    if cents is None:
+        return None
+    return Money( cents )
+
+class StoredHands(object):
+    '''The hands a query found, rebuilt from the store a batch at a time
+    as they are read'''
+    def __init__(self, store, ids, batch=BATCH):
+        self.store = store
+        self.ids = ids
+        self.batch = batch
+
+    def __len__(self):
+        return len( self.ids )
+
+    def __getitem__(self, i):
+        if isinstance( i, slice ):
+            return StoredHands( self.store, self.ids[i], self.batch )
+        return self.store.hand( self.ids[i] )
+
+    def __iter__(self):
+        for start in range( 0, len( self.ids ), self.batch ):
+            for hand in self.store.hands( self.ids[start:start+self.batch] ):
+                yield hand
+
+    def table(self):
+        '''The hands as a columnar HandTable'''
+        return HandTable.fromHands( iter( self ) )
+
+class SQLiteStore(object):
+    '''Parsed hands in an SQLite database'''
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.db = sqlite3.connect( file_name )
+        self.db.execute( 'PRAGMA journal_mode=WAL' )
+        self.db.execute( 'PRAGMA synchronous=NORMAL' )
+        self.db.execute( 'PRAGMA temp_store=MEMORY' )
+        for statement in SCHEMA:
+            self.db.execute( statement )
+        self.db.commit()
+        self.playerIds = dict( ( name, pid ) for ( pid, name ) in self.db.execute( 'SELECT id, name FROM players' ) )
+        self.nextHand = ( self.db.execute( 'SELECT MAX(id) FROM hands' ).fetchone()[0] or 0 ) + 1
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute( 'SELECT COUNT(*) FROM hands' ).fetchone()[0]
+
+    # Loading
+
+    def createIndexes(self, analysisLimit=0):
+        '''Creates the missing indexes and updates the statistics the query
+        planner uses, from at most analysisLimit rows of each index if it
+        isn't zero'''
+        for ( name, definition ) in INDEXES:
+            self.db.execute( 'CREATE INDEX IF NOT EXISTS %s ON %s'%( name, definition ) )
+        self.db.execute( 'PRAGMA analysis_limit=%d'%analysisLimit )
+        self.db.execute( 'ANALYZE' )
+        self.db.commit()
+
+    def dropIndexes(self):
+        for ( name, definition ) in INDEXES:
+            self.db.execute( 'DROP INDEX IF EXISTS %s'%name )
+        self.db.commit()
+
+    def loadHands(self, hands, seen=None, batch=BATCH, bulk=BULK, expected=None):
+        '''Stores hands from any iterable, returning how many were stored.
+        Hands a parser.dedup.SeenHands has seen before are skipped, and
+        the hands stored are added to it once their batch is committed. If
+        expected says there are at least bulk hands the indexes are
+        dropped while loading; either way they exist when it returns.'''
+        full = expected is not None and expected >= bulk
+        if full:
+            self.dropIndexes()
+        stored = 0
+        chunk = []
+        ids = set() # of the hands in chunk
+        for hand in hands:
+            if seen is not None and hand.handId is not None:
+                if hand.handId in ids or hand.handId in seen:
+                    continue
+                ids.add( hand.handId )
+            chunk.append( hand )
+            if len( chunk ) >= batch:
+                stored += self._insertSeen( chunk, ids, seen )
+                chunk = []
+                ids = set()
+        if chunk:
+            stored += self._insertSeen( chunk, ids, seen )
+        # the indexes were rebuilt over everything after a bulk load
+        self.createIndexes( 0 if full else ANALYSIS_LIMIT )
+        return stored
+
+    def _insertSeen(self, hands, ids, seen):
+        stored = self.insertHands( hands )
+        if seen is not None and ids:
+            seen.addMany( sorted( ids ) )
+        return stored
+
+    def insertHands(self, hands):
+        '''Inserts a batch of hands in one transaction, returning how many'''
+        playerIds = self.playerIds
+        newPlayers = []
+        handRows = []
+        potRows = []
+        playerRows = []
+        roundRows = []
+        actionRows = []
+        hid = self.nextHand
+        for hand in hands:
+            handRows.append( ( hid, hand.handId, hand.tournamentId, hand.timestamp, hand.numOfSeats, hand.gameType,
+                               _cents( hand.ante ), _cents( hand.totalPot ), _cents( hand.rake ),
+                               cardsText( hand.board ) if hand.board else None ) )
+            for ( i, m ) in enumerate( hand.summaryPots ):
+                potRows.append( ( hid, i, m.cents ) )
+            for player in hand.players.values():
+                pid = playerIds.get( player.name )
+                if pid is None:
+                    pid = playerIds[player.name] = len( playerIds ) + 1
+                    newPlayers.append( ( pid, player.name ) )
+                playerRows.append( ( hid, pid, player.seat, player.initialStack, player.win,
+                                     cardsText( player.startingHand ), int( player.outOfHand ) ) )
+            streets = {}
+            position = 0
+            for ( i, r ) in enumerate( hand.rounds ):
+                street = streets.get( id(r) )
+                if street is not None:
+                    # the preflop round is listed twice, its actions are in
+                    roundRows.append( ( hid, i, street, cardsText( r.cards ) ) )
+                    continue
+                street = streets[ id(r) ] = len( streets )
+                roundRows.append( ( hid, i, street, cardsText( r.cards ) ) )
+                for a in r.actions:
+                    amount = a.amount
+                    if isinstance( amount, Money ):
+                        ( amount, currency ) = ( amount.cents, amount.currency )
+                    else:
+                        currency = None
+                    actionRows.append( ( hid, position, street, playerIds[a.player.name], a.action,
+                                         amount, currency, a.bet, cardsText( a.cards ) ) )
+                    position += 1
+            hid += 1
+        db = self.db
+        try:
+            db.executemany( 'INSERT INTO players VALUES ( ?, ? )', newPlayers )
+            db.executemany( 'INSERT INTO hands VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ?, ? )', handRows )
+            db.executemany( 'INSERT INTO summary_pots VALUES ( ?, ?, ? )', potRows )
+            db.executemany( 'INSERT INTO hand_players VALUES ( ?, ?, ?, ?, ?, ?, ? )', playerRows )
+            db.executemany( 'INSERT INTO rounds VALUES ( ?, ?, ?, ? )', roundRows )
+            db.executemany( 'INSERT INTO actions VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ? )', actionRows )
+            db.commit()
+        except:
+            db.rollback()
+            for ( pid, name ) in newPlayers:
+                del playerIds[name]
+            raise
+        self.nextHand = hid
+        return len( handRows )
+
+    # Reading back
+
+    def hand(self, hid):
+        '''The stored hand with row id hid, rebuilt as a Hand'''
+        hands = self.hands( [ hid ] )
+        if not hands:
+            raise KeyError( hid )
+        return hands[0]
+
+    def hands(self, hids):
+        '''The stored hands with the given row ids, in that order'''
+        hids = list( hids )
+        if not hids:
+            return []
+        db = self.db
+        built = {}
+        names = {}
+        rows = dict( ( hid, [] ) for hid in hids )
+        # SQLite limits the number of parameters of a statement
+        for start in range( 0, len( hids ), 500 ):
+            part = hids[start:start+500]
+            marks = ','.join( '?' * len( part ) )
+            for row in db.execute( 'SELECT * FROM hands WHERE id IN (%s)'%marks, part ):
+                hand = Hand()
+                ( hid, hand.handId, hand.tournamentId, hand.timestamp, hand.numOfSeats, hand.gameType,
+                  ante, total, rake, board ) = row
+                hand.ante = _money( ante )
+                hand.totalPot = _money( total )
+                hand.rake = _money( rake )
+                hand.board = textCards( board ) or []
+                built[hid] = hand
+            for ( hid, pot, amount ) in db.execute( 'SELECT * FROM summary_pots WHERE hand IN (%s) ORDER BY hand, pot'%marks, part ):
+                built[hid].summaryPots.append( Money( amount ) )
+            for ( hid, pid, seat, stack, win, cards, out, name ) in db.execute(
+                    'SELECT hp.*, p.name FROM hand_players hp JOIN players p ON p.id = hp.player '
+                    'WHERE hp.hand IN (%s)'%marks, part ):
+                names[pid] = name
+                player = Player( name )
+                player.seat = seat
+                player.initialStack = stack
+                player.win = win
+                player.startingHand = textCards( cards )
+                player.outOfHand = bool( out )
+                built[hid].addPlayer( player )
+            actions = dict( ( hid, {} ) for hid in part )
+            for ( hid, position, street, pid, kind, amount, currency, bet, cards ) in db.execute(
+                    'SELECT * FROM actions WHERE hand IN (%s) ORDER BY hand, position'%marks, part ):
+                act = Action()
+                act.action = kind
+                if currency is not None:
+                    act.amount = Money( amount, currency )
+                else:
+                    act.amount = amount
+                act.bet = bet
+                act.cards = textCards( cards )
+                actions[hid].setdefault( street, [] ).append( [ names[pid], act ] )
+            for ( hid, position, street, cards ) in db.execute(
+                    'SELECT * FROM rounds WHERE hand IN (%s) ORDER BY hand, position'%marks, part ):
+                rows[hid].append( ( street, cards ) )
+            for hid in part:
+                if hid not in built:
+                    continue
+                hand = built[hid]
+                rounds = {}
+                for ( street, cards ) in rows[hid]:
+                    r = rounds.get( street )
+                    if r is None:
+                        r = rounds[street] = BettingRound()
+                        r.cards = textCards( cards )
+                        hand.addBetRound( r, actions[hid].get( street, [] ) )
+                    else:
+                        hand.addBetRound( r, [] )
+        return [ built[hid] for hid in hids if hid in built ]
+
+    # Queries
+
+    def _where(self, player=None, tournament=None, handId=None, since=None, until=None,
+               minPot=None, maxPot=None):
+        '''The WHERE clause and parameters of a query, or None if it can't
+        match anything'''
+        terms = []
+        params = []
+        if player is not None:
+            pid = self.playerIds.get( player )
+            if pid is None:
+                return None
+            terms.append( 'id IN ( SELECT hand FROM hand_players WHERE player = ? )' )
+            params.append( pid )
+        for ( value, term ) in [ ( tournament, 'tournament_id = ?' ), ( handId, 'hand_id = ?' ),
+                                 ( since, 'timestamp >= ?' ), ( until, 'timestamp < ?' ),
+                                 ( minPot, 'total_pot >= ?' ), ( maxPot, 'total_pot <= ?' ) ]:
+            if value is not None:
+                terms.append( term )
+                params.append( value )
+        if not terms:
+            return ( '', params )
+        return ( ' WHERE ' + ' AND '.join( terms ), params )
+
+    def query(self, **conditions):
+        '''The stored hands matching all the conditions given, in the order
+        they were stored, as a StoredHands. Conditions are player (a name),
+        tournament, handId (the site's hand number), since and until (the
+        hand's timestamp, until not included) and minPot and maxPot (the
+        final pot in cents or chips, both included).'''
+        where = self._where( **conditions )
+        if where is None:
+            return StoredHands( self, [] )
+        ( clause, params ) = where
+        # sorted here, as ORDER BY id makes SQLite walk the table in id
+        # order rather than use an index for a range like minPot alone
+        ids = sorted( row[0] for row in self.db.execute( 'SELECT id FROM hands%s'%clause, params ) )
+        return StoredHands( self, ids )
+
+    def explain(self, **conditions):
+        '''How SQLite runs query with the same conditions, one line per
+        step of EXPLAIN QUERY PLAN'''
+        where = self._where( **conditions )
+        if where is None:
+            return [ 'no hands of player %r'%conditions['player'] ]
+        ( clause, params ) = where
+        return [ row[-1] for row in self.db.execute( 'EXPLAIN QUERY PLAN SELECT id FROM hands%s'%clause, params ) ]
@@ -0,0 +1,59 @@
+'''
+Measures the per line cost of matching the player and action
+alternatives on betting action lines, comparing the compiled
+Alternatives against trying every candidate with peek in turn.
+
+Run from src/test/python with src/main/python on the PYTHONPATH.
+'''
+import timeit
+
+from parser.scanner import Scanner, BadAlternative, compileAlternatives
+from parser.pokerstars import PLAYER_LINES
+
+PLAYERS = [ 'winkom', 'ACemartan', 'antler88', 'enovision', 'h0stjke',
+            'Oilits', 'Nights0ng', 'ILoveNatasha', 'SLAVA ZENIT' ]
+
+LINES = [ 'ILoveNatasha: raises 2816 to 3766 and is all-in\n',
+          'winkom: folds \n',
+          'SLAVA ZENIT has timed out while being disconnected\n',
+          'Oilits collected 5632 from side pot\n',
+          'Nights0ng finished the tournament in 42nd place\n' ] * 200
+
+TEXT = ''.join(LINES)
+
+def peekAlternative( scanner, alts ):
+    # The matching strategy Scanner.alternative used before compilation
+    for alt in alts:
+        if scanner.peek( len(alt) ) == alt:
+            scanner.consume( len(alt) )
+            return alt
+    raise BadAlternative( alt )
+
+def scanPeek():
+    s = Scanner()
+    s.parseString(TEXT)
+    suffixes = list(PLAYER_LINES)
+    for i in range( len(LINES) ):
+        peekAlternative( s, list(set(PLAYERS)) + ['Uncalled bet ('] )
+        peekAlternative( s, suffixes )
+        s.consume( len( s.lookaheadTill('\n') ) + 1 )
+
+def scanCompiled():
+    s = Scanner()
+    s.parseString(TEXT)
+    actors = compileAlternatives( PLAYERS + ['Uncalled bet ('] )
+    for i in range( len(LINES) ):
+        s.alternative( actors )
+        s.alternative( PLAYER_LINES )
+        s.consume( len( s.lookaheadTill('\n') ) + 1 )
+
+def report( name, fn, repeat=5, number=20 ):
+    best = min( timeit.repeat( fn, repeat=repeat, number=number ) )
+    perLine = best / number / len(LINES) * 1e6
+    print "%-10s %6.2f us/line"%(name, perLine)
+    return perLine
+
+if __name__ == '__main__':
+    before = report( 'peek', scanPeek )
+    after = report( 'compiled', scanCompiled )
+    print "speedup    %6.2fx"%(before/after)
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import parser
+from parser import handparser
+from parser.cache import HandCache
+
+from testutil import describe
+
+MULTI = '../resources/pokerstars/multi.txt'
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join( self.folder, 'multi.txt' )
+        shutil.copyfile( MULTI, self.path )
+        self.cache = HandCache( os.path.join( self.folder, 'cache' ) )
+
+    def tearDown(self):
+        shutil.rmtree( self.folder )
+
+    def testNonAsciiPath(self):
+        path = os.path.join( self.folder, 'Tournoi \xc3\xa9.txt' )
+        shutil.copyfile( MULTI, path )
+        self.assertEqual( len( self.cache.parseFile( path ) ), 26 )
+        self.assertEqual( len( self.cache.parseFile( path ) ), 26 )
+        self.assertEqual( ( self.cache.hits, self.cache.misses ), ( 1, 1 ) )
+
+    def testLoadsUnchangedFiles(self):
+        expected = [ describe(h) for h in parser.parseFile( MULTI ) ]
+        self.assertEqual( [ describe(h) for h in self.cache.parseFile( self.path ) ], expected )
+        self.assertEqual( [ describe(h) for h in self.cache.parseFile( self.path ) ], expected )
+        self.assertEqual( ( self.cache.hits, self.cache.misses ), ( 1, 1 ) )
+
+    def testChangedFilesAreParsedAgain(self):
+        self.assertEqual( len( self.cache.parseFile( self.path ) ), 26 )
+        text = open( MULTI, 'rb' ).read()
+        # keep only the first hand, with a different modification time
+        open( self.path, 'wb' ).write( text[:text.index( '\nPokerStars ', 10 )] )
+        os.utime( self.path, ( time.time() + 10, time.time() + 10 ) )
+        self.assertEqual( len( self.cache.parseFile( self.path ) ), 1 )
+        self.assertEqual( self.cache.misses, 2 )
+
+    def testVerifyContents(self):
+        cache = HandCache( self.cache.folder, verify = True )
+        cache.parseFile( self.path )
+        st = os.stat( self.path )
+        text = open( self.path, 'rb' ).read()
+        # same size and time, different contents
+        open( self.path, 'wb' ).write( text.replace( 'Seat 1: ', 'Seat 1; ', 1 ) )
+        os.utime( self.path, ( st.st_atime, st.st_mtime ) )
+        self.assertRaises( handparser.HandParsingException, cache.parseFile, self.path )
+        self.assertEqual( cache.misses, 2 )
+
+    def testBadHandsAreCached(self):
+        text = open( MULTI, 'rb' ).read()
+        open( self.path, 'wb' ).write( text.replace( '\nTable ', '\nTabel ', 1 ) )
+        for i in range( 2 ):
+            errors = []
+            self.assertEqual( len( self.cache.parseFile( self.path, None, errors ) ), 25 )
+            self.assertEqual( len( errors ), 1 )
+        self.assertRaises( handparser.HandParsingException, self.cache.parseFile, self.path )
+        self.assertEqual( self.cache.misses, 1 )
+
+    def testEviction(self):
+        paths = []
+        for i in range( 3 ):
+            path = os.path.join( self.folder, 'copy%d.txt'%i )
+            shutil.copyfile( MULTI, path )
+            self.cache.parseFile( path )
+            entry = self.cache.entryName( path )
+            os.utime( entry, ( i, i ) )
+            paths.append( path )
+        size = self.cache.size()
+        self.assertEqual( self.cache.evict( size - 1 ), 1 )
+        # the least recently used entry went
+        self.assertFalse( os.path.exists( self.cache.entryName( paths[0] ) ) )
+        self.assertTrue( os.path.exists( self.cache.entryName( paths[2] ) ) )
+        self.assertEqual( self.cache.clear(), 2 )
+        self.assertEqual( self.cache.size(), 0 )
+
+    def testBoundedWithoutEvict(self):
+        self.cache.parseFile( self.path )
+        entrySize = self.cache.size()
+        cache = HandCache( os.path.join( self.folder, 'bounded' ), entrySize * 5 // 2 )
+        for i in range( 10 ):
+            path = os.path.join( self.folder, 'copy%d.txt'%i )
+            shutil.copyfile( MULTI, path )
+            self.assertEqual( len( cache.parseFile( path ) ), 26 )
+            self.assertTrue( cache.size() <= cache.max_bytes )
+        self.assertEqual( len( cache.entries() ), 2 )
+        self.assertEqual( cache.total, cache.size() )
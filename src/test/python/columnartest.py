@@ -0,0 +1,77 @@
+import glob
+import unittest
+
+import numpy
+
+import parser
+from pokergame import Action, Card
+from stats.columnar import HandTable, NO_CARD
+
+from testutil import describe
+
+CORPUS = sorted( glob.glob('../resources/pokerstars/*.txt') )
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.hands = []
+        for f in CORPUS:
+            self.hands.extend( parser.parseFile( f ) )
+        self.table = HandTable.fromHands( self.hands )
+
+    def testRoundTrip(self):
+        expected = [ describe(h) for h in self.hands ]
+        self.assertEqual( [ describe(h) for h in self.table.toHands() ], expected )
+        self.assertEqual( describe( self.table.toHand(5) ), expected[5] )
+
+    def testColumns(self):
+        t = self.table
+        self.assertEqual( len(t), len(self.hands) )
+        actions = [ a for h in self.hands for r in set( h.rounds ) for a in r.actions ]
+        self.assertEqual( len(t.action), len(actions) )
+        for column in [ t.street, t.player, t.seat, t.amount, t.amount_type, t.bet ]:
+            self.assertEqual( len(column), len(actions) )
+        self.assertEqual( t.cards.shape, ( len(actions), 2 ) )
+        # hands are in order so rows can be found by binary search
+        self.assertTrue( ( t.hand[1:] >= t.hand[:-1] ).all() )
+        first = self.hands[0].rounds[0].actions[0]
+        self.assertEqual( t.names[ t.player[0] ], first.player.name )
+        self.assertEqual( t.action[0], first.action )
+
+    def testCardCodes(self):
+        h = self.hands[0]
+        hero = [ p for p in h.players.values() if p.startingHand is not None ][0]
+        row = [ i for i in range( len(self.table.player_id) )
+                if self.table.player_hand[i] == 0 and self.table.names[ self.table.player_id[i] ] == hero.name ][0]
+        self.assertEqual( [ Card.fromCode(c) for c in self.table.player_cards[row] if c != NO_CARD ], hero.startingHand )
+
+    def testQueries(self):
+        raises = {}
+        called = {}
+        for h in self.hands:
+            for r in set( h.rounds ):
+                for a in r.actions:
+                    name = a.player.name
+                    if a.action == Action.Raise:
+                        raises[name] = raises.get( name, 0 ) + 1
+                    if a.action == Action.Call:
+                        called[name] = called.get( name, 0 ) + a.amount.cents
+        counts = self.table.countByPlayer( Action.Raise )
+        amounts = self.table.amountByPlayer( Action.Call )
+        for ( pid, name ) in enumerate( self.table.names ):
+            self.assertEqual( counts[pid], raises.get( name, 0 ) )
+            self.assertEqual( amounts[pid], called.get( name, 0 ) )
+        dealt = self.table.handsByPlayer()
+        self.assertEqual( sum( dealt ), sum( len( h.players ) for h in self.hands ) )
+
+    def testLargeIds(self):
+        # hand numbers don't fit in 32 bits
+        self.assertEqual( self.table.hand_id.dtype, numpy.int64 )
+        self.assertEqual( self.table.hand_id.tolist(), [ h.handId for h in self.hands ] )
+        self.assertTrue( self.table.hand_id.max() > 2 ** 32 )
+        for name in [ 'amount', 'bet', 'player_stack', 'total_pot', 'tournament_id', 'timestamp' ]:
+            self.assertEqual( getattr( self.table, name ).dtype, numpy.int64 )
+
+    def testEmpty(self):
+        table = HandTable.fromHands( [] )
+        self.assertEqual( len(table), 0 )
+        self.assertEqual( table.toHands(), [] )
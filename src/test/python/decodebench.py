@@ -0,0 +1,40 @@
+'''
+Compares parsing the sample hand histories from decoded text against
+scanning their raw bytes, reporting the time taken and how much of the
+input each mode had to decode.
+
+Run from src/test/python with src/main/python on the PYTHONPATH,
+optionally naming the files to parse instead of the sample corpus.
+'''
+import glob
+import sys
+import time
+
+from parser.pokerstars import PokerStarsHandParser
+
+def parseAll( files, engine, raw ):
+    read = decoded = hands = 0
+    start = time.time()
+    for fileName in files:
+        ps = PokerStarsHandParser( fileName, engine, raw )
+        while ps.moreHands():
+            ps.parseHand()
+            hands += 1
+        ps.close()
+        read += ps.read_count
+        decoded += ps.decode_count
+    return ( time.time() - start, hands, read, decoded )
+
+def report( files, engine, raw, repeat=5 ):
+    runs = [ parseAll( files, engine, raw ) for i in range( repeat ) ]
+    ( elapsed, hands, read, decoded ) = min( runs )
+    print "%-8s %-5s %6d hands %8.3fs %10d read %10d decoded (%5.1f%%)"%(
+        engine, raw and 'bytes' or 'text', hands, elapsed, read, decoded, 100.0 * decoded / max( read, 1 ) )
+    return elapsed
+
+if __name__ == '__main__':
+    files = sys.argv[1:] or sorted( glob.glob( '../resources/pokerstars/*.txt' ) )
+    for engine in [ PokerStarsHandParser.SCANNER, PokerStarsHandParser.REGEX ]:
+        before = report( files, engine, False )
+        after = report( files, engine, True )
+        print "speedup  %6.2fx"%( before / after )
@@ -0,0 +1,91 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import parser
+from parser import dedup
+from parser.dedup import SeenHands
+
+CORPUS = sorted( glob.glob('../resources/pokerstars/*.txt') )
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree( self.folder )
+
+    def testAdd(self):
+        seen = SeenHands( capacity=100 )
+        self.assertTrue( seen.add( 76511439355 ) )
+        self.assertFalse( seen.add( 76511439355 ) )
+        self.assertTrue( 76511439355 in seen )
+        self.assertFalse( 76511439356 in seen )
+        self.assertEqual( len( seen ), 1 )
+
+    def testAddMany(self):
+        seen = SeenHands( capacity=1000 )
+        ids = numpy.random.RandomState( 3 ).randint( 0, 10 ** 11, 5000 )
+        # the filter grows past its capacity
+        self.assertTrue( seen.addMany( ids ).all() )
+        self.assertTrue( seen.capacity >= 5000 )
+        self.assertEqual( len( seen ), 5000 )
+        self.assertFalse( seen.addMany( ids[:100] ).any() )
+        # a number twice in one batch is only new once
+        self.assertEqual( seen.addMany( [ 1, 2, 1 ] ).tolist(), [ True, True, False ] )
+        # one at a time and in batches agree
+        self.assertTrue( all( i in seen for i in ids[::50] ) )
+        self.assertEqual( sum( seen.add( i ) for i in ids[::50] ), 0 )
+        self.assertEqual( seen._positions( ids[:20] ).tolist(), [ seen._positionsOf( int(i) ) for i in ids[:20] ] )
+
+    def testFalsePositives(self):
+        seen = SeenHands( capacity=20000 )
+        seen.addMany( numpy.arange( 10 ** 6, 10 ** 6 + 20000 ) )
+        # new numbers rarely get past the filter, and never past the exact check
+        others = numpy.arange( 2 * 10 ** 6, 2 * 10 ** 6 + 20000 )
+        self.assertTrue( seen._maybe( others ).mean() < 0.02 )
+        self.assertFalse( seen._seen( others ).any() )
+
+    def testPending(self):
+        seen = SeenHands( capacity=1000 )
+        old = dedup.PENDING
+        dedup.PENDING = 10
+        try:
+            for i in range( 25 ):
+                seen.add( i )
+        finally:
+            dedup.PENDING = old
+        self.assertEqual( len( seen.ids ), 20 )
+        self.assertEqual( len( seen.pending ), 5 )
+        self.assertEqual( seen.ids.tolist(), range( 20 ) )
+        self.assertTrue( all( i in seen for i in range( 25 ) ) )
+
+    def testSave(self):
+        path = os.path.join( self.folder, 'seen.npz' )
+        seen = SeenHands( path )
+        seen.addMany( [ 5, 3, 9 ] )
+        seen.add( 7 )
+        seen.save()
+        loaded = SeenHands( path )
+        self.assertEqual( loaded.ids.tolist(), [ 3, 5, 7, 9 ] )
+        self.assertTrue( 7 in loaded )
+        self.assertFalse( loaded.add( 3 ) )
+        self.assertTrue( loaded.add( 4 ) )
+        self.assertEqual( ( loaded.bits, loaded.hashes, loaded.capacity ), ( seen.bits, seen.hashes, seen.capacity ) )
+
+    def testFilter(self):
+        seen = SeenHands( os.path.join( self.folder, 'seen.npz' ) )
+        hands = []
+        for f in CORPUS:
+            hands.extend( seen.filter( parser.iterHands( f ) ) )
+        ids = [ h.handId for h in hands ]
+        # multi.txt holds hands that are in the other files too
+        self.assertEqual( len( ids ), len( set( ids ) ) )
+        self.assertEqual( len( ids ), 26 )
+        seen.save()
+        again = SeenHands( os.path.join( self.folder, 'seen.npz' ) )
+        self.assertEqual( list( again.filter( parser.iterHands( CORPUS[0] ) ) ), [] )
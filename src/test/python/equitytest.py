@@ -0,0 +1,81 @@
+import glob
+import itertools
+import multiprocessing
+import unittest
+
+import parser
+from equity.equity import equity, handEquities
+from equity.evaluator import evaluate, codes
+
+def bruteForce( holes, board ):
+    holes = [ codes( hole ) for hole in holes ]
+    board = codes( board )
+    used = board + [ c for hole in holes for c in hole ]
+    deck = [ c for c in range(52) if c not in used ]
+    totals = [ 0.0 ] * len( holes )
+    ways = 0
+    for rest in itertools.combinations( deck, 5 - len( board ) ):
+        ranks = [ evaluate( hole + board + list( rest ) ) for hole in holes ]
+        winners = [ i for ( i, r ) in enumerate( ranks ) if r == max( ranks ) ]
+        for i in winners:
+            totals[i] += 1.0 / len( winners )
+        ways += 1
+    return [ t / ways for t in totals ]
+
+class Test(unittest.TestCase):
+    def testExact(self):
+        holes = [ [ 'Ah', 'Kh' ], [ 'Qc', 'Qs' ], [ '7d', '8d' ] ]
+        board = [ '2h', '9h', 'Ts' ]
+        result = equity( holes, board )
+        self.assertTrue( result.exact )
+        self.assertEqual( result.trials, 43 * 42 // 2 )
+        for ( e, expected ) in zip( result.equities, bruteForce( holes, board ) ):
+            self.assertAlmostEqual( e, expected )
+        # a split pot is shared
+        result = equity( [ [ 'Ah', '2c' ], [ 'Ad', '3c' ] ], [ 'Kh', 'Qd', 'Js', 'Tc', '8h' ] )
+        self.assertEqual( result.equities, [ 0.5, 0.5 ] )
+        self.assertEqual( result.trials, 1 )
+
+    def testMonteCarlo(self):
+        holes = [ [ 'Ah', 'Ad' ], [ 'Kc', 'Ks' ] ]
+        result = equity( holes, target=0.004 )
+        self.assertFalse( result.exact )
+        self.assertTrue( max( result.errors ) <= 0.004 )
+        # AA against KK is 81.26% over all 1712304 boards
+        self.assertTrue( abs( result.equities[0] - 0.81255 ) < 4 * result.errors[0] )
+        self.assertAlmostEqual( sum( result.equities ), 1.0 )
+        # the same seed gives the same answer, another seed another one
+        self.assertEqual( equity( holes, target=0.004 ).equities, result.equities )
+        self.assertNotEqual( equity( holes, target=0.004, seed=1 ).equities, result.equities )
+        # a tighter target deals more boards, up to the limit
+        result = equity( holes, target=0.0001, maxTrials=60000, batch=10000 )
+        self.assertEqual( result.trials, 60000 )
+        self.assertTrue( max( result.errors ) > 0.0001 )
+
+    def testPool(self):
+        holes = [ [ 'Ah', 'Ad' ], [ 'Kc', 'Ks' ], [ '9s', '8s' ] ]
+        pool = multiprocessing.Pool( 2 )
+        try:
+            self.assertEqual( equity( holes, target=0.005, pool=pool ).equities,
+                              equity( holes, target=0.005 ).equities )
+            self.assertEqual( equity( holes, [ '2c', '3c', '4c' ], pool=pool ).equities,
+                              equity( holes, [ '2c', '3c', '4c' ] ).equities )
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def testBadHands(self):
+        self.assertRaises( ValueError, equity, [ [ 'Ah', 'Ad' ] ] )
+        self.assertRaises( ValueError, equity, [ [ 'Ah', 'Ad' ], [ 'Ah', 'Ks' ] ] )
+        self.assertRaises( ValueError, equity, [ [ 'Ah', 'Ad' ], [ 'Kc', 'Ks' ] ], [ 'Ad' ] )
+        self.assertRaises( ValueError, equity, [ [ 'Ah', 'Ad' ], [ 'Kc' ] ] )
+
+    def testHandEquities(self):
+        hand = parser.parseFile( sorted( glob.glob( '../resources/pokerstars/*.txt' ) )[0] )[0]
+        streets = handEquities( hand, target=0.005 )
+        self.assertEqual( [ len( board ) for ( board, equities ) in streets ], [ 0, 3, 4, 5 ] )
+        # the hero's cards are known too, until the hero folds preflop
+        self.assertEqual( sorted( streets[0][1] ), [ 'antler88', 'h0stjke', 'jose tomas20' ] )
+        self.assertEqual( sorted( streets[1][1] ), [ 'h0stjke', 'jose tomas20' ] )
+        self.assertEqual( streets[3][1], { 'h0stjke': 1.0, 'jose tomas20': 0.0 } )
+        self.assertAlmostEqual( streets[2][1]['h0stjke'], 10.0 / 11 )
@@ -0,0 +1,50 @@
+'''
+Measures the throughput of the hand evaluator: random seven card hands
+ranked one at a time, as a batch, and as a batch of hole cards against
+a shared board whose keys are added up once.
+
+Run from src/test/python with src/main/python on the PYTHONPATH,
+optionally giving the number of hands in a batch.
+'''
+import sys
+import time
+
+import numpy
+
+from equity import evaluator
+
+def deal( n, cards, seed=1 ):
+    rnd = numpy.random.RandomState( seed )
+    return numpy.argsort( rnd.rand( n, 52 ), axis=1 )[:,:cards].astype( numpy.int8 )
+
+def best( f, repeat=5 ):
+    times = []
+    for i in range( repeat ):
+        start = time.time()
+        f()
+        times.append( time.time() - start )
+    return min( times )
+
+if __name__ == '__main__':
+    n = int( sys.argv[1] ) if len( sys.argv ) > 1 else 2000000
+    start = time.time()
+    evaluator.rankTable( 7 )
+    print "seven card table built in %.2fs"%( time.time() - start )
+    hands = deal( n, 7 )
+    single = hands[:20000].tolist()
+    elapsed = best( lambda: [ evaluator.evaluate( cards ) for cards in single ], 1 )
+    print "one at a time %8.2f M hands/s"%( len( single ) / elapsed / 1e6 )
+    elapsed = best( lambda: evaluator.evaluateBatch( hands ) )
+    print "batch         %8.2f M hands/s"%( n / elapsed / 1e6 )
+    # every hole card pair that doesn't clash with one board
+    board = hands[0,:5].tolist()
+    holes = numpy.array( [ ( a, b ) for a in range(52) for b in range( a + 1, 52 )
+                           if a not in board and b not in board ], dtype=numpy.int8 )
+    holes = numpy.tile( holes, ( n // len( holes ) + 1, 1 ) )[:n]
+    boardKey = evaluator.CODE_KEYS[ board ].sum()
+    boardBits = numpy.bitwise_or.reduce( evaluator.CODE_BITS[ board ] )
+    def shared():
+        keys = evaluator.CODE_KEYS[ holes[:,0] ] + evaluator.CODE_KEYS[ holes[:,1] ] + boardKey
+        return evaluator.evaluateKeys( keys, 7, cards=holes, sharedBits=boardBits )
+    elapsed = best( shared )
+    print "shared board  %8.2f M hands/s"%( n / elapsed / 1e6 )
@@ -0,0 +1,76 @@
+import glob
+import itertools
+import unittest
+
+import numpy
+
+import parser
+from equity import evaluator
+from equity.evaluator import evaluate, evaluateBatch, evaluateKeys, category
+
+def best( cards ):
+    return max( evaluate( list(five) ) for five in itertools.combinations( cards, 5 ) )
+
+class Test(unittest.TestCase):
+    def testCategories(self):
+        self.assertEqual( evaluator.NUM_RANKS, 7462 )
+        classes = numpy.bincount( category( numpy.arange( 1, 7463 ) ) )
+        self.assertEqual( classes.tolist(), [ 1277, 2860, 858, 858, 10, 1277, 156, 156, 10 ] )
+        self.assertEqual( evaluate( [ '7c', '5d', '4h', '3s', '2c' ] ), 1 )
+        self.assertEqual( evaluate( [ 'Ah', 'Kh', 'Qh', 'Jh', 'Th' ] ), 7462 )
+        hands = [ ( [ '7c', '5d', '4h', '3s', '2c', '9d', '8h' ], evaluator.HIGH_CARD ),
+                  ( [ 'Ac', 'Ad', '4h', '3s', '9c', 'Td', 'Qh' ], evaluator.PAIR ),
+                  ( [ 'Ac', 'Ad', '4h', '4s', '9c', '9d', 'Qh' ], evaluator.TWO_PAIR ),
+                  ( [ '5c', '5d', '5h', '3s', '9c', 'Td', 'Qh' ], evaluator.TRIPS ),
+                  ( [ 'Ac', '2d', '3h', '4s', '5c', 'Td', 'Qh' ], evaluator.STRAIGHT ),
+                  ( [ 'Ac', '2c', '8c', '4c', '5c', 'Td', 'Qh' ], evaluator.FLUSH ),
+                  ( [ '5c', '5d', '5h', '3s', '3c', '3d', 'Qh' ], evaluator.FULL_HOUSE ),
+                  ( [ '5c', '5d', '5h', '5s', '3c', '3d', '3h' ], evaluator.QUADS ),
+                  ( [ 'Ac', '2c', '3c', '4c', '5c', '6d', '7h' ], evaluator.STRAIGHT_FLUSH ) ]
+        ranks = [ evaluate( cards ) for ( cards, kind ) in hands ]
+        self.assertEqual( [ category( r ) for r in ranks ], [ kind for ( cards, kind ) in hands ] )
+        self.assertEqual( sorted( ranks ), ranks )
+        self.assertEqual( evaluator.describe( ranks[6] ), 'a full house' )
+
+    def testTies(self):
+        # the best five decide, the sixth and seventh cards don't
+        self.assertEqual( evaluate( [ 'Ac', 'Kd', 'Qh', 'Js', '9c', '3d', '2h' ] ),
+                          evaluate( [ 'As', 'Kc', 'Qd', 'Jh', '9s', '4c', '2c' ] ) )
+        self.assertTrue( evaluate( [ 'Ac', 'Kd', 'Qh', 'Js', '9c' ] ) > evaluate( [ 'Ac', 'Kd', 'Qh', 'Js', '8c' ] ) )
+        # a wheel is the lowest straight
+        self.assertTrue( evaluate( [ 'Ac', '2d', '3h', '4s', '5c' ] ) < evaluate( [ '6c', '2d', '3h', '4s', '5c' ] ) )
+
+    def testBestFive(self):
+        rnd = numpy.random.RandomState( 7 )
+        deals = numpy.argsort( rnd.rand( 400, 52 ), axis=1 )[:,:7]
+        for cards in deals.tolist():
+            self.assertEqual( evaluate( cards ), best( cards ) )
+            self.assertEqual( evaluate( cards[:6] ), best( cards[:6] ) )
+
+    def testBatch(self):
+        rnd = numpy.random.RandomState( 11 )
+        deals = numpy.argsort( rnd.rand( 5000, 52 ), axis=1 )[:,:7].astype( numpy.int8 )
+        for size in [ 5, 6, 7 ]:
+            ranks = evaluateBatch( deals[:,:size] )
+            self.assertEqual( ranks.tolist(), [ evaluate( cards ) for cards in deals[:,:size].tolist() ] )
+        # the same from sums of keys and bits
+        keys = evaluator.CODE_KEYS[ deals ].sum( axis=1 )
+        bits = numpy.bitwise_or.reduce( evaluator.CODE_BITS[ deals ], axis=1 )
+        self.assertEqual( evaluateKeys( keys, 7, bits=bits ).tolist(), evaluateBatch( deals ).tolist() )
+        # and from the hole cards with the board's sums added once
+        board = deals[0,2:]
+        holes = numpy.array( [ ( a, b ) for a in range(52) for b in range( a + 1, 52 )
+                               if a not in board and b not in board ] )
+        keys = evaluator.CODE_KEYS[ holes ].sum( axis=1 ) + evaluator.CODE_KEYS[ board ].sum()
+        shared = numpy.bitwise_or.reduce( evaluator.CODE_BITS[ board ] )
+        self.assertEqual( evaluateKeys( keys, 7, cards=holes, sharedBits=shared ).tolist(),
+                          [ evaluate( list( pair ) + board.tolist() ) for pair in holes.tolist() ] )
+        self.assertRaises( ValueError, evaluateBatch, deals[:,:4] )
+
+    def testShowdown(self):
+        hand = parser.parseFile( sorted( glob.glob( '../resources/pokerstars/*.txt' ) )[0] )[0]
+        ranks = evaluator.showdown( hand )
+        self.assertEqual( sorted( ranks ), [ 'antler88', 'h0stjke', 'jose tomas20' ] )
+        self.assertEqual( category( ranks['h0stjke'] ), evaluator.PAIR )
+        self.assertEqual( category( ranks['jose tomas20'] ), evaluator.HIGH_CARD )
+        self.assertTrue( ranks['h0stjke'] > ranks['jose tomas20'] )
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import parser
+from parser.handindex import HandIndex, openIndex
+
+from testutil import describe
+
+MULTI = '../resources/pokerstars/multi.txt'
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join( self.folder, 'multi.txt' )
+        shutil.copyfile( MULTI, self.path )
+
+    def tearDown(self):
+        shutil.rmtree( self.folder )
+
+    def testHeaders(self):
+        index = openIndex( self.path )
+        self.assertEqual( len(index), 26 )
+        self.assertEqual( index.hands[0][:4], ( 76511439355, 525756016, 'I', '2012/03/02 23:15:42' ) )
+        # the byte order mark isn't part of the first hand
+        self.assertEqual( index.hands[0][4], 3 )
+        self.assertEqual( index.hands[-1][5], os.path.getsize( self.path ) )
+
+    def testParseSingleHands(self):
+        expected = [ describe(h) for h in parser.parseFile( MULTI ) ]
+        index = openIndex( self.path )
+        for position in [ 0, 7, 25 ]:
+            self.assertEqual( describe( index.parseHand( position ) ), expected[position] )
+        hand_id = index.hands[12][0]
+        self.assertEqual( describe( index.parseHandById( hand_id, 'regex' ) ), expected[12] )
+        self.assertRaises( KeyError, index.parseHandById, 1 )
+
+    def testSavedIndex(self):
+        openIndex( self.path )
+        self.assertTrue( os.path.exists( self.path + '.idx' ) )
+        index = HandIndex( self.path )
+        self.assertTrue( index.load() )
+        self.assertFalse( index.update() )
+        self.assertEqual( len(index), 26 )
+
+    def testGrowingFile(self):
+        text = open( MULTI, 'rb' ).read()
+        # the file ends part way through the third hand
+        cut = text.index( '\nPokerStars ', text.index( '\nPokerStars ' ) + 1 ) + 200
+        open( self.path, 'wb' ).write( text[:cut] )
+        self.assertEqual( len( openIndex( self.path ) ), 3 )
+        f = open( self.path, 'ab' )
+        f.write( text[cut:] )
+        f.close()
+        index = HandIndex( self.path )
+        index.load()
+        scanned = []
+        scan = index.scan
+        index.scan = lambda start, size: ( scanned.append( start ), scan( start, size ) )
+        self.assertTrue( index.update() )
+        self.assertEqual( scanned, [ index.hands[2][4] ] )
+        self.assertEqual( index.hands, openIndex( MULTI, False ).hands )
@@ -0,0 +1,142 @@
+import codecs
+import os
+import shutil
+import tempfile
+import unittest
+
+import parser
+from parser import handparser
+from parser.handparser import iterHands, iterFolderHands, sniff, findPluginForFile, findParserForFile
+from parser.pokerstars import PokerStarsHandParser
+
+from testutil import describe
+
+MULTI = '../resources/pokerstars/multi.txt'
+
+class Test(unittest.TestCase):
+    def testParseFile(self):
+        self.assertEqual( len( parser.parseFile( MULTI ) ), 26 )
+
+    def testIterHands(self):
+        hands = iterHands( MULTI )
+        first = hands.next()
+        self.assertEqual( describe(first), describe( parser.parseFile( MULTI )[0] ) )
+        self.assertEqual( len( list(hands) ), 25 )
+
+    def testIterHandsEngine(self):
+        self.assertEqual( [ describe(h) for h in iterHands( MULTI, 'regex' ) ],
+                          [ describe(h) for h in iterHands( MULTI ) ] )
+
+    def testIterFolderHands(self):
+        folder = tempfile.mkdtemp()
+        try:
+            for f in [ 'sidepot.txt', 'checks.txt' ]:
+                shutil.copy( os.path.join( '../resources/pokerstars', f ), folder )
+            open( os.path.join( folder, 'notes.txt' ), 'w' ).write( 'not a hand history' )
+            expected = parser.parseFile( os.path.join( folder, 'checks.txt' ) ) + parser.parseFile( os.path.join( folder, 'sidepot.txt' ) )
+            self.assertEqual( [ describe(h) for h in iterFolderHands( folder ) ],
+                              [ describe(h) for h in expected ] )
+        finally:
+            shutil.rmtree( folder )
+
+    def testSniff(self):
+        self.assertTrue( sniff( 'PokerStars Hand #76512701488: Tournament' ) is PokerStarsHandParser )
+        self.assertTrue( sniff( '\xef\xbb\xbf\r\nPokerStars Game #1: Tournament' ) is PokerStarsHandParser )
+        self.assertEqual( sniff( 'Full Tilt Poker Game #1' ), None )
+
+    def testFindPluginForFile(self):
+        # rebuy.txt starts with a byte order mark
+        for f in [ 'rebuy.txt', 'checks.txt' ]:
+            self.assertTrue( findPluginForFile( os.path.join( '../resources/pokerstars', f ) ) is PokerStarsHandParser )
+        self.assertTrue( PokerStarsHandParser.canParseFile( MULTI ) )
+        self.assertFalse( PokerStarsHandParser.canParseFile( 'handparsertest.py' ) )
+
+    def testParserReadsSniffedHandle(self):
+        parser_ = findParserForFile( '../resources/pokerstars/rebuy.txt' )
+        self.assertEqual( len( list( handparser.iterParser( parser_ ) ) ), 1 )
+        self.assertEqual( findParserForFile( 'handparsertest.py' ), None )
+
+    def testPluginsLoadLazily(self):
+        # a plugin whose module doesn't exist is harmless until a file matches it
+        handparser.declareParserPlugin( '.nosuchplugin', 'NoSuchParser', r'No Such Site Hand #' )
+        try:
+            self.assertTrue( findPluginForFile( MULTI ) is PokerStarsHandParser )
+            self.assertEqual( findPluginForFile( 'handparsertest.py' ), None )
+            self.assertRaises( ImportError, sniff, 'No Such Site Hand #1' )
+        finally:
+            del handparser._declaredPlugins[-1]
+
+    def breakHands(self, text):
+        # break the table lines of the 3rd hand and of the last one
+        pos = text.index( '\nTable ', text.index( '\nTable ', text.index( '\nTable ' ) + 1 ) + 1 )
+        text = text[:pos+1] + 'Tabel' + text[pos+6:]
+        pos = text.rindex( '\nTable ' )
+        return text[:pos+1] + 'Tabel' + text[pos+6:]
+
+    def testParserFailsToOpen(self):
+        opened = []
+        init = PokerStarsHandParser.__init__
+        def broken( self, f, *args ):
+            opened.append( f )
+            raise ValueError( 'bad header' )
+        PokerStarsHandParser.__init__ = broken
+        try:
+            self.assertRaises( ValueError, findParserForFile, MULTI )
+        finally:
+            PokerStarsHandParser.__init__ = init
+        self.assertTrue( opened[0].closed )
+
+    def testRecovery(self):
+        folder = tempfile.mkdtemp()
+        try:
+            text = open( MULTI, 'rb' ).read()
+            broken = self.breakHands( text )
+            path = os.path.join( folder, 'broken.txt' )
+            open( path, 'wb' ).write( broken )
+            self.assertRaises( handparser.HandParsingException, parser.parseFile, path )
+            expected = [ describe(h) for h in parser.parseFile( MULTI ) ]
+            for engine in [ None, 'regex' ]:
+                errors = []
+                hands = parser.parseFile( path, engine, errors )
+                self.assertEqual( [ describe(h) for h in hands ], expected[:2] + expected[3:-1] )
+                self.assertEqual( [ e.hand_id for e in errors ], [ 73733798497, 73558131745 ] )
+                self.assertEqual( errors[0].line_num, broken[:broken.index('\nTabel')].count('\n') + 2 )
+        finally:
+            shutil.rmtree( folder )
+
+    def testRecoveryAfterBlankLines(self):
+        folder = tempfile.mkdtemp()
+        try:
+            text = open( MULTI, 'rb' ).read()
+            # the first hand is broken and the file starts with a newline, like knockout.txt
+            pos = text.index( '\nTable ' )
+            bom = codecs.BOM_UTF8
+            self.assertTrue( text.startswith( bom ) )
+            broken = bom + '\n' + text[len(bom):pos+1] + 'Tabel' + text[pos+6:]
+            path = os.path.join( folder, 'broken.txt' )
+            open( path, 'wb' ).write( broken )
+            expected = [ describe(h) for h in parser.parseFile( MULTI ) ]
+            for engine in [ None, 'regex' ]:
+                errors = []
+                hands = parser.parseFile( path, engine, errors )
+                self.assertEqual( [ describe(h) for h in hands ], expected[1:] )
+                self.assertEqual( len( errors ), 1 )
+                self.assertEqual( errors[0].offset, len(bom) + 1 )
+        finally:
+            shutil.rmtree( folder )
+
+    def testRecoveryAcrossBlocks(self):
+        folder = tempfile.mkdtemp()
+        try:
+            text = open( MULTI, 'rb' ).read()
+            path = os.path.join( folder, 'broken.txt' )
+            open( path, 'wb' ).write( self.breakHands( text ) )
+            ps = PokerStarsHandParser( path )
+            ps.BLOCK_SIZE = 50
+            errors = []
+            hands = list( handparser.iterParser( ps, None, errors ) )
+            self.assertEqual( len(hands), 24 )
+            # files are scanned as bytes so the offset is into the file
+            self.assertEqual( errors[0].offset, text.index( 'PokerStars Hand #73733798497' ) )
+        finally:
+            shutil.rmtree( folder )
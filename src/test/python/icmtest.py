@@ -0,0 +1,65 @@
+import glob
+import itertools
+import unittest
+
+import parser
+from equity.icm import ICM, icm, icmHands, finalStacks
+
+def bruteForce( stacks, payouts ):
+    '''Equities summed over every finishing order'''
+    equities = [ 0.0 ] * len( stacks )
+    for order in itertools.permutations( range( len( stacks ) ) ):
+        chance = 1.0
+        left = sum( stacks )
+        for i in order:
+            chance *= float( stacks[i] ) / left
+            left -= stacks[i]
+        for ( place, i ) in enumerate( order[:len( payouts )] ):
+            equities[i] += chance * payouts[place]
+    return equities
+
+class Test(unittest.TestCase):
+    def testAgainstBruteForce(self):
+        for ( stacks, payouts ) in [ ( [ 1500, 3000, 500, 1000, 2500 ], [ 50, 30, 20 ] ),
+                                     ( [ 7, 1, 3, 2, 9, 4 ], [ 0.4, 0.25, 0.15, 0.1, 0.06, 0.04 ] ),
+                                     ( [ 100, 200 ], [ 65, 35, 10 ] ) ]:
+            for ( got, expected ) in zip( icm( stacks, payouts ), bruteForce( stacks, payouts ) ):
+                self.assertAlmostEqual( got, expected )
+
+    def testEquities(self):
+        model = ICM( [ 50, 30, 20 ] )
+        equities = model.equities( [ 1000, 1000, 1000 ] )
+        self.assertEqual( [ round( e, 9 ) for e in equities ], [ round( 100.0 / 3, 9 ) ] * 3 )
+        # winner takes all is the chip share
+        self.assertEqual( ICM( [ 1 ] ).equities( [ 1, 3 ] ), [ 0.25, 0.75 ] )
+        # the same stacks scaled or reordered are remembered
+        first = model.equities( [ 300, 100, 200 ] )
+        self.assertEqual( model.misses, 2 )
+        self.assertEqual( model.equities( [ 2000, 3000, 1000 ] ), [ first[2], first[0], first[1] ] )
+        self.assertEqual( model.hits, 1 )
+        self.assertAlmostEqual( sum( first ), 100 )
+        # players without chips share the places below the rest
+        self.assertEqual( model.equities( [ 10, 0, 30 ] ), [ 35.0, 20.0, 45.0 ] )
+        self.assertEqual( model.equities( [ 0, 10, 0 ] ), [ 25.0, 50.0, 25.0 ] )
+
+    def testHands(self):
+        hands = []
+        for f in sorted( glob.glob( '../resources/pokerstars/*.txt' ) ):
+            hands.extend( parser.parseFile( f ) )
+        payouts = [ 50, 30, 20 ]
+        results = icmHands( hands, payouts )
+        self.assertEqual( len( results ), len( hands ) )
+        for ( hand, equities ) in zip( hands, results ):
+            self.assertEqual( sorted( equities ), sorted( hand.players ) )
+            self.assertAlmostEqual( sum( equities.values() ), sum( payouts[:len( equities )] ) )
+        first = results[0]
+        self.assertEqual( first['b.oleg16'], first['antler88'] ) # both had 1380
+        self.assertTrue( first['ILoveNatasha'] > first['winkom'] > first['jose tomas20'] )
+        # after the first hand jose tomas20 is out and h0stjke has the chips
+        after = icmHands( hands[:1], payouts, after=True )[0]
+        self.assertEqual( after['jose tomas20'], 0 )
+        self.assertEqual( finalStacks( hands[0] )['h0stjke'], 1470 + 640 )
+        self.assertTrue( after['h0stjke'] > first['h0stjke'] )
+        # payouts by hand, None skips a hand
+        results = icmHands( hands[:2], lambda hand: payouts if len( hand.players ) == 8 else None )
+        self.assertEqual( results[0], first )
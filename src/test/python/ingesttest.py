@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import parser
+from parser.ingest import ingestFile
+
+MULTI = '../resources/pokerstars/multi.txt'
+
+class Test(unittest.TestCase):
+    def testIngestFile(self):
+        result = ingestFile( ( MULTI, None, None, True ) )
+        self.assertEqual( result.hands, 26 )
+        self.assertEqual( result.potProblems, [] )
+        self.assertEqual( result.handIds, [ h.handId for h in parser.parseFile( MULTI ) ] )
+        self.assertEqual( result.size, os.path.getsize( MULTI ) )
+        self.assertEqual( result.error, None )
+        self.assertTrue( result.recognised )
+
+    def testIngestFileIsolatesFailures(self):
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join( folder, 'broken.txt' )
+            open( path, 'wb' ).write( 'PokerStars Hand #1: garbage\n' )
+            result = ingestFile( ( path, None, None, False ) )
+            # a hand that fails to parse is skipped rather than failing the file
+            self.assertEqual( result.error, None )
+            self.assertEqual( result.hands, 0 )
+            self.assertEqual( [ ( h[0], h[1] ) for h in result.badHands ], [ ( 1, 0 ) ] )
+            path = os.path.join( folder, 'notes.txt' )
+            open( path, 'wb' ).write( 'not a hand history' )
+            self.assertFalse( ingestFile( ( path, None, None, False ) ).recognised )
+        finally:
+            shutil.rmtree( folder )
@@ -0,0 +1,53 @@
+'''
+Measures how much memory parsed hands take up, reporting the bytes per
+hand of the object graph below the hands (objects shared between hands,
+like interned cards, are only counted once) and the growth of the
+process's resident set while holding them.
+
+Run from src/test/python with src/main/python on the PYTHONPATH,
+optionally naming the files to parse instead of the sample corpus.
+'''
+import gc
+import glob
+import sys
+
+import parser
+
+# Objects that belong to the module level and not to any hand
+SHARED = ( type, type(sys), type(len) )
+
+def deepSize( roots ):
+    '''Total sys.getsizeof of every object reachable from roots'''
+    seen = set()
+    stack = list( roots )
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance( obj, SHARED ):
+            continue
+        seen.add( id(obj) )
+        total += sys.getsizeof( obj )
+        stack.extend( gc.get_referents( obj ) )
+    return total
+
+def rss():
+    '''Resident set size of this process in bytes'''
+    f = open( '/proc/self/statm' )
+    try:
+        return int( f.read().split()[1] ) * 4096
+    finally:
+        f.close()
+
+if __name__ == '__main__':
+    files = sys.argv[1:] or sorted( glob.glob( '../resources/pokerstars/*.txt' ) )
+    gc.collect()
+    before = rss()
+    hands = []
+    for f in files:
+        hands.extend( parser.parseFile( f ) )
+    gc.collect()
+    grown = rss() - before
+    size = deepSize( hands )
+    print "%d hands, %d actions"%( len(hands), sum( len(r.actions) for h in hands for r in set( h.rounds ) ) )
+    print "object graph  %8.0f bytes/hand"%( float(size) / len(hands) )
+    print "resident set  %8.0f bytes/hand"%( float(grown) / len(hands) )
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import parser
+from parser.handparser import HandParsingException
+from parser.parallel import parseFileParallel, parseFolderParallel, splitFile
+from parser.pokerstars import PokerStarsHandParser
+
+from testutil import describe
+
+MULTI = '../resources/pokerstars/multi.txt'
+
+class Test(unittest.TestCase):
+    def testSplitFile(self):
+        chunks = splitFile( MULTI, PokerStarsHandParser, 10 )
+        self.assertEqual( len(chunks), 3 )
+        self.assertEqual( chunks[0][0], 0 )
+        self.assertEqual( chunks[-1][1], os.path.getsize( MULTI ) )
+        for i in range( len(chunks) - 1 ):
+            self.assertEqual( chunks[i][1], chunks[i+1][0] )
+
+    def testParseFileParallel(self):
+        expected = [ describe(h) for h in parser.parseFile( MULTI ) ]
+        hands = parseFileParallel( MULTI, processes=2, handsPerChunk=3 )
+        self.assertEqual( [ describe(h) for h in hands ], expected )
+
+    def testParseFolderParallel(self):
+        folder = tempfile.mkdtemp()
+        try:
+            for f in [ 'checks.txt', 'sidepot.txt', 'multi.txt' ]:
+                shutil.copy( os.path.join( '../resources/pokerstars', f ), folder )
+            open( os.path.join( folder, 'notes.txt' ), 'w' ).write( 'not a hand history' )
+            expected = []
+            for f in [ 'checks.txt', 'multi.txt', 'sidepot.txt' ]:
+                expected.extend( [ describe(h) for h in parser.parseFile( os.path.join( folder, f ) ) ] )
+            hands = parseFolderParallel( folder, processes=2, handsPerChunk=4 )
+            self.assertEqual( [ describe(h) for h in hands ], expected )
+        finally:
+            shutil.rmtree( folder )
+
+    def testErrorLineIsWithinFile(self):
+        folder = tempfile.mkdtemp()
+        try:
+            text = open( MULTI, 'rb' ).read()
+            # break the table line of the 20th hand
+            pos = -1
+            for i in range(20):
+                pos = text.index( '\nTable ', pos + 1 )
+            path = os.path.join( folder, 'broken.txt' )
+            open( path, 'wb' ).write( text[:pos+1] + 'Tabel' + text[pos+6:] )
+            try:
+                parseFileParallel( path, processes=2, handsPerChunk=3 )
+                self.fail('Expected a HandParsingException')
+            except HandParsingException as e:
+                self.assertEqual( e.line_num, text[:pos].count('\n') + 2 )
+        finally:
+            shutil.rmtree( folder )
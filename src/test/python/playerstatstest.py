@@ -0,0 +1,91 @@
+import cPickle
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import parser
+from stats.playerstats import StatsAggregator, PlayerStats, aggregateFiles
+
+CORPUS = sorted( glob.glob('../resources/pokerstars/*.txt') )
+
+def counters( aggregator ):
+    return dict( ( name, s.__getstate__() ) for ( name, s ) in aggregator.players.items() )
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.hands = []
+        for f in CORPUS:
+            self.hands.extend( parser.parseFile( f ) )
+
+    def testSingleHand(self):
+        stats = StatsAggregator()
+        stats.add( self.hands[0] )
+        self.assertEqual( stats.hands, 1 )
+        self.assertEqual( len( stats.players ), 8 )
+        # raised preflop, called the all-in and won the showdown
+        s = stats.players['h0stjke']
+        self.assertEqual( s.__getstate__(), [ 1, 1, 1, 0, 0, 1, 1, 1 ] )
+        s = stats.players['jose tomas20']
+        self.assertEqual( s.__getstate__(), [ 1, 1, 1, 0, 0, 1, 1, 0 ] )
+        # posting the big blind isn't voluntary
+        s = stats.players['OmegaSayajin']
+        self.assertEqual( s.__getstate__(), [ 1, 0, 0, 0, 0, 0, 0, 0 ] )
+        self.assertEqual( s.VPIP(), 0.0 )
+        self.assertEqual( s.AF(), None )
+        self.assertEqual( s.WTSD(), None )
+
+    def testOutOfHand(self):
+        # players moved in out of hand aren't dealt in
+        stats = StatsAggregator()
+        for engine in [ None, 'regex' ]:
+            stats.addHands( parser.parseFile( '../resources/pokerstars/outofhand.txt', engine ) )
+        self.assertFalse( 'Nights0ng' in stats.players )
+        self.assertEqual( stats.players['winkom'].hands, 2 )
+
+    def testRatios(self):
+        s = PlayerStats()
+        ( s.hands, s.vpip, s.pfr, s.postflopAggressive, s.postflopCalls, s.sawFlop, s.wentToShowdown ) = ( 10, 4, 2, 6, 3, 4, 1 )
+        self.assertEqual( ( s.VPIP(), s.PFR(), s.AF(), s.WTSD() ), ( 0.4, 0.2, 2.0, 0.25 ) )
+
+    def testMerge(self):
+        whole = StatsAggregator().addHands( self.hands )
+        self.assertEqual( whole.hands, len( self.hands ) )
+        for split in [ 1, 17, len( self.hands ) - 1 ]:
+            first = StatsAggregator().addHands( self.hands[:split] )
+            second = StatsAggregator().addHands( self.hands[split:] )
+            merged = StatsAggregator().merge( first ).merge( second )
+            self.assertEqual( merged.hands, whole.hands )
+            self.assertEqual( counters( merged ), counters( whole ) )
+        # adding more hands to merged totals carries on from them
+        more = StatsAggregator().addHands( self.hands[:5] ).addHands( self.hands[5:] )
+        self.assertEqual( counters( more ), counters( whole ) )
+
+    def testIterHands(self):
+        expected = StatsAggregator().addHands( parser.parseFile( CORPUS[0] ) )
+        stats = StatsAggregator().addHands( parser.iterHands( CORPUS[0] ) )
+        self.assertEqual( counters( stats ), counters( expected ) )
+
+    def testSaveAndLoad(self):
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join( folder, 'stats' )
+            self.assertEqual( StatsAggregator.load( path ).hands, 0 )
+            stats = StatsAggregator().addHands( self.hands[:10] )
+            stats.save( path )
+            stats = StatsAggregator.load( path ).addHands( self.hands[10:] )
+            self.assertEqual( counters( stats ), counters( StatsAggregator().addHands( self.hands ) ) )
+            copy = cPickle.loads( cPickle.dumps( stats, 2 ) )
+            self.assertEqual( counters( copy ), counters( stats ) )
+        finally:
+            shutil.rmtree( folder )
+
+    def testAggregateFiles(self):
+        files = CORPUS[:6]
+        expected = StatsAggregator()
+        for f in files:
+            expected.addHands( parser.parseFile( f ) )
+        stats = aggregateFiles( files, 2 )
+        self.assertEqual( stats.hands, expected.hands )
+        self.assertEqual( counters( stats ), counters( expected ) )
@@ -0,0 +1,79 @@
+import cPickle
+import unittest
+
+from pokergame import Card, Money, Action, Hand, Player, BettingRound
+
+class Test(unittest.TestCase):
+    def testCardsAreShared(self):
+        self.assertTrue( Card('Ah') is Card('Ah') )
+        self.assertTrue( Card(u'Td') is Card('Td') )
+        self.assertEqual( ( Card('Ah').value, Card('Ah').suit ), ( 'A', 'h' ) )
+        self.assertRaises( ValueError, Card, 'Xx' )
+
+    def testCardCodes(self):
+        codes = set()
+        for v in Card.VALUES:
+            for s in Card.SUITS:
+                card = Card( v + s )
+                self.assertTrue( Card.fromCode( card.code ) is card )
+                codes.add( card.code )
+        self.assertEqual( codes, set( range(52) ) )
+        self.assertEqual( Card('2c').code, 0 )
+        self.assertEqual( Card('As').code, 51 )
+
+    def testSmallMoneyIsShared(self):
+        self.assertTrue( Money(100) is Money(100) )
+        self.assertTrue( Money(40) + Money(60) is Money(100) )
+        self.assertFalse( Money(100) is Money(100, Money.USD) )
+        self.assertEqual( Money( Money.SMALL ).cents, Money.SMALL )
+
+    def testSlots(self):
+        act = Action()
+        self.assertRaises( AttributeError, setattr, act, 'colour', 'red' )
+
+    def testPickling(self):
+        ( card, money, big ) = cPickle.loads( cPickle.dumps( ( Card('Ks'), Money(20), Money(10**6, Money.USD) ), 2 ) )
+        self.assertTrue( card is Card('Ks') )
+        self.assertTrue( money is Money(20) )
+        self.assertEqual( ( big.cents, big.currency ), ( 10**6, Money.USD ) )
+
+    def makeHand(self, seats):
+        hand = Hand()
+        for ( name, seat ) in seats:
+            player = Player( name )
+            player.seat = seat
+            hand.addPlayer( player )
+        return hand
+
+    def fold(self):
+        act = Action()
+        act.action = Action.Fold
+        return act
+
+    def testLiveness(self):
+        hand = self.makeHand( [ ( 'a', 1 ), ( 'b', 4 ), ( 'c', 9 ) ] )
+        self.assertEqual( hand.allBits, ( 1 << 1 ) | ( 1 << 4 ) | ( 1 << 9 ) )
+        preflop = BettingRound()
+        hand.addBetRound( preflop, [ [ 'b', self.fold() ] ] )
+        flop = BettingRound()
+        hand.addBetRound( flop, [ [ 'a', self.fold() ] ] )
+        self.assertEqual( preflop.livePlayers, set([ 'a', 'c' ]) )
+        self.assertEqual( flop.livePlayers, set([ 'c' ]) )
+        self.assertEqual( flop.liveMask, 1 << 9 )
+
+    def testLivePlayersSetter(self):
+        hand = self.makeHand( [ ( 'a', 1 ), ( 'b', 2 ) ] )
+        r = BettingRound()
+        hand.addBetRound( r, [] )
+        r.livePlayers = set([ 'b' ])
+        self.assertEqual( r.liveMask, 1 << 2 )
+        r.livePlayers = None
+        self.assertEqual( r.livePlayers, None )
+
+    def testUnknownSeats(self):
+        # players without seats get bits that no seated player has
+        hand = self.makeHand( [ ( 'a', None ), ( 'b', 1 ), ( 'c', None ), ( 'd', 1 ) ] )
+        self.assertEqual( len( set( hand.bits.values() ) ), 4 )
+        r = BettingRound()
+        hand.addBetRound( r, [ [ 'c', self.fold() ] ] )
+        self.assertEqual( r.livePlayers, set([ 'a', 'b', 'd' ]) )
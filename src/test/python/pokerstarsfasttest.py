@@ -0,0 +1,83 @@
+import codecs
+import glob
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from parser.pokerstars import PokerStarsHandParser
+from parser.pokerstarsfast import FastHandParser, RejectHand
+
+from testutil import describe
+
+CORPUS = sorted( glob.glob('../resources/pokerstars/*.txt') )
+
+def parseAll( fileName, engine ):
+    ps = PokerStarsHandParser( fileName, engine )
+    hands = []
+    while ps.moreHands():
+        hands.append( ps.parseHand() )
+    return hands
+
+class Test(unittest.TestCase):
+    def testEquivalence(self):
+        for fileName in CORPUS:
+            scanned = [ describe(h) for h in parseAll( fileName, PokerStarsHandParser.SCANNER ) ]
+            fast = [ describe(h) for h in parseAll( fileName, PokerStarsHandParser.REGEX ) ]
+            self.assertEqual( scanned, fast, os.path.basename(fileName) )
+
+    def testCorpusTakesFastPath(self):
+        # None of the sample hands should need the fallback
+        fast = FastHandParser( ['AUD', 'USD'], ['AEST', 'ET'] )
+        for fileName in CORPUS:
+            if os.path.basename(fileName) == 'multi.txt':
+                continue
+            fast.parse( codecs.open( fileName, 'r', 'utf_8_sig' ).read() )
+
+    def testEngineSelectedPerCall(self):
+        ps = PokerStarsHandParser( '../resources/pokerstars/multi.txt' )
+        engine = PokerStarsHandParser.REGEX
+        hands = []
+        while ps.moreHands():
+            hands.append( describe( ps.parseHand( engine ) ) )
+            if engine == PokerStarsHandParser.REGEX:
+                engine = PokerStarsHandParser.SCANNER
+            else:
+                engine = PokerStarsHandParser.REGEX
+        self.assertEqual( hands, [ describe(h) for h in parseAll( '../resources/pokerstars/multi.txt', PokerStarsHandParser.SCANNER ) ] )
+
+    def testFallback(self):
+        # A chat line running over two lines is beyond the fast path
+        text = codecs.open( '../resources/pokerstars/talk.txt', 'r', 'utf_8_sig' ).read()
+        text = text.replace( 'said, "donk"', 'said, "do\nnk"', 1 )
+        fast = FastHandParser( ['AUD', 'USD'], ['AEST', 'ET'] )
+        self.assertRaises( RejectHand, fast.parse, text )
+        ps = PokerStarsHandParser( '../resources/pokerstars/talk.txt', PokerStarsHandParser.REGEX )
+        ps.parseString( text )
+        expected = PokerStarsHandParser( '../resources/pokerstars/talk.txt' )
+        expected.parseString( text )
+        self.assertEqual( describe( ps.parseHand() ), describe( expected.parseHand() ) )
+        self.assertFalse( ps.moreHands() )
+
+    def testFallbackKeepsBufferBounded(self):
+        # a hand that needs the fallback followed by many that don't
+        talk = open( '../resources/pokerstars/talk.txt', 'rb' ).read()
+        multi = open( '../resources/pokerstars/multi.txt', 'rb' ).read()[ len( codecs.BOM_UTF8 ): ]
+        text = talk.replace( 'said, "donk"', 'said, "do\nnk"', 1 ).rstrip() + '\n\n\n' + multi * 20
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join( folder, 'long.txt' )
+            open( path, 'wb' ).write( text )
+            ps = PokerStarsHandParser( path, PokerStarsHandParser.REGEX )
+            ps.BLOCK_SIZE = 4096
+            longest = 0
+            hands = 0
+            while ps.moreHands():
+                ps.parseHand()
+                hands += 1
+                longest = max( longest, len( ps.acc ) )
+            ps.close()
+            self.assertEqual( hands, 1 + 26 * 20 )
+            self.assertTrue( longest <= 2 * ps.BLOCK_SIZE, longest )
+        finally:
+            shutil.rmtree( folder )
@@ -26,6 +26,22 @@ class Test(unittest.TestCase):
     def testMissingSeat(self):
         ps = PokerStarsHandParser('../resources/pokerstars/missingseat.txt')
         ps.parseHand()
+
+    def testSeats(self):
+        for engine in [ PokerStarsHandParser.SCANNER, PokerStarsHandParser.REGEX ]:
+            hand = PokerStarsHandParser('../resources/pokerstars/missingseat.txt', engine).parseHand()
+            seats = sorted( ( p.seat, p.name ) for p in hand.players.values() )
+            # seat 8 is empty
+            self.assertEqual( seats[-3:], [ ( 6, 'intricateboy' ), ( 7, 'OmegaSayajin' ), ( 9, 'ILoveNatasha' ) ] )
+            self.assertEqual( hand.bits['antler88'], 1 << 3 )
+        
+    def testHeader(self):
+        for engine in [ PokerStarsHandParser.SCANNER, PokerStarsHandParser.REGEX ]:
+            hand = PokerStarsHandParser('../resources/pokerstars/allin.txt', engine).parseHand()
+            self.assertEqual( hand.handId, 76511439355 )
+            self.assertEqual( hand.tournamentId, 525756016 )
+            # the ET time in brackets, 2012/03/02 7:15:42
+            self.assertEqual( hand.timestamp, 1330672542 )
         
     def testAllinIn(self):
         ps = PokerStarsHandParser('../resources/pokerstars/allin.txt')
@@ -37,7 +53,8 @@ class Test(unittest.TestCase):
                    
     def testOutOfHand(self):
         ps = PokerStarsHandParser('../resources/pokerstars/outofhand.txt')
-        ps.parseHand()    
+        hand = ps.parseHand()
+        self.assertEqual( [ name for ( name, p ) in hand.players.items() if p.outOfHand ], [ 'Nights0ng' ] )
                        
     def testDisconnected(self):
         ps = PokerStarsHandParser('../resources/pokerstars/disconnect.txt')
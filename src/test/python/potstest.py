@@ -0,0 +1,58 @@
+import glob
+import unittest
+
+import parser
+import pots
+from pokergame import Action, Money
+
+CORPUS = sorted( glob.glob('../resources/pokerstars/*.txt') )
+
+def parseOne( name ):
+    return parser.parseFile( '../resources/pokerstars/' + name )[0]
+
+class Test(unittest.TestCase):
+    def testCorpusMatchesSummaries(self):
+        hands = []
+        for f in CORPUS:
+            hands.extend( parser.parseFile( f ) )
+        self.assertEqual( pots.checkAll( hands ), [] )
+
+    def testSidePots(self):
+        hand = parseOne( 'sidepot.txt' )
+        self.assertEqual( pots.computePots( hand ), [] )
+        self.assertEqual( [ p.amount.cents for p in hand.pots ], [ 2925, 5632 ] )
+        self.assertEqual( hand.pots[0].players, set([ 'ILoveNatasha', 'Nights0ng', 'Oilits' ]) )
+        self.assertEqual( hand.pots[1].players, set([ 'ILoveNatasha', 'Oilits' ]) )
+        self.assertEqual( hand.rounds[-1].pot.cents, 8557 )
+
+    def testStacks(self):
+        hand = parseOne( 'sidepot.txt' )
+        pots.computePots( hand )
+        final = {}
+        for r in hand.rounds:
+            for a in r.actions:
+                self.assertTrue( a.stack.cents >= 0 )
+                final[a.player.name] = a.stack.cents
+        # the all-in player is left with nothing and chips are conserved
+        self.assertEqual( final['Nights0ng'], 0 )
+        start = sum( p.initialStack for p in hand.players.values() )
+        end = sum( final.get( name, p.initialStack ) for ( name, p ) in hand.players.items() )
+        self.assertEqual( start, end )
+
+    def testAntesAndReturns(self):
+        hand = parseOne( 'antes.txt' )
+        kinds = [ a.action for a in hand.rounds[0].actions ]
+        self.assertEqual( kinds.count( Action.Ante ), 9 )
+        self.assertEqual( pots.computePots( hand ), [] )
+        hand = parser.parseFile( '../resources/pokerstars/multi.txt' )
+        returns = [ h for h in hand if Action.Return in [ a.action for r in h.rounds for a in r.actions ] ]
+        self.assertTrue( len( returns ) > 0 )
+        self.assertEqual( pots.checkAll( returns ), [] )
+
+    def testMismatchReported(self):
+        hand = parseOne( 'sidepot.txt' )
+        hand.totalPot = Money( 8000 )
+        hand.summaryPots = [ Money( 8557 ) ]
+        problems = pots.computePots( hand )
+        self.assertEqual( len( problems ), 2 )
+        self.assertEqual( pots.checkAll( [ parseOne( 'flop.txt' ), hand ] )[0][0], 1 )
@@ -0,0 +1,113 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import parser
+from equity import ranges
+from equity.ranges import RangeEquity, parseRange, handClass, comboIndex
+
+_table = []
+
+def table():
+    # building takes a while, so the tests share one built from few boards
+    if not _table:
+        _table.append( RangeEquity.build( 300 ) )
+    return _table[0]
+
+class Test(unittest.TestCase):
+    def testClasses(self):
+        self.assertEqual( len( ranges.CLASSES ), 169 )
+        self.assertEqual( ranges.NUM_COMBOS, 1326 )
+        sizes = numpy.bincount( ranges.COMBO_CLASSES )
+        self.assertEqual( sorted( set( sizes.tolist() ) ), [ 4, 6, 12 ] )
+        self.assertEqual( handClass( [ 'Ah', 'Kh' ] ), 'AKs' )
+        self.assertEqual( handClass( [ '6s', '8c' ] ), '86o' )
+        self.assertEqual( handClass( [ '7d', '7c' ] ), '77' )
+        self.assertEqual( comboIndex( [ 'Kh', 'Ah' ] ), comboIndex( [ 'Ah', 'Kh' ] ) )
+
+    def testParseRange(self):
+        for ( text, combos ) in [ ( 'AA', 6 ), ( 'AKs', 4 ), ( 'AKo', 12 ), ( 'AK', 16 ), ( 'TT+', 30 ),
+                                  ( 'ATs+', 16 ), ( 'KTo+', 36 ), ( '22+, AKs', 82 ), ( 'AhKh', 1 ) ]:
+            self.assertEqual( parseRange( text ).sum(), combos )
+        r = parseRange( 'QQ+, AKs:0.5' )
+        self.assertEqual( r.sum(), 20 )
+        self.assertEqual( r[ comboIndex( [ 'Ah', 'Kh' ] ) ], 0.5 )
+        self.assertRaises( ValueError, parseRange, 'AXs' )
+        self.assertRaises( ValueError, parseRange, 'AKx' )
+
+    def testEquities(self):
+        t = table()
+        e = t.equities
+        # each pair's equities add up to one
+        both = ( e + e.T )[ ranges.DISJOINT ]
+        self.assertTrue( numpy.allclose( both, 1 ) )
+        self.assertEqual( e[ comboIndex( [ 'Ah', 'Kh' ] ), comboIndex( [ 'Ah', 'Qd' ] ) ], 0 )
+        # AA against KK is about 82%
+        aa = parseRange( 'AA' )
+        kk = parseRange( 'KK' )
+        self.assertTrue( abs( t.rangeVsRange( aa, kk ) - 0.82 ) < 0.03 )
+        self.assertAlmostEqual( t.rangeVsRange( aa, kk ) + t.rangeVsRange( kk, aa ), 1, 5 )
+        # a single combo range is the same as the hand
+        hand = [ 'Ah', 'Kd' ]
+        single = ranges.emptyRange()
+        single[ comboIndex( hand ) ] = 1
+        wide = parseRange( '22+, A2s+, KTo+' )
+        self.assertAlmostEqual( t.handVsRange( hand, wide ), t.rangeVsRange( single, wide ), 5 )
+        self.assertAlmostEqual( t.handsVsRange( wide )[ comboIndex( hand ) ], t.handVsRange( hand, wide ), 5 )
+        self.assertRaises( ValueError, t.handVsRange, [ 'Ah', 'Ad' ], parseRange( 'AhAd' ) )
+
+    def testErrors(self):
+        t = table()
+        self.assertEqual( t.boards, 300 )
+        errors = t.errors[ ranges.DISJOINT ]
+        # about 200 boards a pair, a coin flip is off by 3.5%
+        self.assertTrue( 0.02 < errors.mean() < 0.04 )
+        self.assertTrue( ( t.errors[ ~ranges.DISJOINT ] == 0 ).all() )
+        # AA against KK is 81.3% dealing every board
+        aa = comboIndex( [ 'Ah', 'Ad' ] )
+        kk = comboIndex( [ 'Kc', 'Ks' ] )
+        self.assertTrue( abs( t.equities[aa,kk] - 0.813 ) < 4 * t.errors[aa,kk] )
+
+    def testClassMatrix(self):
+        m = table().classMatrix()
+        self.assertEqual( m.shape, ( 169, 169 ) )
+        self.assertTrue( numpy.allclose( m + m.T, 1 ) )
+        aa = ranges.CLASS_INDEX['AA']
+        self.assertAlmostEqual( m[aa,aa], 0.5 )
+        self.assertTrue( ( m[aa] >= 0.5 - 1e-6 ).all() )
+
+    def testSaveAndOpen(self):
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join( folder, 'ranges.npy' )
+            table().save( path )
+            loaded = RangeEquity.open( path )
+            self.assertTrue( isinstance( loaded.equities, numpy.memmap ) )
+            r = parseRange( 'TT+' )
+            self.assertEqual( loaded.handVsRange( [ 'Ah', 'Kd' ], r ), table().handVsRange( [ 'Ah', 'Kd' ], r ) )
+            self.assertEqual( loaded.boards, 300 )
+            self.assertTrue( numpy.array_equal( loaded.errors[ ranges.DISJOINT ], table().errors[ ranges.DISJOINT ] ) )
+            self.assertEqual( RangeEquity.open( path, boards=300 ).boards, 300 )
+            # a table from a different number of boards is built again
+            self.assertEqual( RangeEquity.open( path, boards=10 ).boards, 10 )
+            self.assertEqual( RangeEquity.load( path ).boards, 10 )
+            # a missing table is built and saved
+            path = os.path.join( folder, 'new.npy' )
+            RangeEquity.open( path, boards=10 )
+            self.assertTrue( os.path.exists( path ) )
+        finally:
+            shutil.rmtree( folder )
+
+    def testObservedRange(self):
+        hands = []
+        for f in sorted( glob.glob( '../resources/pokerstars/*.txt' ) ):
+            hands.extend( parser.parseFile( f ) )
+        seen = ranges.observedRange( hands, 'h0stjke' )
+        expected = [ p.startingHand for h in hands for p in h.players.values()
+                     if p.name == 'h0stjke' and p.startingHand is not None ]
+        self.assertEqual( seen.sum(), len( expected ) )
+        self.assertTrue( seen[ comboIndex( [ 'Qh', 'Ah' ] ) ] > 0 )
@@ -0,0 +1,147 @@
+import codecs
+import unittest
+
+from parser.scanner import Scanner, BadAlternative, Alternatives, compileAlternatives
+from parser.pokerstars import PokerStarsHandParser
+from parser.handparser import HandParsingException
+
+from testutil import describe
+
+class Test(unittest.TestCase):
+    def testPeekConsume(self):
+        s = Scanner()
+        s.parseString('Seat 1: antler88')
+        self.assertEqual( s.peek(4), 'Seat' )
+        self.assertEqual( s.consume(5), 'Seat ' )
+        self.assertEqual( s.peek(2), '1:' )
+        self.assertFalse( s.isEOF )
+
+    def testPeekPastEnd(self):
+        s = Scanner()
+        s.parseString('abc')
+        self.assertEqual( s.peek(10), 'abc' )
+        self.assertTrue( s.isEOF )
+
+    def testText(self):
+        s = Scanner()
+        s.parseString('*** FLOP ***')
+        s.text('*** ')
+        self.assertRaises( BadAlternative, s.text, 'TURN' )
+        s.text('FLOP')
+
+    def testLookaheadTill(self):
+        s = Scanner()
+        s.parseString('antler88: folds \nnext')
+        self.assertEqual( s.lookaheadTill('\n'), 'antler88: folds ' )
+        self.assertEqual( s.peek(8), 'antler88' )
+
+    def testSmallBlocks(self):
+        s = Scanner()
+        s.BLOCK_SIZE = 3
+        s.parseFile('../resources/pokerstars/checks.txt')
+        self.assertEqual( s.peek(11), 'PokerStars ' )
+        s.consume(11)
+        self.assertEqual( s.lookaheadTill(':'), 'Hand #72947984674' )
+
+    def testPosition(self):
+        s = Scanner()
+        s.parseString('ab\ncd\n\nef')
+        self.assertEqual( (s.line_num, s.char_num), (1, 1) )
+        s.consume(2)
+        self.assertEqual( (s.line_num, s.char_num), (1, 3) )
+        s.consume(1)
+        self.assertEqual( (s.line_num, s.char_num), (2, 1) )
+        s.consume(4)
+        self.assertEqual( (s.line_num, s.char_num), (4, 1) )
+        s.consume(1)
+        self.assertEqual( (s.line_num, s.char_num, s.offset), (4, 2, 8) )
+
+    def testPositionAcrossBlocks(self):
+        text = codecs.open( '../resources/pokerstars/sidepot.txt', 'r', 'utf_8_sig' ).read()
+        s = Scanner()
+        s.BLOCK_SIZE = 7
+        s.parseFile('../resources/pokerstars/sidepot.txt')
+        for step in range( 0, len(text)-13, 13 ):
+            s.peek(13)
+            before = text[:s.offset]
+            self.assertEqual( s.line_num, before.count('\n') + 1 )
+            self.assertEqual( s.char_num, len(before) - before.rfind('\n') )
+            s.consume(13)
+
+    def testErrorPosition(self):
+        text = codecs.open( '../resources/pokerstars/checks.txt', 'r', 'utf_8_sig' ).read()
+        ps = PokerStarsHandParser('../resources/pokerstars/checks.txt')
+        ps.parseString( text.replace( 'Seat 3: ', 'Seat 3; ' ) )
+        try:
+            ps.parseHand()
+            self.fail('Expected a HandParsingException')
+        except HandParsingException as e:
+            self.assertEqual( e.line_num, 5 )
+            self.assertEqual( e.char_num, 1 )
+
+    def testMultipleHands(self):
+        ps = PokerStarsHandParser('../resources/pokerstars/multi.txt')
+        hands = []
+        while ps.moreHands():
+            hands.append( ps.parseHand() )
+        self.assertEqual( len(hands), 26 )
+
+    def testMultipleHandsSmallBlocks(self):
+        ps = PokerStarsHandParser('../resources/pokerstars/multi.txt')
+        ps.BLOCK_SIZE = 5
+        hands = []
+        while ps.moreHands():
+            hands.append( ps.parseHand() )
+        self.assertEqual( len(hands), 26 )
+
+    def testAlternative(self):
+        s = Scanner()
+        s.parseString('raises 100 to 200')
+        self.assertEqual( s.alternative(['folds', 'raises']), 'raises' )
+        self.assertRaises( BadAlternative, s.alternative, ['folds', 'calls'] )
+        self.assertEqual( s.peek(4), ' 100' )
+
+    def testAlternativeLongestMatch(self):
+        alts = Alternatives([ 'Bob', 'Bob2', 'Bo' ])
+        self.assertEqual( alts.match('Bob2: folds'), 'Bob2' )
+        self.assertEqual( alts.match('Bob: folds'), 'Bob' )
+        self.assertEqual( alts.match('Bo: folds'), 'Bo' )
+        self.assertEqual( alts.match('Al: folds'), None )
+
+    def testAlternativeSpecialCharacters(self):
+        alts = Alternatives([ 'a.b (1)', 'a*b', u'J\xfcrgen' ])
+        self.assertEqual( alts.match('a*b: calls'), 'a*b' )
+        self.assertEqual( alts.match('a.b (1): calls'), 'a.b (1)' )
+        self.assertEqual( alts.match('axb (1): calls'), None )
+        self.assertEqual( alts.match(u'J\xfcrgen: calls'), u'J\xfcrgen' )
+
+    def testAlternativeAtPosition(self):
+        alts = Alternatives([ 'calls', 'checks' ])
+        self.assertEqual( alts.match('Bob: checks', 5), 'checks' )
+
+    def testCompiledAlternativesAreCached(self):
+        self.assertTrue( compileAlternatives(['a', 'b']) is compileAlternatives(['b', 'a']) )
+
+    def testRawBytes(self):
+        s = Scanner()
+        s.parseBytes( codecs.BOM_UTF8 + 'Seat 1: J\xc3\xbcrgen (1500 in chips)' )
+        self.assertEqual( s.offset, 3 )
+        s.consume(8)
+        self.assertEqual( s.char_num, 9 )
+        self.assertEqual( s.decode( s.consume(7) ), u'J\xfcrgen' )
+        self.assertEqual( s.decode_count, 7 )
+
+    def testRawMatchesDecoded(self):
+        # a player name that isn't ASCII
+        text = codecs.open( '../resources/pokerstars/talk.txt', 'r', 'utf_8_sig' ).read()
+        text = text.replace( 'winkom', u'w\xefnk\xf6m' )
+        for engine in [ PokerStarsHandParser.SCANNER, PokerStarsHandParser.REGEX ]:
+            decoded = PokerStarsHandParser( None, engine )
+            decoded.parseString( text )
+            raw = PokerStarsHandParser( None, engine )
+            raw.parseBytes( text.encode( 'utf_8' ) )
+            hand = raw.parseHand()
+            self.assertEqual( describe( hand ), describe( decoded.parseHand() ) )
+            self.assertTrue( u'w\xefnk\xf6m' in hand.players )
+            self.assertTrue( all( type(name) is unicode for name in hand.players ) )
+            self.assertTrue( raw.decode_count < len( text ) / 10 )
@@ -0,0 +1,142 @@
+import glob
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import parser
+from parser.dedup import SeenHands
+from storage.sqlitestore import SQLiteStore, INDEXES, cardsText, textCards
+from pokergame import Card
+
+from testutil import describe
+
+CORPUS = sorted( glob.glob('../resources/pokerstars/*.txt') )
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.file_name = os.path.join( self.folder, 'hands.db' )
+        self.hands = []
+        for f in CORPUS:
+            self.hands.extend( parser.parseFile( f ) )
+
+    def tearDown(self):
+        shutil.rmtree( self.folder )
+
+    def testRoundTrip(self):
+        store = SQLiteStore( self.file_name )
+        self.assertEqual( store.loadHands( self.hands, batch=7 ), len( self.hands ) )
+        self.assertEqual( len( store ), len( self.hands ) )
+        expected = [ describe(h) for h in self.hands ]
+        self.assertEqual( [ describe(h) for h in store.hands( range( 1, len( self.hands ) + 1 ) ) ], expected )
+        self.assertEqual( describe( store.hand(5) ), expected[4] )
+        self.assertRaises( KeyError, store.hand, len( self.hands ) + 1 )
+        store.close()
+
+    def testReopen(self):
+        store = SQLiteStore( self.file_name )
+        store.loadHands( self.hands[:10] )
+        store.close()
+        store = SQLiteStore( self.file_name )
+        store.loadHands( self.hands[10:] )
+        self.assertEqual( len( store ), len( self.hands ) )
+        # player names are stored once
+        names = set( name for h in self.hands for name in h.players )
+        self.assertEqual( store.db.execute( 'SELECT COUNT(*) FROM players' ).fetchone()[0], len( names ) )
+        self.assertEqual( describe( store.hand( 11 ) ), describe( self.hands[10] ) )
+        store.close()
+
+    def testSeen(self):
+        store = SQLiteStore( self.file_name )
+        seen = SeenHands( capacity=100 )
+        stored = store.loadHands( self.hands, seen=seen )
+        # multi.txt repeats the hands of the other files
+        self.assertEqual( stored, len( set( h.handId for h in self.hands ) ) )
+        self.assertEqual( store.loadHands( self.hands, seen=seen ), 0 )
+        store.close()
+
+    def testSeenAfterCommit(self):
+        store = SQLiteStore( self.file_name )
+        seen = SeenHands( capacity=100 )
+        batches = []
+        insertHands = store.insertHands
+        def failSecond( hands ):
+            batches.append( hands )
+            if len( batches ) == 2:
+                raise sqlite3.OperationalError( 'disk I/O error' )
+            return insertHands( hands )
+        store.insertHands = failSecond
+        self.assertRaises( sqlite3.OperationalError, store.loadHands, self.hands[:20], seen=seen, batch=10 )
+        # only the committed batch is marked as seen
+        self.assertEqual( sorted( h.handId for h in batches[0] ), sorted( set( h.handId for h in self.hands[:10] ) ) )
+        self.assertTrue( all( h.handId in seen for h in batches[0] ) )
+        self.assertFalse( any( h.handId in seen for h in batches[1] ) )
+        del store.insertHands
+        self.assertEqual( store.loadHands( self.hands[10:20], seen=seen ), len( batches[1] ) )
+        self.assertEqual( len( store ), len( set( h.handId for h in self.hands[:20] ) ) )
+        store.close()
+
+    def testBulkLoad(self):
+        store = SQLiteStore( self.file_name )
+        store.loadHands( self.hands, bulk=10, expected=len( self.hands ) )
+        self.assertEqual( store.db.execute( 'PRAGMA journal_mode' ).fetchone()[0], 'wal' )
+        indexes = set( row[0] for row in store.db.execute( "SELECT name FROM sqlite_master WHERE type = 'index'" ) )
+        self.assertTrue( set( name for ( name, definition ) in INDEXES ) <= indexes )
+        store.close()
+
+    def testCards(self):
+        cards = [ Card( 'Ac' ), Card( 'Td' ), Card( '2s' ) ]
+        self.assertEqual( cardsText( cards ), 'AcTd2s' )
+        self.assertEqual( [ c.value + c.suit for c in textCards( 'AcTd2s' ) ], [ 'Ac', 'Td', '2s' ] )
+        self.assertEqual( cardsText( None ), None )
+
+    def testQuery(self):
+        store = SQLiteStore( self.file_name )
+        store.loadHands( self.hands )
+        def found( **conditions ):
+            return [ describe(h) for h in store.query( **conditions ) ]
+        def expected( keep ):
+            return [ describe(h) for h in self.hands if keep(h) ]
+        h = self.hands[3]
+        name = sorted( h.players )[0]
+        self.assertEqual( found( player=name ), expected( lambda x: name in x.players ) )
+        self.assertEqual( found( handId=h.handId ), expected( lambda x: x.handId == h.handId ) )
+        self.assertEqual( found( player=name, tournament=h.tournamentId, since=h.timestamp ),
+                          expected( lambda x: name in x.players and x.tournamentId == h.tournamentId
+                                    and x.timestamp >= h.timestamp ) )
+        self.assertEqual( found( until=h.timestamp ), expected( lambda x: x.timestamp < h.timestamp ) )
+        self.assertEqual( found( minPot=h.totalPot.cents, maxPot=h.totalPot.cents ),
+                          expected( lambda x: x.totalPot.cents == h.totalPot.cents ) )
+        self.assertEqual( found( player='nobody' ), [] )
+        self.assertEqual( len( store.query() ), len( self.hands ) )
+        store.close()
+
+    def testStoredHands(self):
+        store = SQLiteStore( self.file_name )
+        store.loadHands( self.hands )
+        hands = store.query()
+        hands.batch = 4
+        self.assertEqual( [ describe(h) for h in hands ], [ describe(h) for h in self.hands ] )
+        self.assertEqual( describe( hands[2] ), describe( self.hands[2] ) )
+        self.assertEqual( [ describe(h) for h in hands[5:9] ], [ describe(h) for h in self.hands[5:9] ] )
+        self.assertEqual( [ describe(h) for h in hands.table().toHands() ], [ describe(h) for h in self.hands ] )
+        store.close()
+
+    def testExplain(self):
+        store = SQLiteStore( self.file_name )
+        store.loadHands( self.hands )
+        h = self.hands[0]
+        def uses( index, **conditions ):
+            return any( index in step for step in store.explain( **conditions ) )
+        self.assertTrue( uses( 'hands_hand_id', handId=h.handId ) )
+        self.assertTrue( uses( 'hand_players_player', player=sorted( h.players )[0] ) )
+        for conditions in [ dict( since=h.timestamp ), dict( until=h.timestamp ),
+                            dict( since=h.timestamp, until=h.timestamp + 3600 ) ]:
+            self.assertTrue( uses( 'hands_timestamp', **conditions ) )
+        for conditions in [ dict( minPot=100000 ), dict( maxPot=10 ), dict( minPot=10, maxPot=1000 ) ]:
+            self.assertTrue( uses( 'hands_total_pot', **conditions ) )
+        self.assertTrue( uses( 'hands_tournament', tournament=h.tournamentId, since=h.timestamp ) )
+        self.assertEqual( len( store.explain( player='nobody' ) ), 1 )
+        store.close()
@@ -0,0 +1,90 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import parser
+from parser.tail import HandTailer, Checkpoint
+
+from testutil import describe
+
+MULTI = '../resources/pokerstars/multi.txt'
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join( self.folder, 'live.txt' )
+        self.text = open( MULTI, 'rb' ).read()
+        # byte offsets at which the hands of multi.txt start
+        self.starts = [ m.start() + 1 for m in re.finditer( r'\nPokerStars (?:Hand|Game) #', self.text ) ]
+        self.expected = [ describe(h) for h in parser.parseFile( MULTI ) ]
+
+    def tearDown(self):
+        shutil.rmtree( self.folder )
+
+    def write(self, end):
+        f = open( self.path, 'wb' )
+        f.write( self.text[:end] )
+        f.close()
+
+    def testMissingFile(self):
+        self.assertEqual( HandTailer( self.path ).poll(), [] )
+
+    def testOnlyCompleteHands(self):
+        tailer = HandTailer( self.path )
+        # three hands and the first half of the fourth
+        self.write( self.starts[2] + 200 )
+        self.assertEqual( [ describe(h) for h in tailer.poll() ], self.expected[:3] )
+        self.assertEqual( tailer.poll(), [] )
+        # the fourth hand complete up to its blank line
+        self.write( self.starts[3] - 1 )
+        self.assertEqual( [ describe(h) for h in tailer.poll() ], self.expected[3:4] )
+        self.write( len(self.text) )
+        self.assertEqual( [ describe(h) for h in tailer.poll() ], self.expected[4:] )
+
+    def testCheckpointSurvivesRestart(self):
+        checkpoint = os.path.join( self.folder, 'checkpoint.json' )
+        self.write( self.starts[5] )
+        self.assertEqual( len( HandTailer( self.path, Checkpoint( checkpoint ) ).poll() ), 6 )
+        self.write( self.starts[7] )
+        tailer = HandTailer( self.path, Checkpoint( checkpoint ) )
+        self.assertEqual( [ describe(h) for h in tailer.poll() ], self.expected[6:8] )
+
+    def testReplacedFile(self):
+        tailer = HandTailer( self.path )
+        self.write( self.starts[5] )
+        self.assertEqual( len( tailer.poll() ), 6 )
+        self.write( self.starts[1] )
+        self.assertEqual( [ describe(h) for h in tailer.poll() ], self.expected[:2] )
+
+    def testFollow(self):
+        self.write( self.starts[2] )
+        polls = []
+        def stop():
+            polls.append( True )
+            return len(polls) > 2
+        hands = list( HandTailer( self.path ).follow( interval=0, stop=stop ) )
+        self.assertEqual( len(hands), 3 )
+
+    def testPartialHeader(self):
+        # the client has written the start of the next hand's header
+        for cut in [ 5, 15 ]:
+            tailer = HandTailer( self.path )
+            self.write( self.starts[2] + cut )
+            self.assertEqual( [ describe(h) for h in tailer.poll() ], self.expected[:3] )
+            self.write( self.starts[3] )
+            self.assertEqual( [ describe(h) for h in tailer.poll() ], self.expected[3:4] )
+
+    def testBadHand(self):
+        # the second hand is cut short before its summary
+        f = open( self.path, 'wb' )
+        f.write( self.text[:self.starts[0]] + self.text[self.starts[0]:self.starts[0] + 300] + '\n\n\n'
+                 + self.text[self.starts[1]:self.starts[2]] )
+        f.close()
+        tailer = HandTailer( self.path )
+        self.assertEqual( [ describe(h) for h in tailer.poll() ], [ self.expected[0], self.expected[2] ] )
+        self.assertEqual( len( tailer.errors ), 1 )
+        self.assertEqual( tailer.errors[0].offset, self.starts[0] )
+        self.assertEqual( tailer.offset, os.path.getsize( self.path ) )
+        self.assertEqual( tailer.poll(), [] )
@@ -0,0 +1,19 @@
+'''Helpers shared by the unit tests'''
+
+def describe(hand):
+    '''Everything the parser records about a hand as plain data'''
+    def cards(cs):
+        return None if cs is None else [ repr(c) for c in cs ]
+    def money(m):
+        return getattr( m, 'cents', m )
+    rounds = []
+    for r in hand.rounds:
+        # the parser appends the preflop round twice so record sharing too
+        rounds.append( ( hand.rounds.index(r), cards(r.cards), sorted(r.livePlayers),
+                         [ ( a.player.name, a.action, money(a.amount), getattr( a, 'bet', None ), cards(a.cards) )
+                           for a in r.actions ] ) )
+    players = [ ( p.name, p.seat, p.win, cards(p.startingHand), p.initialStack, p.outOfHand )
+                for p in hand.players.values() ]
+    return ( hand.numOfSeats, hand.gameType, hand.ante, money(hand.totalPot), money(hand.rake),
+             sorted(players), rounds, [ money(m) for m in hand.summaryPots ],
+             hand.handId, hand.tournamentId, hand.timestamp )